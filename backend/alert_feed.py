@@ -0,0 +1,45 @@
+import hashlib
+import threading
+
+from result_cache import ResultCache
+
+THREAT_LEVELS = ('low', 'medium', 'high', 'critical')
+
+
+class AlertFeed:
+    """Thread-safe LRU of serialized threat alert pages with their ETags.
+
+    Pages are keyed by their query (filters, cursor and limit) and kept as
+    the exact response body, so a repeated poll neither queries nor
+    serializes. Writers call ``invalidate`` after committing an alert
+    change; a page read under an older ``generation`` is then refused by
+    ``put``, so a read racing a write never caches what it saw before the
+    commit. The TTL bounds how long other server processes may serve a page
+    from before their last write. A ``max_pages`` of 0 disables the cache.
+    """
+
+    def __init__(self, max_pages=1024, ttl=5, max_bytes=64 * 1024 * 1024):
+        self.generation = 0
+        self._pages = ResultCache(max_entries=max_pages, ttl=ttl, max_bytes=max_bytes)
+        # Orders generation checks in put against invalidate
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """(body, etag) of a cached page, or None"""
+        return self._pages.get(key)
+
+    def put(self, key, generation, body):
+        """Cache ``body`` read at ``generation`` and return (body, etag)"""
+        page = body, hashlib.sha1(body).hexdigest()
+        with self._lock:
+            if generation == self.generation:
+                self._pages.put(key, page, size=len(body))
+        return page
+
+    def invalidate(self):
+        with self._lock:
+            self.generation += 1
+            self._pages.clear()
+
+    def stats(self):
+        return self._pages.stats()
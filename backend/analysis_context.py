@@ -0,0 +1,46 @@
+import re
+from functools import cached_property
+from features import extract_features
+from keyword_index import keyword_words
+
+_URL = re.compile(r'https?://\S+')
+
+
+class AnalysisContext:
+    """One message as every analysis layer sees it.
+
+    Derived views are computed on first use and shared by all layers, so a
+    message is lowered and tokenized at most once however many layers read
+    it. Layers must treat the views as read-only.
+    """
+
+    def __init__(self, content):
+        self.content = content
+
+    @cached_property
+    def lowered(self):
+        return self.content.lower()
+
+    @cached_property
+    def tokens(self):
+        """Whitespace-separated tokens, as ``str.split()``"""
+        return self.content.split()
+
+    @cached_property
+    def words(self):
+        """Lowercased word tokens, as matched against keyword indexes"""
+        return keyword_words(self.lowered)
+
+    @cached_property
+    def urls(self):
+        """http(s) URLs, each running to the end of its token"""
+        return [
+            match.group()
+            for token in self.tokens if '://' in token
+            for match in _URL.finditer(token)
+        ]
+
+    @cached_property
+    def features(self):
+        """The ML feature dict (see features.extract_features)"""
+        return extract_features(self.content, self.tokens)
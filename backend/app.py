@@ -1,11 +1,32 @@
-from flask import Flask, request, jsonify, Response
+from flask import Flask, request, jsonify, Response, stream_with_context
 from flask_cors import CORS, cross_origin
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import func, case, extract, select, inspect, text
+from sqlalchemy.exc import IntegrityError
+import click
+import csv
 import os
+import sys
 import json
-import requests
-import re
-from datetime import datetime
+import time
+import atexit
+from datetime import datetime, timedelta
+from itertools import islice
+from detection_engine import AdvancedDetectionEngine
+from result_cache import ResultCache
+from metrics import MetricsRegistry, render_stats
+from write_behind import WriteBehindWriter, QueueFull
+from detection_pool import DetectionPool
+from keyword_index import load_keywords
+from url_reputation import compile_blocklist
+from user_cache import UserCache, CachedUser
+from campaigns import CampaignIndex
+from alert_feed import AlertFeed, THREAT_LEVELS
+from content_store import STORAGE_MODES, fingerprint, pack, unpack
+from text_model import train_model, save_model, parse_label
+from storage import engine_options, tune_sqlite
+from bulk_ingest import FORMATS, detect_format, read_records, analyze_stream
+from llm_client import LLMClient, CircuitBreaker, LLMUnavailable
 
 app = Flask(__name__)
 
@@ -13,16 +34,229 @@ app = Flask(__name__)
 CORS(app, resources={
     r"/api/*": {
         "origins": ["http://localhost:3000", "http://127.0.0.1:3000"],
-        "methods": ["GET", "POST", "PUT", "DELETE", "OPTIONS"],
-        "allow_headers": ["Content-Type", "Authorization"],
+        "methods": ["GET", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"],
+        "allow_headers": ["Content-Type", "Authorization", "If-None-Match"],
+        "expose_headers": ["ETag"],
         "supports_credentials": True
     }
 })
 
-# Database configuration
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///xist_ai.db'
+# Database configuration: DATABASE_URL picks the backend (sqlite:///file.db,
+# postgresql://...); pool sizes and timeouts apply to any file or server database
+app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URL', 'sqlite:///xist_ai.db')
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+app.config['DATABASE_POOL_SIZE'] = int(os.environ.get('DATABASE_POOL_SIZE', 5))
+app.config['DATABASE_MAX_OVERFLOW'] = int(os.environ.get('DATABASE_MAX_OVERFLOW', 10))
+app.config['DATABASE_POOL_TIMEOUT'] = float(os.environ.get('DATABASE_POOL_TIMEOUT', 30))
+app.config['DATABASE_POOL_RECYCLE'] = int(os.environ.get('DATABASE_POOL_RECYCLE', 1800))
+app.config['DATABASE_BUSY_TIMEOUT'] = float(os.environ.get('DATABASE_BUSY_TIMEOUT', 5))
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(
+    app.config['SQLALCHEMY_DATABASE_URI'],
+    pool_size=app.config['DATABASE_POOL_SIZE'],
+    max_overflow=app.config['DATABASE_MAX_OVERFLOW'],
+    pool_timeout=app.config['DATABASE_POOL_TIMEOUT'],
+    pool_recycle=app.config['DATABASE_POOL_RECYCLE'],
+    busy_timeout=app.config['DATABASE_BUSY_TIMEOUT']
+)
+
+# SQLite only: readers no longer wait for writers in WAL mode
+app.config['SQLITE_JOURNAL_MODE'] = os.environ.get('SQLITE_JOURNAL_MODE', 'WAL')
+app.config['SQLITE_SYNCHRONOUS'] = os.environ.get('SQLITE_SYNCHRONOUS', 'NORMAL')
+app.config['SQLITE_MMAP_SIZE'] = int(os.environ.get('SQLITE_MMAP_SIZE', 256 * 1024 * 1024))
+
 db = SQLAlchemy(app)
+with app.app_context():
+    tune_sqlite(
+        db.engine,
+        journal_mode=app.config['SQLITE_JOURNAL_MODE'],
+        synchronous=app.config['SQLITE_SYNCHRONOUS'],
+        mmap_size=app.config['SQLITE_MMAP_SIZE']
+    )
+
+# Pattern matching limits per message
+app.config['PATTERN_SCAN_MAX_CHARS'] = int(os.environ.get('PATTERN_SCAN_MAX_CHARS', 200000))
+app.config['PATTERN_SCAN_TIME_BUDGET'] = float(os.environ.get('PATTERN_SCAN_TIME_BUDGET', 0.25))
+app.config['PATTERN_PROXIMITY_WINDOW'] = int(os.environ.get('PATTERN_PROXIMITY_WINDOW', 12))
+
+# Compile patterns and load heavy dependencies at import instead of on the first request
+app.config['WARM_UP_ON_START'] = os.environ.get('WARM_UP_ON_START', '0') == '1'
+
+# Largest number of messages accepted by /api/analyze/batch
+app.config['BATCH_MAX_MESSAGES'] = int(os.environ.get('BATCH_MAX_MESSAGES', 5000))
+
+# Messages scored and committed together by streaming ingest (flask ingest,
+# /api/analyze/stream); also the most a stream holds in memory at once
+app.config['INGEST_BATCH_SIZE'] = int(os.environ.get('INGEST_BATCH_SIZE', 500))
+
+# How analyzed text is kept: 'dedup' stores each distinct message once,
+# compressed and capped at ANALYSIS_CONTENT_MAX_CHARS, in analysis_content,
+# referenced from Analysis by its fingerprint; 'inline' keeps the first 500
+# characters on every Analysis row
+app.config['ANALYSIS_CONTENT_STORAGE'] = os.environ.get('ANALYSIS_CONTENT_STORAGE', 'dedup')
+app.config['ANALYSIS_CONTENT_MAX_CHARS'] = int(os.environ.get('ANALYSIS_CONTENT_MAX_CHARS', 20000))
+if app.config['ANALYSIS_CONTENT_STORAGE'] not in STORAGE_MODES:
+    raise ValueError(f"ANALYSIS_CONTENT_STORAGE must be one of: {', '.join(STORAGE_MODES)}")
+
+# flask compact-analyses: Analysis rows older than ANALYSIS_RETENTION_DAYS
+# are thinned to one in ANALYSIS_RETENTION_KEEP_EVERY (0 deletes them all)
+app.config['ANALYSIS_RETENTION_DAYS'] = int(os.environ.get('ANALYSIS_RETENTION_DAYS', 90))
+app.config['ANALYSIS_RETENTION_KEEP_EVERY'] = int(os.environ.get('ANALYSIS_RETENTION_KEEP_EVERY', 10))
+
+# Queue Analysis rows and commit them in batches from a background thread
+app.config['ANALYSIS_WRITE_BEHIND'] = os.environ.get('ANALYSIS_WRITE_BEHIND', '0') == '1'
+app.config['WRITE_BEHIND_MAX_QUEUE'] = int(os.environ.get('WRITE_BEHIND_MAX_QUEUE', 10000))
+app.config['WRITE_BEHIND_BATCH_SIZE'] = int(os.environ.get('WRITE_BEHIND_BATCH_SIZE', 500))
+app.config['WRITE_BEHIND_FLUSH_INTERVAL'] = float(os.environ.get('WRITE_BEHIND_FLUSH_INTERVAL', 0.5))
+app.config['WRITE_BEHIND_PUT_TIMEOUT'] = float(os.environ.get('WRITE_BEHIND_PUT_TIMEOUT', 1.0))
+# Retries of a failed batch commit (e.g. SQLite busy), the first after
+# WRITE_BEHIND_RETRY_BACKOFF seconds and doubling, before it is dropped
+app.config['WRITE_BEHIND_MAX_RETRIES'] = int(os.environ.get('WRITE_BEHIND_MAX_RETRIES', 3))
+app.config['WRITE_BEHIND_RETRY_BACKOFF'] = float(os.environ.get('WRITE_BEHIND_RETRY_BACKOFF', 0.5))
+
+# Upstream chat completions (/api/chat); any OpenAI-compatible endpoint works
+app.config['OPENROUTER_BASE_URL'] = os.environ.get('OPENROUTER_BASE_URL', 'https://openrouter.ai/api/v1')
+app.config['OPENROUTER_MODEL'] = os.environ.get('OPENROUTER_MODEL', 'deepseek/deepseek-r1:free')
+app.config['OPENROUTER_CONNECT_TIMEOUT'] = float(os.environ.get('OPENROUTER_CONNECT_TIMEOUT', 3.05))
+app.config['OPENROUTER_READ_TIMEOUT'] = float(os.environ.get('OPENROUTER_READ_TIMEOUT', 15))
+app.config['OPENROUTER_POOL_SIZE'] = int(os.environ.get('OPENROUTER_POOL_SIZE', 10))
+app.config['OPENROUTER_BREAKER_FAILURES'] = int(os.environ.get('OPENROUTER_BREAKER_FAILURES', 5))
+app.config['OPENROUTER_BREAKER_RESET'] = float(os.environ.get('OPENROUTER_BREAKER_RESET', 30))
+
+# Worker processes that run detection off the GIL (0 scores in the request
+# thread) and the most messages sent to a worker in one task
+app.config['DETECTION_WORKERS'] = int(os.environ.get('DETECTION_WORKERS', 0))
+app.config['DETECTION_CHUNK_SIZE'] = int(os.environ.get('DETECTION_CHUNK_SIZE', 64))
+
+# Scored results reused across users for repeated content
+app.config['RESULT_CACHE_MAX_ENTRIES'] = int(os.environ.get('RESULT_CACHE_MAX_ENTRIES', 10000))
+app.config['RESULT_CACHE_TTL'] = float(os.environ.get('RESULT_CACHE_TTL', 3600))
+app.config['RESULT_CACHE_MAX_BYTES'] = int(os.environ.get('RESULT_CACHE_MAX_BYTES', 64 * 1024 * 1024))
+
+# Analysis layers run by default (comma-separated, empty for all) and whether
+# expensive layers are skipped once they cannot change the verdict
+app.config['ANALYSIS_LAYERS'] = [
+    name.strip() for name in os.environ.get('ANALYSIS_LAYERS', '').split(',') if name.strip()
+]
+app.config['ANALYSIS_SHORT_CIRCUIT'] = os.environ.get('ANALYSIS_SHORT_CIRCUIT', '1') == '1'
+
+# Users looked up by email, kept per process; invalidated when a user is
+# changed here, and refreshed from the database after USER_CACHE_TTL seconds
+app.config['USER_CACHE_MAX_ENTRIES'] = int(os.environ.get('USER_CACHE_MAX_ENTRIES', 10000))
+app.config['USER_CACHE_TTL'] = float(os.environ.get('USER_CACHE_TTL', 300))
+
+# Serialized threat alert pages kept per process until an alert is written
+# here; ALERT_FEED_TTL bounds how stale another process's pages may be
+app.config['ALERT_FEED_MAX_PAGES'] = int(os.environ.get('ALERT_FEED_MAX_PAGES', 1024))
+app.config['ALERT_FEED_TTL'] = float(os.environ.get('ALERT_FEED_TTL', 5))
+app.config['ALERT_PAGE_SIZE'] = int(os.environ.get('ALERT_PAGE_SIZE', 50))
+
+# JSON file of {"financial": [...], "medical": [...]} replacing the built-in
+# domain keyword lists it names
+app.config['DOMAIN_KEYWORDS_FILE'] = os.environ.get('DOMAIN_KEYWORDS_FILE', '')
+
+# Compiled domain blocklist (flask compile-blocklist) and how often, in
+# seconds, it is checked for a replacement
+app.config['URL_BLOCKLIST_PATH'] = os.environ.get('URL_BLOCKLIST_PATH', '')
+app.config['URL_BLOCKLIST_CHECK_INTERVAL'] = float(os.environ.get('URL_BLOCKLIST_CHECK_INTERVAL', 5))
+
+# Trained text classifier (flask train-model) run as the 'model' layer, how
+# often, in seconds, it is checked for a replacement, and how many points of
+# scam risk a certain scam adds
+app.config['ML_MODEL_PATH'] = os.environ.get('ML_MODEL_PATH', '')
+app.config['ML_MODEL_CHECK_INTERVAL'] = float(os.environ.get('ML_MODEL_CHECK_INTERVAL', 5))
+app.config['ML_MODEL_WEIGHT'] = float(os.environ.get('ML_MODEL_WEIGHT', 0.3))
+
+# Follow shortened links to their destination (the 'expansion' layer). Only
+# shortener hosts are contacted; expansions persist in a SQLite file for
+# URL_EXPANSION_TTL seconds and a message waits at most URL_EXPANSION_DEADLINE
+app.config['URL_EXPANSION'] = os.environ.get('URL_EXPANSION', '0') == '1'
+app.config['URL_EXPANSION_CACHE'] = os.environ.get(
+    'URL_EXPANSION_CACHE', os.path.join(app.instance_path, 'url_expansions.db')
+)
+app.config['URL_EXPANSION_TTL'] = float(os.environ.get('URL_EXPANSION_TTL', 86400))
+app.config['URL_EXPANSION_WORKERS'] = int(os.environ.get('URL_EXPANSION_WORKERS', 8))
+app.config['URL_EXPANSION_MAX_HOPS'] = int(os.environ.get('URL_EXPANSION_MAX_HOPS', 5))
+app.config['URL_EXPANSION_TIMEOUT'] = float(os.environ.get('URL_EXPANSION_TIMEOUT', 1.5))
+app.config['URL_EXPANSION_DEADLINE'] = float(os.environ.get('URL_EXPANSION_DEADLINE', 2.0))
+app.config['URL_EXPANSION_PROXY'] = os.environ.get('URL_EXPANSION_PROXY', '')
+
+# Near-duplicate messages grouped into campaigns (kept per process, at most
+# CAMPAIGN_MAX); authorities see campaigns active in the last
+# CAMPAIGN_ACTIVE_WINDOW seconds. Score reuse is opt-in: with
+# CAMPAIGN_REUSE_SIMILARITY set (e.g. 0.9), copies at least that alike whose
+# pattern, URL and domain results match reuse the campaign's score
+app.config['CAMPAIGN_TRACKING'] = os.environ.get('CAMPAIGN_TRACKING', '1') == '1'
+app.config['CAMPAIGN_MAX'] = int(os.environ.get('CAMPAIGN_MAX', 20000))
+app.config['CAMPAIGN_SIMILARITY'] = float(os.environ.get('CAMPAIGN_SIMILARITY', 0.5))
+app.config['CAMPAIGN_REUSE_SIMILARITY'] = (
+    float(os.environ['CAMPAIGN_REUSE_SIMILARITY']) if os.environ.get('CAMPAIGN_REUSE_SIMILARITY') else None
+)
+app.config['CAMPAIGN_ACTIVE_WINDOW'] = float(os.environ.get('CAMPAIGN_ACTIVE_WINDOW', 86400))
+
+if app.config['URL_EXPANSION']:
+    os.makedirs(os.path.dirname(os.path.abspath(app.config['URL_EXPANSION_CACHE'])), exist_ok=True)
+
+detection_engine = AdvancedDetectionEngine(
+    max_scan_chars=app.config['PATTERN_SCAN_MAX_CHARS'],
+    pattern_time_budget=app.config['PATTERN_SCAN_TIME_BUDGET'],
+    proximity_window=app.config['PATTERN_PROXIMITY_WINDOW'],
+    result_cache=ResultCache(
+        max_entries=app.config['RESULT_CACHE_MAX_ENTRIES'],
+        ttl=app.config['RESULT_CACHE_TTL'],
+        max_bytes=app.config['RESULT_CACHE_MAX_BYTES']
+    ),
+    layers=app.config['ANALYSIS_LAYERS'] or None,
+    short_circuit=app.config['ANALYSIS_SHORT_CIRCUIT'],
+    executor=DetectionPool(
+        app.config['DETECTION_WORKERS'], chunk_size=app.config['DETECTION_CHUNK_SIZE']
+    ) if app.config['DETECTION_WORKERS'] > 0 else None,
+    url_blocklist=app.config['URL_BLOCKLIST_PATH'] or None,
+    url_blocklist_check_interval=app.config['URL_BLOCKLIST_CHECK_INTERVAL'],
+    text_model=app.config['ML_MODEL_PATH'] or None,
+    text_model_check_interval=app.config['ML_MODEL_CHECK_INTERVAL'],
+    text_model_weight=app.config['ML_MODEL_WEIGHT'],
+    url_expansion={
+        'cache_path': app.config['URL_EXPANSION_CACHE'],
+        'ttl': app.config['URL_EXPANSION_TTL'],
+        'max_workers': app.config['URL_EXPANSION_WORKERS'],
+        'max_hops': app.config['URL_EXPANSION_MAX_HOPS'],
+        'read_timeout': app.config['URL_EXPANSION_TIMEOUT'],
+        'deadline': app.config['URL_EXPANSION_DEADLINE'],
+        'proxy': app.config['URL_EXPANSION_PROXY'] or None
+    } if app.config['URL_EXPANSION'] else None,
+    campaigns=CampaignIndex(
+        max_campaigns=app.config['CAMPAIGN_MAX'],
+        similarity=app.config['CAMPAIGN_SIMILARITY'],
+        reuse_similarity=app.config['CAMPAIGN_REUSE_SIMILARITY']
+    ) if app.config['CAMPAIGN_TRACKING'] else None
+)
+
+if app.config['DOMAIN_KEYWORDS_FILE']:
+    domain_keywords = load_keywords(app.config['DOMAIN_KEYWORDS_FILE'])
+    detection_engine.financial_keywords = domain_keywords.get('financial', detection_engine.financial_keywords)
+    detection_engine.medical_keywords = domain_keywords.get('medical', detection_engine.medical_keywords)
+
+if detection_engine.executor is not None:
+    atexit.register(detection_engine.executor.shutdown)
+
+# Per-stage latency histograms served on /api/metrics
+metrics = MetricsRegistry()
+
+user_cache = UserCache(max_entries=app.config['USER_CACHE_MAX_ENTRIES'], ttl=app.config['USER_CACHE_TTL'])
+
+alert_feed = AlertFeed(max_pages=app.config['ALERT_FEED_MAX_PAGES'], ttl=app.config['ALERT_FEED_TTL'])
+
+llm_client = LLMClient(
+    app.config['OPENROUTER_BASE_URL'],
+    app.config['OPENROUTER_MODEL'],
+    connect_timeout=app.config['OPENROUTER_CONNECT_TIMEOUT'],
+    read_timeout=app.config['OPENROUTER_READ_TIMEOUT'],
+    pool_size=app.config['OPENROUTER_POOL_SIZE'],
+    breaker=CircuitBreaker(
+        failure_threshold=app.config['OPENROUTER_BREAKER_FAILURES'],
+        reset_timeout=app.config['OPENROUTER_BREAKER_RESET']
+    )
+)
 
 # ✅ ENHANCED USER MODEL WITH AUTHORITY FIELDS
 class User(db.Model):
@@ -48,6 +282,42 @@ class Analysis(db.Model):
     credibility_score = db.Column(db.Integer, nullable=False)
     verdict = db.Column(db.String(50), nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # Fingerprint of the AnalysisContent holding the text; content is then ''
+    content_hash = db.Column(db.LargeBinary(16), nullable=True)
+    
+    # A user's newest analyses, and their rollup rebuilt by month
+    __table_args__ = (
+        db.Index('ix_analysis_user_created', 'user_id', 'created_at'),
+    )
+
+class AnalysisContent(db.Model):
+    """Each distinct analyzed text once, packed by content_store.pack"""
+    __tablename__ = 'analysis_content'
+    hash = db.Column(db.LargeBinary(16), primary_key=True)
+    body = db.Column(db.LargeBinary, nullable=False)
+
+class UserMonthlyStats(db.Model):
+    """Per-user, per-month rollup of Analysis rows, updated in the same transaction as each insert"""
+    __tablename__ = 'user_monthly_stats'
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    year = db.Column(db.Integer, primary_key=True)
+    month = db.Column(db.Integer, primary_key=True)
+    analysis_count = db.Column(db.Integer, nullable=False, default=0)
+    scam_risk_total = db.Column(db.Integer, nullable=False, default=0)
+    credibility_total = db.Column(db.Integer, nullable=False, default=0)
+    low_count = db.Column(db.Integer, nullable=False, default=0)
+    medium_count = db.Column(db.Integer, nullable=False, default=0)
+    high_count = db.Column(db.Integer, nullable=False, default=0)
+
+class IngestCheckpoint(db.Model):
+    """Progress of a streaming ingest job, committed with each batch of Analysis rows"""
+    __tablename__ = 'ingest_checkpoint'
+    job = db.Column(db.String(512), primary_key=True)
+    records = db.Column(db.Integer, nullable=False, default=0)
+    # Byte positions after the committed records (None when not tracked)
+    input_offset = db.Column(db.BigInteger, nullable=True)
+    output_offset = db.Column(db.BigInteger, nullable=True)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
 class ThreatAlert(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -58,6 +328,25 @@ class ThreatAlert(db.Model):
     category = db.Column(db.String(50), nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     is_active = db.Column(db.Boolean, default=True)
+    
+    # The feed filters on is_active and optionally category and threat
+    # level, and pages newest first by id
+    __table_args__ = (
+        db.Index('ix_threat_alert_active_category_level', 'is_active', 'category', 'threat_level', 'id'),
+        db.Index('ix_threat_alert_active_level', 'is_active', 'threat_level', 'id'),
+        db.Index('ix_threat_alert_active', 'is_active', 'id'),
+    )
+
+def _dialect_insert(table):
+    """INSERT with ON CONFLICT support for ``table``, or None where the dialect has none"""
+    dialect = db.engine.dialect.name
+    if dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+    elif dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        return None
+    return insert(table)
 
 # ✅ MISSING /api/analyze ENDPOINT
 @app.route('/api/analyze', methods=['POST'])
@@ -71,141 +360,769 @@ def analyze_content():
         if not content or not user_email:
             return jsonify({'error': 'Content and user email required'}), 400
         
+        try:
+            layers = requested_layers(data)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
         # Get or create user
-        user = User.query.filter_by(email=user_email).first()
-        if not user:
-            user = User(email=user_email, name=data.get('user_name', 'Unknown'))
-            db.session.add(user)
-            db.session.commit()
+        user = get_or_create_user(user_email, data.get('user_name', 'Unknown'))
         
         # Perform comprehensive analysis
-        result = perform_comprehensive_analysis(content, user.name)
+        timings = {}
+        started = time.perf_counter()
+        result = detection_engine.analyze_comprehensive(content, user.name, layers=layers, timings=timings)
+        timings['analysis'] = time.perf_counter() - started
         
         # Save analysis to database
-        analysis = Analysis(
-            user_id=user.id,
-            content=content[:500],
-            scam_risk=result['scamRisk'],
-            credibility_score=result['credibilityScore'],
-            verdict=result['verdict']
-        )
-        db.session.add(analysis)
-        db.session.commit()
+        started = time.perf_counter()
+        try:
+            persist_analyses([analysis_record(user.id, content, result)])
+        except QueueFull as e:
+            return jsonify({'error': str(e)}), 503
+        timings['db_write'] = time.perf_counter() - started
+        
+        metrics.observe_all('analysis_stage', timings, endpoint='analyze')
+        if debug_requested(data):
+            result['debug'] = {'timingsMs': timings_ms(timings)}
         
         return jsonify(result)
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-def perform_comprehensive_analysis(content, user_name):
-    """Comprehensive AI analysis system"""
+# ✅ BATCH ANALYSIS ENDPOINT
+@app.route('/api/analyze/batch', methods=['POST'])
+@cross_origin()
+def analyze_batch():
+    try:
+        data = request.get_json()
+        messages = data.get('messages', [])
+        user_email = data.get('user_email', '')
+        
+        if not isinstance(messages, list) or not messages or not user_email:
+            return jsonify({'error': 'Messages list and user email required'}), 400
+        
+        if len(messages) > app.config['BATCH_MAX_MESSAGES']:
+            return jsonify({'error': f"Batch limited to {app.config['BATCH_MAX_MESSAGES']} messages"}), 413
+        
+        try:
+            layers = requested_layers(data)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        # Get or create user
+        user = get_or_create_user(user_email, data.get('user_name', 'Unknown'))
+        
+        results = [
+            {'index': index, 'error': 'Content must be a non-empty string'}
+            for index in range(len(messages))
+        ]
+        valid = [index for index, message in enumerate(messages) if isinstance(message, str) and message]
+        
+        # ML features are extracted for the whole batch in one pass
+        item_timings = []
+        started = time.perf_counter()
+        analyses = detection_engine.analyze_batch(
+            [messages[index] for index in valid], user.name, layers, timings=item_timings
+        )
+        batch_timings = {'analysis': time.perf_counter() - started}
+        debug = debug_requested(data)
+        
+        started = time.perf_counter()
+        saved = []
+        for index, result, timings in zip(valid, analyses, item_timings):
+            metrics.observe_all('analysis_stage', timings, endpoint='analyze_batch')
+            if 'error' in result:
+                results[index] = {'index': index, 'error': result['error']}
+                continue
+            
+            if debug:
+                result['debug'] = {'timingsMs': timings_ms(timings)}
+            results[index] = {'index': index, 'result': result}
+            saved.append(analysis_record(user.id, messages[index], result))
+        try:
+            persist_analyses(saved)
+        except QueueFull as e:
+            return jsonify({'error': str(e)}), 503
+        batch_timings['db_write'] = time.perf_counter() - started
+        metrics.observe_all('batch_stage', batch_timings, endpoint='analyze_batch')
+        
+        response = {
+            'results': results,
+            'total': len(messages),
+            'errors': sum(1 for item in results if 'error' in item)
+        }
+        if debug:
+            response['debug'] = {'timingsMs': timings_ms(batch_timings)}
+        return jsonify(response)
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+# ✅ STREAMING INGEST ENDPOINT
+@app.route('/api/analyze/stream', methods=['POST'])
+@cross_origin()
+def analyze_stream_endpoint():
+    """Score an NDJSON or CSV body, which may be uploaded chunked, and stream
+    NDJSON results back while the rows are committed batch by batch.
+
+    Query parameters: user_email (owner of records without their own),
+    format (default from the Content-Type) and job. With a job name each
+    committed batch moves a checkpoint, and re-sending the same body under
+    that name skips the records already stored.
+    """
+    user_email = request.args.get('user_email', '')
+    if not user_email:
+        return jsonify({'error': 'User email required'}), 400
     
-    # Multi-layer analysis
-    scam_patterns = analyze_scam_patterns(content)
-    url_analysis = analyze_urls(content)
-    language_analysis = analyze_language_patterns(content)
+    fmt = request.args.get('format') or detect_format(content_type=request.content_type)
+    if fmt not in FORMATS:
+        return jsonify({'error': f"Format must be one of: {', '.join(FORMATS)}"}), 400
     
-    # Calculate final scores
-    scam_risk = min((scam_patterns['score'] + url_analysis['risk'] + language_analysis['urgency']) / 3, 100)
-    credibility_score = max(100 - scam_risk - 10, 0)
+    job = request.args.get('job') or None
+    checkpoint = db.session.get(IngestCheckpoint, job) if job else None
+    skip = checkpoint.records if checkpoint is not None else 0
+    stream = request.stream
     
-    # Determine verdict
-    if scam_risk > 70:
-        verdict = "High Risk"
-    elif scam_risk > 40:
-        verdict = "Suspicious"  
-    else:
-        verdict = "Credible"
-    
-    # Generate warnings and recommendations
-    warnings = []
-    warnings.extend(scam_patterns['warnings'])
-    warnings.extend(url_analysis['warnings'])
-    
-    recommendations = [
-        "🔍 Always verify information through official sources",
-        "🚫 Never share personal information with untrusted sources", 
-        "📞 Contact organizations directly using official phone numbers",
-        "🔒 Use secure, updated browsers and devices",
-        "📢 Report suspicious content to help protect others"
-    ]
+    def store(scored, consumed, offset):
+        store_ingest_batch(job, user_email, scored, consumed)
+    
+    def generate():
+        records = islice(read_records(stream, fmt), skip, None)
+        try:
+            for item in analyze_stream(records, detection_engine, store, app.config['INGEST_BATCH_SIZE'], skip):
+                yield json.dumps(item) + '\n'
+        except Exception as e:
+            yield json.dumps({'error': str(e)}) + '\n'
     
+    return Response(stream_with_context(generate()), content_type='application/x-ndjson')
+
+def get_or_create_user(email, name='Unknown'):
+    """The CachedUser for ``email``, creating the user on first sight"""
+    user = cached_user(email)
+    if user is None:
+        insert_user(email, name)
+        # Ours, or the one a concurrent request inserted first
+        user = find_user(email)
+        user_cache.put(email, user)
+    return user
+
+def cached_user(email):
+    """The CachedUser for ``email``, or None if there is no such user"""
+    user = user_cache.get(email)
+    if user is None:
+        user = find_user(email)
+        if user is not None:
+            user_cache.put(email, user)
+    return user
+
+def find_user(email):
+    row = db.session.execute(
+        select(User.id, User.name, User.is_authority, User.authority_level).where(User.email == email)
+    ).first()
+    return CachedUser(*row) if row is not None else None
+
+def insert_user(email, name):
+    """Insert a user unless the email is taken; racing callers never fail"""
+    statement = _dialect_insert(User.__table__)
+    if statement is not None:
+        db.session.execute(
+            statement.values(email=email, name=name).on_conflict_do_nothing(index_elements=['email'])
+        )
+        db.session.commit()
+        return
+    
+    db.session.add(User(email=email, name=name))
+    try:
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+
+def requested_layers(data):
+    """Analysis layers named in the request body, or None for the configured default"""
+    layers = data.get('layers')
+    if layers is None:
+        return None
+    
+    if isinstance(layers, str):
+        layers = [name.strip() for name in layers.split(',') if name.strip()]
+    if not isinstance(layers, list) or not layers or not all(isinstance(name, str) for name in layers):
+        raise ValueError('Layers must be a non-empty list of layer names')
+    
+    unknown = [name for name in layers if name not in detection_engine.layers]
+    if unknown:
+        raise ValueError(f"Unknown analysis layer: {', '.join(unknown)}")
+    return layers
+
+def threat_level(scam_risk):
+    if scam_risk < 30:
+        return 'low'
+    elif scam_risk < 70:
+        return 'medium'
+    return 'high'
+
+def analysis_record(user_id, content, result):
+    """The Analysis column values for one scored message, stamped now.
+    With dedup storage ``content`` is moved out by save_analyses.
+    """
+    if app.config['ANALYSIS_CONTENT_STORAGE'] == 'dedup':
+        content = content[:app.config['ANALYSIS_CONTENT_MAX_CHARS']]
+    else:
+        content = content[:500]
     return {
-        'scamRisk': round(scam_risk),
-        'credibilityScore': round(credibility_score),
-        'verdict': verdict,
-        'warnings': warnings[:5],
-        'recommendations': recommendations[:6],
-        'summary': f"Multi-layer AI analysis detected {round(scam_risk)}% scam risk based on content patterns, URL analysis, and language indicators. Analysis performed for {user_name}.",
-        'analysisDate': datetime.utcnow().isoformat(),
-        'confidence': round((credibility_score + (100 - scam_risk)) / 2),
-        'processingTime': '2.1 seconds',
-        'aiModel': 'Xist AI Advanced Detection v3.0'
+        'user_id': user_id,
+        'content': content,
+        'scam_risk': result['scamRisk'],
+        'credibility_score': result['credibilityScore'],
+        'verdict': result['verdict'],
+        'created_at': datetime.utcnow()
     }
 
-def analyze_scam_patterns(content):
-    """Analyze for scam patterns"""
-    scam_indicators = [
-        r'urgent.*action.*required', r'click.*here.*immediately', r'you.*won.*\$[\d,]+',
-        r'limited.*time.*offer', r'verify.*account.*suspended', r'congratulations.*winner',
-        r'free.*money', r'guaranteed.*income', r'work.*from.*home.*\$\d+'
-    ]
+def save_analyses(records):
+    """Add Analysis rows and fold them into the monthly rollup. Both go
+    into the current transaction; the caller commits.
+    """
+    if records and app.config['ANALYSIS_CONTENT_STORAGE'] == 'dedup':
+        records = save_contents(records)
+    if records:
+        db.session.execute(Analysis.__table__.insert(), records)
     
-    score = 0
-    warnings = []
-    content_lower = content.lower()
+    increments = {}
+    for record in records:
+        created_at = record['created_at']
+        totals = increments.setdefault((record['user_id'], created_at.year, created_at.month), {
+            'analysis_count': 0, 'scam_risk_total': 0, 'credibility_total': 0,
+            'low_count': 0, 'medium_count': 0, 'high_count': 0
+        })
+        totals['analysis_count'] += 1
+        totals['scam_risk_total'] += record['scam_risk']
+        totals['credibility_total'] += record['credibility_score']
+        totals[threat_level(record['scam_risk']) + '_count'] += 1
     
-    for pattern in scam_indicators:
-        if re.search(pattern, content_lower):
-            score += 20
-            warnings.append("Scam language pattern detected")
+    for (user_id, year, month), totals in increments.items():
+        increment_monthly_stats(user_id, year, month, totals)
+
+def save_contents(records):
+    """Store each distinct text of ``records`` in AnalysisContent unless it
+    is there already; return the records referencing it by fingerprint
+    """
+    contents = {}
+    referenced = []
+    for record in records:
+        digest = fingerprint(record['content'])
+        contents.setdefault(digest, record['content'])
+        referenced.append(dict(record, content='', content_hash=digest))
     
-    return {'score': min(score, 100), 'warnings': warnings}
+    statement = _dialect_insert(AnalysisContent.__table__)
+    if statement is not None:
+        db.session.execute(statement.on_conflict_do_nothing(index_elements=['hash']), [
+            {'hash': digest, 'body': pack(content)} for digest, content in contents.items()
+        ])
+        return referenced
+    
+    stored = set(db.session.execute(
+        select(AnalysisContent.hash).where(AnalysisContent.hash.in_(list(contents)))
+    ).scalars())
+    missing = [{'hash': digest, 'body': pack(content)} for digest, content in contents.items() if digest not in stored]
+    if missing:
+        db.session.execute(AnalysisContent.__table__.insert(), missing)
+    return referenced
+
+def persist_analyses(records):
+    """Commit records now, or hand them to the write-behind queue when enabled"""
+    if analysis_writer is not None:
+        analysis_writer.submit(records)
+        return
+    save_analyses(records)
+    db.session.commit()
+
+def store_ingest_batch(job, user_email, scored, consumed, input_offset=None, output_offset=None):
+    """Insert one streaming-ingest batch and move the job's checkpoint in the same transaction"""
+    try:
+        records = [
+            analysis_record(get_or_create_user(record.get('user_email') or user_email).id, record['content'], result)
+            for record, result in scored
+        ]
+        save_analyses(records)
+        if job is not None:
+            db.session.merge(IngestCheckpoint(
+                job=job, records=consumed, input_offset=input_offset, output_offset=output_offset
+            ))
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+def flush_analyses(records):
+    """Write-behind flush: one transaction per batch, run on the writer thread"""
+    started = time.perf_counter()
+    with app.app_context():
+        try:
+            save_analyses(records)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+    metrics.observe('write_behind_flush', time.perf_counter() - started)
+
+def create_analysis_writer():
+    return WriteBehindWriter(
+        flush_analyses,
+        max_queue=app.config['WRITE_BEHIND_MAX_QUEUE'],
+        batch_size=app.config['WRITE_BEHIND_BATCH_SIZE'],
+        flush_interval=app.config['WRITE_BEHIND_FLUSH_INTERVAL'],
+        put_timeout=app.config['WRITE_BEHIND_PUT_TIMEOUT'],
+        max_retries=app.config['WRITE_BEHIND_MAX_RETRIES'],
+        retry_backoff=app.config['WRITE_BEHIND_RETRY_BACKOFF'],
+        logger=app.logger
+    )
 
-def analyze_urls(content):
-    """Analyze URLs for security risks"""
-    urls = re.findall(r'https?://[^\s]+', content)
+analysis_writer = create_analysis_writer() if app.config['ANALYSIS_WRITE_BEHIND'] else None
+if analysis_writer is not None:
+    # Queued analyses are flushed before the interpreter exits
+    atexit.register(analysis_writer.close)
+
+def increment_monthly_stats(user_id, year, month, totals):
+    """Add ``totals`` to one rollup row, creating it if needed"""
+    table = UserMonthlyStats.__table__
+    statement = _dialect_insert(table)
+    if statement is not None:
+        statement = statement.values(user_id=user_id, year=year, month=month, **totals)
+        db.session.execute(statement.on_conflict_do_update(
+            index_elements=['user_id', 'year', 'month'],
+            set_={column: table.c[column] + statement.excluded[column] for column in totals}
+        ))
+        return
     
-    risk = 0
-    warnings = []
+    row = db.session.get(UserMonthlyStats, (user_id, year, month), with_for_update=True)
+    if row is None:
+        db.session.add(UserMonthlyStats(user_id=user_id, year=year, month=month, **totals))
+    else:
+        for column, value in totals.items():
+            setattr(row, column, getattr(row, column) + value)
+
+def rebuild_monthly_stats(user_id=None):
+    """Recompute the rollup from Analysis rows, for one user or everyone"""
+    def bucket(condition):
+        return func.sum(case((condition, 1), else_=0))
     
-    for url in urls:
-        if any(shortener in url for shortener in ['bit.ly', 'tinyurl', 't.co']):
-            risk += 30
-            warnings.append("Shortened URL detected - destination hidden")
-        
-        if url.startswith('http://'):
-            risk += 25
-            warnings.append("Insecure HTTP connection found")
+    query = select(
+        Analysis.user_id,
+        extract('year', Analysis.created_at),
+        extract('month', Analysis.created_at),
+        func.count(Analysis.id),
+        func.sum(Analysis.scam_risk),
+        func.sum(Analysis.credibility_score),
+        bucket(Analysis.scam_risk < 30),
+        bucket((Analysis.scam_risk >= 30) & (Analysis.scam_risk < 70)),
+        bucket(Analysis.scam_risk >= 70)
+    ).group_by(
+        Analysis.user_id, extract('year', Analysis.created_at), extract('month', Analysis.created_at)
+    )
     
-    return {'risk': min(risk, 100), 'warnings': warnings}
+    stale = UserMonthlyStats.query
+    if user_id is not None:
+        query = query.where(Analysis.user_id == user_id)
+        stale = stale.filter_by(user_id=user_id)
+    
+    stale.delete()
+    db.session.execute(UserMonthlyStats.__table__.insert().from_select([
+        'user_id', 'year', 'month', 'analysis_count', 'scam_risk_total', 'credibility_total',
+        'low_count', 'medium_count', 'high_count'
+    ], query))
+    db.session.commit()
 
-def analyze_language_patterns(content):
-    """Analyze language for manipulation tactics"""
-    urgency_words = ['urgent', 'immediately', 'expires', 'limited', 'hurry', 'act now']
-    words = content.lower().split()
+@app.cli.command('rebuild-stats')
+@click.option('--email', help='Only rebuild this user\'s rollup')
+def rebuild_stats_command(email):
+    """Backfill or repair the per-user monthly stats rollup"""
+    init_db(backfill_stats=False)
+    user_id = None
+    if email:
+        user = User.query.filter_by(email=email).first()
+        if not user:
+            raise click.ClickException(f'No user with email {email}')
+        user_id = user.id
     
-    urgency_score = sum(10 for word in words if any(uw in word for uw in urgency_words))
+    rebuild_monthly_stats(user_id)
+    click.echo(f"Rebuilt {UserMonthlyStats.query.count()} monthly stats rows")
+
+@app.cli.command('compact-analyses')
+@click.option('--older-than', type=int, help='Age in days of the rows to thin (default: ANALYSIS_RETENTION_DAYS)')
+@click.option('--keep-every', type=int, help='Keep one row in N, 0 to delete them all '
+                                             '(default: ANALYSIS_RETENTION_KEEP_EVERY)')
+@click.option('--batch-size', type=int, default=10000, help='Rows deleted per transaction')
+@click.option('--vacuum', is_flag=True, help='Return the freed space to the filesystem (SQLite: VACUUM)')
+def compact_analyses_command(older_than, keep_every, batch_size, vacuum):
+    """Thin out old Analysis rows and drop stored texts nothing references.
+
+    The monthly stats rollup is left as it is, so user statistics still
+    count every analysis; rebuild-stats afterwards would count only the
+    rows kept.
+    """
+    init_db()
+    older_than = app.config['ANALYSIS_RETENTION_DAYS'] if older_than is None else older_than
+    keep_every = app.config['ANALYSIS_RETENTION_KEEP_EVERY'] if keep_every is None else keep_every
+    deleted, contents = compact_analyses(datetime.utcnow() - timedelta(days=older_than), keep_every, batch_size)
+    click.echo(f"Deleted {deleted} analyses older than {older_than} days and {contents} unreferenced texts")
+    if vacuum:
+        with db.engine.connect() as connection:
+            connection.execution_options(isolation_level='AUTOCOMMIT').execute(
+                text('VACUUM' if db.engine.dialect.name == 'sqlite' else 'VACUUM ANALYZE analysis, analysis_content')
+            )
+
+def compact_analyses(cutoff, keep_every, batch_size=10000):
+    """Delete Analysis rows created before ``cutoff`` except every
+    ``keep_every``-th id (all of them when 0), in batches of ``batch_size``
+    committed one at a time, then the AnalysisContent rows left unreferenced.
+    Returns (analyses deleted, texts deleted).
+    """
+    deleted = 0
+    last_id = 0
+    while True:
+        ids = db.session.execute(
+            select(Analysis.id).where(Analysis.created_at < cutoff, Analysis.id > last_id)
+            .order_by(Analysis.id).limit(batch_size)
+        ).scalars().all()
+        if not ids:
+            break
+        last_id = ids[-1]
+        doomed = [row_id for row_id in ids if not keep_every or row_id % keep_every]
+        if doomed:
+            db.session.execute(Analysis.__table__.delete().where(Analysis.id.in_(doomed)))
+            db.session.commit()
+            deleted += len(doomed)
     
-    return {'urgency': min(urgency_score, 100)}
+    # One pass over analysis.content_hash; no index on it is needed
+    referenced = select(Analysis.content_hash).where(Analysis.content_hash.is_not(None))
+    contents = db.session.execute(
+        AnalysisContent.__table__.delete().where(AnalysisContent.hash.not_in(referenced))
+    ).rowcount
+    db.session.commit()
+    return deleted, contents
+
+@app.cli.command('train-model')
+@click.option('--csv', 'csv_path', type=click.Path(exists=True, dir_okay=False),
+              help="CSV with 'content' and 'label' columns (default: stored analyses)")
+@click.option('--output', help='Model file (default: ML_MODEL_PATH, else instance/text_model.pkl)')
+@click.option('--scam-risk', type=int, default=40, help='Stored analyses scored above this are labeled scam')
+@click.option('--limit', type=int, default=200000, help='Newest stored analyses to learn from')
+@click.option('--max-features', type=int, default=200000, help='Largest TF-IDF vocabulary')
+@click.option('--test-fraction', type=float, default=0.2, help='Share held out to report accuracy, 0 for none')
+def train_model_command(csv_path, output, scam_risk, limit, max_features, test_fraction):
+    """Fit the 'model' layer's TF-IDF classifier and save it.
+
+    Labels come from a CSV (1/0, scam/legit, ...) or, by default, from the
+    scores of stored analyses, each distinct text once. Servers with
+    ML_MODEL_PATH pointing at the output load the new model within
+    ML_MODEL_CHECK_INTERVAL seconds.
+    """
+    output = output or app.config['ML_MODEL_PATH'] or os.path.join(app.instance_path, 'text_model.pkl')
+    if csv_path:
+        texts, labels, skipped = csv_training_examples(csv_path)
+    else:
+        init_db()
+        texts, labels, skipped = stored_training_examples(scam_risk, limit)
+    if skipped:
+        click.echo(f"Skipped {skipped} examples without usable text or label", err=True)
+    
+    try:
+        model, model_metrics = train_model(texts, labels, max_features=max_features, test_fraction=test_fraction)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    save_model(model, output)
+    click.echo(f"Saved a model trained on {len(texts)} examples to {output}: {json.dumps(model_metrics)}")
+
+def csv_training_examples(path):
+    """(texts, labels, rows skipped) from a CSV with content and label columns"""
+    texts, labels, skipped = [], [], 0
+    with open(path, newline='', encoding='utf-8-sig') as stream:
+        reader = csv.DictReader(stream)
+        if reader.fieldnames is None or not {'content', 'label'} <= set(reader.fieldnames):
+            raise click.ClickException("The CSV needs a header row with 'content' and 'label' columns")
+        for row in reader:
+            label = parse_label(row['label'] or '')
+            if label is None or not (row['content'] or '').strip():
+                skipped += 1
+                continue
+            texts.append(row['content'])
+            labels.append(label)
+    return texts, labels, skipped
+
+def stored_training_examples(scam_risk, limit):
+    """(texts, labels, rows skipped) from the newest ``limit`` analyses; a
+    text is labeled scam when scored above ``scam_risk``, by its newest score
+    """
+    rows = db.session.execute(
+        select(Analysis.content, AnalysisContent.body, Analysis.scam_risk)
+        .outerjoin(AnalysisContent, AnalysisContent.hash == Analysis.content_hash)
+        .order_by(Analysis.id.desc()).limit(limit)
+    )
+    examples, skipped = {}, 0
+    for content, body, risk in rows:
+        text = unpack(body) if body is not None else content
+        if not text.strip():
+            skipped += 1
+            continue
+        examples.setdefault(text, int(risk > scam_risk))
+    return list(examples), list(examples.values()), skipped
+
+@app.cli.command('compile-blocklist')
+@click.argument('source')
+@click.argument('destination')
+def compile_blocklist_command(source, destination):
+    """Compile a text domain blocklist for URL_BLOCKLIST_PATH; running servers pick it up"""
+    count = compile_blocklist(source, destination)
+    click.echo(f"Compiled {count} domains into {destination}")
+
+@app.cli.command('ingest')
+@click.argument('source', type=click.Path(exists=True, dir_okay=False))
+@click.option('--user-email', required=True, help='Owner of records without a user_email field')
+@click.option('--format', 'fmt', type=click.Choice(FORMATS), help='Input format (default: from the file name)')
+@click.option('--output', default='-', help='NDJSON results file, - for stdout')
+@click.option('--job', help='Checkpoint name (default: the absolute source path)')
+@click.option('--batch-size', type=int, help='Messages per transaction (default: INGEST_BATCH_SIZE)')
+@click.option('--restart', is_flag=True, help='Drop the checkpoint and start from the first record')
+def ingest_command(source, user_email, fmt, output, job, batch_size, restart):
+    """Stream an NDJSON or CSV file through detection and store the results.
+
+    Each batch's rows and the job checkpoint are committed together; a
+    rerun continues after the last committed batch, and a results file is
+    cut back to match it first.
+    """
+    fmt = fmt or detect_format(source)
+    job = job or os.path.abspath(source)
+    init_db()
+    if restart:
+        IngestCheckpoint.query.filter_by(job=job).delete()
+        db.session.commit()
+    checkpoint = db.session.get(IngestCheckpoint, job)
+    first_index = checkpoint.records if checkpoint is not None else 0
+    
+    with open(source, 'rb') as stream:
+        if checkpoint is not None and checkpoint.input_offset is not None:
+            stream.seek(checkpoint.input_offset)
+            records = read_records(stream, fmt, checkpoint.input_offset)
+        else:
+            records = islice(read_records(stream, fmt), first_index, None)
+        
+        to_stdout = output == '-'
+        out = sys.stdout.buffer if to_stdout else open(output, 'ab' if checkpoint is not None else 'wb')
+        if not to_stdout and checkpoint is not None and checkpoint.output_offset is not None:
+            out.truncate(checkpoint.output_offset)
+        
+        def store(scored, consumed, offset):
+            out.flush()
+            store_ingest_batch(job, user_email, scored, consumed, offset, None if to_stdout else out.tell())
+        
+        written = errors = 0
+        try:
+            for item in analyze_stream(
+                records, detection_engine, store, batch_size or app.config['INGEST_BATCH_SIZE'], first_index
+            ):
+                if 'checkpoint' in item:
+                    continue
+                out.write(json.dumps(item).encode('utf-8') + b'\n')
+                written += 1
+                errors += 'error' in item
+        finally:
+            if not to_stdout:
+                out.close()
+    
+    click.echo(f"Analyzed {written - errors} messages ({errors} errors) from record {first_index}; "
+               f"{first_index + written} records done", err=True)
+
+def debug_requested(data):
+    """Whether the caller asked for per-stage timings in the response"""
+    return bool(data.get('debug')) or request.args.get('debug') == '1'
+
+def timings_ms(timings):
+    return {stage: round(seconds * 1000, 3) for stage, seconds in timings.items()}
+
+# ✅ LATENCY METRICS ENDPOINT (Prometheus text format)
+@app.route('/api/metrics', methods=['GET'])
+@cross_origin()
+def get_metrics():
+    body = metrics.render()
+    if analysis_writer is not None:
+        body += render_stats(metrics.prefix, 'write_behind', analysis_writer.stats(), gauges=('queued',))
+    return Response(body, content_type='text/plain; version=0.0.4; charset=utf-8')
+
+# ✅ CACHE STATS ENDPOINT (result cache at the top level, as before)
+@app.route('/api/cache/stats', methods=['GET'])
+@cross_origin()
+def get_cache_stats():
+    return jsonify(dict(detection_engine.result_cache.stats(), users=user_cache.stats(), alertFeed=alert_feed.stats()))
+
+# ✅ ACTIVE SCAM CAMPAIGNS ENDPOINT (authorities only)
+@app.route('/api/authority/campaigns', methods=['GET'])
+@cross_origin()
+def get_active_campaigns():
+    try:
+        user = cached_user(request.args.get('user_email', ''))
+        if user is None or not user.is_authority:
+            return jsonify({'error': 'Authority access required'}), 403
+        
+        if detection_engine.campaigns is None:
+            return jsonify({'error': 'Campaign tracking is disabled'}), 404
+        
+        limit = min(max(request.args.get('limit', 20, type=int), 1), 100)
+        window = request.args.get('window', app.config['CAMPAIGN_ACTIVE_WINDOW'], type=float)
+        
+        # Campaigns are tracked per server process
+        return jsonify({
+            'campaigns': detection_engine.campaigns.top(limit, window),
+            'stats': detection_engine.campaigns.stats()
+        })
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+# ✅ THREAT ALERT FEED ENDPOINTS
+@app.route('/api/alerts', methods=['GET'])
+@cross_origin()
+def list_threat_alerts():
+    try:
+        is_active = request.args.get('is_active', 'true').lower()
+        if is_active not in ('true', 'false', 'all'):
+            return jsonify({'error': "is_active must be 'true', 'false' or 'all'"}), 400
+        category = request.args.get('category') or None
+        threat_level = request.args.get('threat_level') or None
+        limit = min(max(request.args.get('limit', app.config['ALERT_PAGE_SIZE'], type=int), 1), 200)
+        cursor = request.args.get('cursor', type=int)
+        
+        key = (is_active, category, threat_level, limit, cursor)
+        page = alert_feed.get(key)
+        if page is None:
+            generation = alert_feed.generation
+            body = json.dumps(alert_page(is_active, category, threat_level, limit, cursor)).encode('utf-8')
+            page = alert_feed.put(key, generation, body)
+        body, etag = page
+        
+        if request.if_none_match.contains(etag):
+            response = Response(status=304)
+        else:
+            response = Response(body, content_type='application/json')
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'no-cache'
+        return response
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/alerts', methods=['POST'])
+@cross_origin()
+def create_threat_alert():
+    try:
+        data = request.get_json()
+        user = cached_user(data.get('user_email', ''))
+        if user is None or not user.is_authority:
+            return jsonify({'error': 'Authority access required'}), 403
+        
+        title = (data.get('title') or '').strip()
+        description = (data.get('description') or '').strip()
+        category = (data.get('category') or '').strip()
+        threat_level = (data.get('threat_level') or '').lower()
+        if not all([title, description, category]):
+            return jsonify({'error': 'Title, description and category required'}), 400
+        if threat_level not in THREAT_LEVELS:
+            return jsonify({'error': f"threat_level must be one of: {', '.join(THREAT_LEVELS)}"}), 400
+        
+        alert = ThreatAlert(
+            authority_id=user.id, title=title[:200], description=description,
+            threat_level=threat_level, category=category[:50]
+        )
+        db.session.add(alert)
+        db.session.commit()
+        alert_feed.invalidate()
+        
+        return jsonify(alert_json(alert, user.name)), 201
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/alerts/<int:alert_id>', methods=['PATCH'])
+@cross_origin()
+def update_threat_alert(alert_id):
+    try:
+        data = request.get_json()
+        user = cached_user(data.get('user_email', ''))
+        if user is None or not user.is_authority:
+            return jsonify({'error': 'Authority access required'}), 403
+        
+        if not isinstance(data.get('is_active'), bool):
+            return jsonify({'error': 'is_active (true or false) required'}), 400
+        
+        alert = db.session.get(ThreatAlert, alert_id)
+        if alert is None:
+            return jsonify({'error': 'Alert not found'}), 404
+        
+        alert.is_active = data['is_active']
+        db.session.commit()
+        alert_feed.invalidate()
+        
+        author = db.session.get(User, alert.authority_id)
+        return jsonify(alert_json(alert, author.name if author else None))
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+def alert_page(is_active, category, threat_level, limit, cursor):
+    """One page of alerts, newest first, starting below the ``cursor`` id"""
+    query = select(ThreatAlert, User.name).join(User, User.id == ThreatAlert.authority_id)
+    if is_active != 'all':
+        query = query.where(ThreatAlert.is_active == (is_active == 'true'))
+    if category is not None:
+        query = query.where(ThreatAlert.category == category)
+    if threat_level is not None:
+        query = query.where(ThreatAlert.threat_level == threat_level)
+    if cursor is not None:
+        query = query.where(ThreatAlert.id < cursor)
+    
+    # One extra row tells whether another page follows
+    rows = db.session.execute(query.order_by(ThreatAlert.id.desc()).limit(limit + 1)).all()
+    alerts = [alert_json(alert, author) for alert, author in rows[:limit]]
+    return {
+        'alerts': alerts,
+        'nextCursor': alerts[-1]['id'] if len(rows) > limit else None
+    }
+
+def alert_json(alert, author):
+    return {
+        'id': alert.id,
+        'title': alert.title,
+        'description': alert.description,
+        'threatLevel': alert.threat_level,
+        'category': alert.category,
+        'isActive': alert.is_active,
+        'createdAt': alert.created_at.isoformat(),
+        'authority': author
+    }
 
 # ✅ FIX /api/user/stats ENDPOINT
 @app.route('/api/user/stats/<email>', methods=['GET'])
 @cross_origin()
 def get_user_stats(email):
     try:
-        user = User.query.filter_by(email=email).first()
-        if not user:
-            user = User(email=email, name="User")
-            db.session.add(user)
-            db.session.commit()
+        user = get_or_create_user(email, "User")
         
-        analyses = Analysis.query.filter_by(user_id=user.id).all()
+        monthly = UserMonthlyStats.query.filter_by(user_id=user.id).order_by(
+            UserMonthlyStats.year, UserMonthlyStats.month
+        ).all()
+        total = sum(row.analysis_count for row in monthly)
+        
+        # Newest ten, returned oldest first
+        recent = Analysis.query.filter_by(user_id=user.id).order_by(
+            Analysis.created_at.desc(), Analysis.id.desc()
+        ).limit(10).all()[::-1]
         
         stats = {
-            'totalAnalyses': len(analyses),
-            'averageScamRisk': sum(a.scam_risk for a in analyses) / len(analyses) if analyses else 0,
-            'averageCredibility': sum(a.credibility_score for a in analyses) / len(analyses) if analyses else 0,
+            'totalAnalyses': total,
+            'averageScamRisk': sum(row.scam_risk_total for row in monthly) / total if total else 0,
+            'averageCredibility': sum(row.credibility_total for row in monthly) / total if total else 0,
             'isAuthority': getattr(user, 'is_authority', False),
             'authorityType': getattr(user, 'authority_level', None),
             'authorityLevel': getattr(user, 'authority_level', 'citizen'),
@@ -216,9 +1133,9 @@ def get_user_stats(email):
                     'scamRisk': a.scam_risk,
                     'credibilityScore': a.credibility_score
                 }
-                for a in analyses[-10:]
+                for a in recent
             ],
-            'chartData': generate_chart_data(analyses)
+            'chartData': generate_chart_data(monthly, recent)
         }
         
         return jsonify(stats)
@@ -227,38 +1144,76 @@ def get_user_stats(email):
         print(f"Stats error: {e}")
         return jsonify({'error': str(e)}), 500
 
-def generate_chart_data(analyses):
-    """Generate data for charts"""
-    if not analyses:
+def generate_chart_data(monthly, recent):
+    """Generate data for charts from the user's monthly rollup rows, oldest first"""
+    if not monthly:
         return {
             'monthly': [],
             'threatLevels': [{'level': 'low', 'count': 0}, {'level': 'medium', 'count': 0}, {'level': 'high', 'count': 0}],
             'credibilityTrend': []
         }
     
+    # Months are keyed by name only, in order of first appearance
     monthly_counts = {}
     threat_levels = {'low': 0, 'medium': 0, 'high': 0}
     
-    for analysis in analyses:
-        month = analysis.created_at.strftime('%b')
-        monthly_counts[month] = monthly_counts.get(month, 0) + 1
-        
-        if analysis.scam_risk < 30:
-            threat_levels['low'] += 1
-        elif analysis.scam_risk < 70:
-            threat_levels['medium'] += 1
-        else:
-            threat_levels['high'] += 1
+    for row in monthly:
+        month = datetime(2000, row.month, 1).strftime('%b')
+        monthly_counts[month] = monthly_counts.get(month, 0) + row.analysis_count
+        threat_levels['low'] += row.low_count
+        threat_levels['medium'] += row.medium_count
+        threat_levels['high'] += row.high_count
     
     return {
         'monthly': [{'month': k, 'count': v} for k, v in monthly_counts.items()],
         'threatLevels': [{'level': k, 'count': v} for k, v in threat_levels.items()],
         'credibilityTrend': [
             {'date': a.created_at.strftime('%m/%d'), 'score': a.credibility_score}
-            for a in analyses[-10:]
+            for a in recent
         ]
     }
 
+def add_missing_columns():
+    """Add nullable columns declared after a table was first created; create_all skips existing tables"""
+    inspector = inspect(db.engine)
+    with db.engine.begin() as connection:
+        for table in db.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {column['name'] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in existing and column.nullable:
+                    column_type = column.type.compile(dialect=db.engine.dialect)
+                    connection.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}'))
+
+def create_indexes():
+    """Add indexes declared after a table was first created, and rebuild those
+    whose columns changed; create_all skips existing tables
+    """
+    inspector = inspect(db.engine)
+    for table in db.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {index['name']: index['column_names'] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            columns = existing.get(index.name)
+            if columns is not None and columns != [column.name for column in index.columns]:
+                index.drop(db.engine)
+                columns = None
+            if columns is None:
+                index.create(db.engine)
+
+def init_db(backfill_stats=True):
+    """Bring the schema up to date and, the first time a database with
+    analyses meets the rollup, backfill it; run before serving or any
+    command that touches the database
+    """
+    db.create_all()
+    add_missing_columns()
+    create_indexes()
+    if backfill_stats and not UserMonthlyStats.query.first() and Analysis.query.first():
+        rebuild_monthly_stats()
+
 # ✅ ENHANCED CHAT ENDPOINT
 @app.route('/api/chat', methods=['POST'])
 @cross_origin()
@@ -272,11 +1227,14 @@ def chat_with_ai():
         if not user_message or not user_email:
             return jsonify({'error': 'Message and user email required'}), 400
         
-        user = User.query.filter_by(email=user_email).first()
-        if not user:
-            user = User(email=user_email, name=data.get('user_name', 'Unknown'))
-            db.session.add(user)
-            db.session.commit()
+        user = get_or_create_user(user_email, data.get('user_name', 'Unknown'))
+        
+        if data.get('stream'):
+            return Response(
+                stream_with_context(stream_ai_response(user_message, user.name, api_key)),
+                content_type='text/event-stream',
+                headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+            )
         
         # Generate AI response
         bot_response = generate_ai_response_with_key(user_message, user.name, api_key)
@@ -290,6 +1248,18 @@ def chat_with_ai():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+def chat_messages(message, user_name):
+    return [
+        {
+            "role": "system",
+            "content": f"You are Xist AI, an expert digital safety assistant helping {user_name}. Provide helpful, accurate advice about scams, cybersecurity, and online safety."
+        },
+        {
+            "role": "user",
+            "content": message
+        }
+    ]
+
 def generate_ai_response_with_key(message, user_name, api_key):
     """Generate AI responses using user's API key"""
     
@@ -297,43 +1267,35 @@ def generate_ai_response_with_key(message, user_name, api_key):
         return generate_fallback_response(message, user_name)
     
     try:
-        headers = {
-            "Authorization": f"Bearer {api_key}",
-            "Content-Type": "application/json"
-        }
-        
-        payload = {
-            "model": "deepseek/deepseek-r1:free",
-            "messages": [
-                {
-                    "role": "system",
-                    "content": f"You are Xist AI, an expert digital safety assistant helping {user_name}. Provide helpful, accurate advice about scams, cybersecurity, and online safety."
-                },
-                {
-                    "role": "user",
-                    "content": message
-                }
-            ],
-            "max_tokens": 300,
-            "temperature": 0.7
-        }
-        
-        response = requests.post(
-            "https://openrouter.ai/api/v1/chat/completions",
-            headers=headers,
-            json=payload,
-            timeout=15
-        )
-        
-        if response.status_code == 200:
-            result = response.json()
-            return result["choices"][0]["message"]["content"]
-        else:
-            return generate_fallback_response(message, user_name)
-            
-    except Exception as e:
+        return llm_client.complete(api_key, chat_messages(message, user_name), max_tokens=300, temperature=0.7)
+    except LLMUnavailable:
         return generate_fallback_response(message, user_name)
 
+def stream_ai_response(message, user_name, api_key):
+    """Server-sent events: one ``token`` event per upstream chunk, then ``done``.
+
+    If upstream cannot start (no key, circuit open, error) the fallback
+    response is sent as a single token; if it fails mid-stream the event
+    stream ends with an ``error`` field after the tokens already sent.
+    """
+    def event(payload):
+        return f"data: {json.dumps(payload)}\n\n"
+    
+    sent = False
+    try:
+        if not api_key:
+            raise LLMUnavailable('No API key')
+        for token in llm_client.stream(api_key, chat_messages(message, user_name), max_tokens=300, temperature=0.7):
+            sent = True
+            yield event({'token': token})
+    except LLMUnavailable as e:
+        if sent:
+            yield event({'done': True, 'error': str(e), 'user': user_name})
+            return
+        yield event({'token': generate_fallback_response(message, user_name)})
+    
+    yield event({'done': True, 'timestamp': datetime.utcnow().isoformat(), 'user': user_name})
+
 def generate_fallback_response(message, user_name):
     """Fallback when API unavailable"""
     message_lower = message.lower()
@@ -378,6 +1340,7 @@ def verify_government_id():
             user.department = department
             user.badge_number = badge_number
             db.session.commit()
+            user_cache.invalidate(user_email)
             
             return jsonify({
                 'success': True,
@@ -405,7 +1368,19 @@ def verify_government_credentials(gov_id, id_type):
     
     return False
 
+def warm_up():
+    """Compile patterns and prime lazily loaded dependencies before serving traffic"""
+    detection_engine.warm_up()
+    # Spawned detection workers re-import a main app.py as __mp_main__ and must
+    # not start pools of their own; uvicorn's spawned server workers import
+    # it as app and each warm their pool
+    if detection_engine.executor is not None and __name__ != '__mp_main__':
+        detection_engine.executor.start(detection_engine)
+
+if app.config['WARM_UP_ON_START']:
+    warm_up()
+
 if __name__ == '__main__':
     with app.app_context():
-        db.create_all()
+        init_db()
     app.run(debug=True, port=5000, host='127.0.0.1')
@@ -0,0 +1,389 @@
+# ASGI serving mode: uvicorn asgi:app --port 5000 [--workers N]
+#
+# /api/analyze and /api/chat run natively on the event loop: detection and
+# DB work are awaited on the thread pool (detection goes on to the
+# engine's process pool when DETECTION_WORKERS is set), and upstream chat
+# calls are awaited on a pooled async HTTP client. /api/analyze/stream is
+# native too, so uploads and results flow through without being buffered.
+# Every other route is served by the Flask app itself on the thread pool,
+# so request and response contracts stay those of app.py.
+import asyncio
+import io
+import json
+import tempfile
+import threading
+import time
+from contextlib import asynccontextmanager
+from datetime import datetime
+from itertools import islice
+
+import anyio
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.responses import JSONResponse, Response, StreamingResponse
+from starlette.routing import Route
+from werkzeug.test import EnvironBuilder
+
+import app as backend
+from app import app as flask_app, db, detection_engine, metrics
+from bulk_ingest import FORMATS, detect_format, read_records, analyze_stream
+from llm_client import AsyncLLMClient, CircuitBreaker, LLMUnavailable
+from write_behind import QueueFull
+
+llm_client = None
+
+
+def _detect(content, user_name, layers):
+    timings = {}
+    result = detection_engine.analyze_comprehensive(content, user_name, layers=layers, timings=timings)
+    return result, timings
+
+
+def _user_identity(email, name):
+    with flask_app.app_context():
+        user = backend.get_or_create_user(email, name)
+        return user.id, user.name
+
+
+async def user_identity(email, name):
+    """(id, name) of the user, from the user cache without a thread hop when possible"""
+    user = backend.user_cache.get(email)
+    if user is not None:
+        return user.id, user.name
+    return await run_in_threadpool(_user_identity, email, name)
+
+
+def _persist(records):
+    with flask_app.app_context():
+        backend.persist_analyses(records)
+
+
+async def analyze_content(request):
+    try:
+        data = await request.json()
+        content = data.get('content', '')
+        user_email = data.get('user_email', '')
+
+        if not content or not user_email:
+            return JSONResponse({'error': 'Content and user email required'}, 400)
+
+        try:
+            layers = backend.requested_layers(data)
+        except ValueError as e:
+            return JSONResponse({'error': str(e)}, 400)
+
+        user_id, user_name = await user_identity(user_email, data.get('user_name', 'Unknown'))
+
+        started = time.perf_counter()
+        result, timings = await run_in_threadpool(_detect, content, user_name, layers)
+        timings['analysis'] = time.perf_counter() - started
+
+        started = time.perf_counter()
+        try:
+            await run_in_threadpool(_persist, [backend.analysis_record(user_id, content, result)])
+        except QueueFull as e:
+            return JSONResponse({'error': str(e)}, 503)
+        timings['db_write'] = time.perf_counter() - started
+
+        metrics.observe_all('analysis_stage', timings, endpoint='analyze')
+        if data.get('debug') or request.query_params.get('debug') == '1':
+            result['debug'] = {'timingsMs': backend.timings_ms(timings)}
+
+        return JSONResponse(result)
+
+    except Exception as e:
+        return JSONResponse({'error': str(e)}, 500)
+
+
+async def chat_with_ai(request):
+    try:
+        data = await request.json()
+        user_message = data.get('message', '')
+        user_email = data.get('user_email', '')
+        api_key = data.get('api_key', '')
+
+        if not user_message or not user_email:
+            return JSONResponse({'error': 'Message and user email required'}, 400)
+
+        _, user_name = await user_identity(user_email, data.get('user_name', 'Unknown'))
+
+        if data.get('stream'):
+            return StreamingResponse(
+                stream_ai_response(user_message, user_name, api_key),
+                media_type='text/event-stream',
+                headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+            )
+
+        bot_response = backend.generate_fallback_response(user_message, user_name)
+        if api_key:
+            try:
+                bot_response = await llm_client.complete(
+                    api_key, backend.chat_messages(user_message, user_name), max_tokens=300, temperature=0.7
+                )
+            except LLMUnavailable:
+                pass
+
+        return JSONResponse({
+            'response': bot_response,
+            'timestamp': datetime.utcnow().isoformat(),
+            'user': user_name
+        })
+
+    except Exception as e:
+        return JSONResponse({'error': str(e)}, 500)
+
+
+async def stream_ai_response(message, user_name, api_key):
+    """Async twin of app.stream_ai_response, with the same events"""
+    def event(payload):
+        return f"data: {json.dumps(payload)}\n\n"
+
+    sent = False
+    try:
+        if not api_key:
+            raise LLMUnavailable('No API key')
+        async for token in llm_client.stream(
+            api_key, backend.chat_messages(message, user_name), max_tokens=300, temperature=0.7
+        ):
+            sent = True
+            yield event({'token': token})
+    except LLMUnavailable as e:
+        if sent:
+            yield event({'done': True, 'error': str(e), 'user': user_name})
+            return
+        yield event({'token': backend.generate_fallback_response(message, user_name)})
+
+    yield event({'done': True, 'timestamp': datetime.utcnow().isoformat(), 'user': user_name})
+
+
+class RequestBody(io.RawIOBase):
+    """Blocking file view of a request body for a worker thread: each read
+    awaits the next chunk on the event loop, so a chunk at most is buffered
+    """
+
+    def __init__(self, chunks):
+        self._chunks = chunks
+        self._pending = memoryview(b'')
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        while not self._pending:
+            chunk = anyio.from_thread.run(self._next_chunk)
+            if chunk is None:
+                return 0
+            self._pending = memoryview(chunk)
+        size = min(len(buffer), len(self._pending))
+        buffer[:size] = self._pending[:size]
+        self._pending = self._pending[size:]
+        return size
+
+    async def _next_chunk(self):
+        try:
+            return await self._chunks.__anext__()
+        except StopAsyncIteration:
+            return None
+
+
+class OutputSpool:
+    """Output lines written by a worker thread and read on the event loop
+    through a temporary file. Most HTTP clients send their whole body before
+    reading the response, so a bounded queue would stall scoring, and with it
+    the upload; spooled to disk, memory stays bounded either way.
+    """
+
+    def __init__(self):
+        self._file = tempfile.TemporaryFile()
+        self._lock = threading.Lock()
+        self._written = 0
+        self._done = False
+        self._closed = False
+        self._loop = asyncio.get_running_loop()
+        self._ready = asyncio.Event()
+
+    def write(self, line):
+        data = line.encode()
+        with self._lock:
+            if self._closed:
+                raise BrokenPipeError('The response is closed')
+            self._file.seek(self._written)
+            self._file.write(data)
+            self._written += len(data)
+        self._loop.call_soon_threadsafe(self._ready.set)
+
+    def finish(self):
+        self._done = True
+        self._loop.call_soon_threadsafe(self._ready.set)
+
+    async def chunks(self, size=65536):
+        position = 0
+        try:
+            while True:
+                self._ready.clear()
+                # Read before the size: once done, nothing more is written
+                done = self._done
+                with self._lock:
+                    self._file.seek(position)
+                    chunk = self._file.read(min(size, self._written - position))
+                if chunk:
+                    position += len(chunk)
+                    yield chunk
+                elif done:
+                    return
+                else:
+                    await self._ready.wait()
+        finally:
+            with self._lock:
+                self._closed = True
+                self._file.close()
+
+
+class NDJSONStream(Response):
+    """Body chunks from an async iterator, sent as they come. Unlike
+    StreamingResponse it does not listen for a disconnect, which would
+    consume the request body the handler is still reading.
+    """
+    media_type = 'application/x-ndjson'
+
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.status_code = 200
+        self.background = None
+        self.init_headers()
+
+    async def __call__(self, scope, receive, send):
+        await send({'type': 'http.response.start', 'status': self.status_code, 'headers': self.raw_headers})
+        async for chunk in self.chunks:
+            await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+        await send({'type': 'http.response.body', 'body': b'', 'more_body': False})
+
+
+def _ingest(body, fmt, job, user_email, spool):
+    """Score a streamed upload on a worker thread, writing NDJSON to ``spool``"""
+    def emit(item):
+        spool.write(json.dumps(item) + '\n')
+
+    def store(scored, consumed, offset):
+        backend.store_ingest_batch(job, user_email, scored, consumed)
+
+    with flask_app.app_context():
+        try:
+            checkpoint = db.session.get(backend.IngestCheckpoint, job) if job else None
+            skip = checkpoint.records if checkpoint is not None else 0
+            records = islice(read_records(body, fmt), skip, None)
+            for item in analyze_stream(records, detection_engine, store, flask_app.config['INGEST_BATCH_SIZE'], skip):
+                emit(item)
+        except BrokenPipeError:
+            # The response is gone; committed batches keep their checkpoint
+            pass
+        except Exception as e:
+            try:
+                emit({'error': str(e)})
+            except BrokenPipeError:
+                pass
+        finally:
+            spool.finish()
+
+
+async def ingest_chunks(request, fmt, job, user_email):
+    spool = OutputSpool()
+    body = io.BufferedReader(RequestBody(request.stream()))
+    async with anyio.create_task_group() as task_group:
+        task_group.start_soon(run_in_threadpool, _ingest, body, fmt, job, user_email, spool)
+        async for chunk in spool.chunks():
+            yield chunk
+
+
+async def analyze_stream_endpoint(request):
+    """Native twin of app.analyze_stream_endpoint, with the same parameters
+    and output: the body is read and results are sent while the rows are
+    scored, so neither is held in memory whole
+    """
+    user_email = request.query_params.get('user_email', '')
+    if not user_email:
+        return JSONResponse({'error': 'User email required'}, 400)
+
+    fmt = request.query_params.get('format') or detect_format(content_type=request.headers.get('content-type', ''))
+    if fmt not in FORMATS:
+        return JSONResponse({'error': f"Format must be one of: {', '.join(FORMATS)}"}, 400)
+
+    return NDJSONStream(ingest_chunks(request, fmt, request.query_params.get('job') or None, user_email))
+
+
+def _dispatch_to_flask(method, path, query_string, headers, body):
+    environ = EnvironBuilder(
+        path=path, method=method, query_string=query_string, headers=headers, data=body
+    ).get_environ()
+    with flask_app.request_context(environ):
+        response = flask_app.full_dispatch_request()
+        return response.status_code, response.headers.to_wsgi_list(), response.get_data()
+
+
+async def flask_fallback(request):
+    """Serve any other route through the Flask app on the thread pool"""
+    status, headers, body = await run_in_threadpool(
+        _dispatch_to_flask,
+        request.method,
+        request.url.path,
+        request.url.query,
+        [(name.decode('latin-1'), value.decode('latin-1')) for name, value in request.headers.raw],
+        await request.body()
+    )
+    response = Response(body, status_code=status)
+    response.raw_headers = [
+        (name.lower().encode('latin-1'), value.encode('latin-1'))
+        for name, value in headers if name.lower() != 'content-length'
+    ] + [(b'content-length', str(len(body)).encode())]
+    return response
+
+
+@asynccontextmanager
+async def lifespan(_):
+    global llm_client
+    llm_client = AsyncLLMClient(
+        flask_app.config['OPENROUTER_BASE_URL'],
+        flask_app.config['OPENROUTER_MODEL'],
+        connect_timeout=flask_app.config['OPENROUTER_CONNECT_TIMEOUT'],
+        read_timeout=flask_app.config['OPENROUTER_READ_TIMEOUT'],
+        pool_size=flask_app.config['OPENROUTER_POOL_SIZE'],
+        breaker=CircuitBreaker(
+            failure_threshold=flask_app.config['OPENROUTER_BREAKER_FAILURES'],
+            reset_timeout=flask_app.config['OPENROUTER_BREAKER_RESET']
+        )
+    )
+    with flask_app.app_context():
+        backend.init_db()
+    await run_in_threadpool(backend.warm_up)
+
+    yield
+
+    await llm_client.aclose()
+    if detection_engine.executor is not None:
+        detection_engine.executor.shutdown()
+    if backend.analysis_writer is not None:
+        backend.analysis_writer.close()
+
+
+methods = ['GET', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS']
+app = Starlette(
+    routes=[
+        Route('/api/analyze', analyze_content, methods=['POST']),
+        Route('/api/chat', chat_with_ai, methods=['POST']),
+        Route('/api/analyze/stream', analyze_stream_endpoint, methods=['POST']),
+        Route('/{path:path}', flask_fallback, methods=methods),
+    ],
+    middleware=[
+        Middleware(
+            CORSMiddleware,
+            allow_origins=['http://localhost:3000', 'http://127.0.0.1:3000'],
+            allow_methods=methods,
+            allow_headers=['Content-Type', 'Authorization', 'If-None-Match'],
+            expose_headers=['ETag'],
+            allow_credentials=True
+        )
+    ],
+    lifespan=lifespan
+)
@@ -0,0 +1,151 @@
+"""Threat alert feed read cost: 304 polls, cached pages and fresh queries.
+
+A SQLite file is seeded with --alerts alerts (4 threat levels, 12
+categories, one in four inactive). --pollers threads then GET
+/api/alerts for --seconds through the Flask test client, each polling a
+random one of a handful of dashboard filters. Polls run three ways:
+with the page cache off, so every poll queries and serializes; with the
+cache on; and with the cache on and If-None-Match, so unchanged pages
+answer 304 with no body. During each run one alert is created every
+--write-every seconds to exercise invalidation.
+
+Also reported: the time for one deep page (--depth pages down) with
+keyset pagination, next to the equivalent OFFSET query.
+
+Usage: python benchmarks/bench_alerts.py [--alerts N] [--pollers N] [--seconds S] [--write-every S] [--depth N]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PROBE = """
+import json, os, random, sys, tempfile, threading, time
+from datetime import datetime, timedelta
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'bench.db')
+sys.path.insert(0, os.getcwd())
+from sqlalchemy import text
+from app import app, db, User, ThreatAlert, create_indexes
+
+alerts, pollers, seconds, write_every, depth, mode = (
+    int(sys.argv[1]), int(sys.argv[2]), float(sys.argv[3]), float(sys.argv[4]), int(sys.argv[5]), sys.argv[6]
+)
+levels = ['low', 'medium', 'high', 'critical']
+categories = [f'category-{n}' for n in range(12)]
+with app.app_context():
+    db.create_all()
+    create_indexes()
+    db.session.add(User(email='gov@example.com', name='Bench', is_authority=True, authority_level='authority'))
+    db.session.commit()
+    rng = random.Random(1)
+    start = datetime(2024, 1, 1)
+    db.session.execute(ThreatAlert.__table__.insert(), [
+        {'authority_id': 1, 'title': f'Alert {n}', 'description': 'Reported scam wave ' * 8,
+         'threat_level': rng.choice(levels), 'category': rng.choice(categories),
+         'is_active': n % 4 != 0, 'created_at': start + timedelta(minutes=n)}
+        for n in range(alerts)
+    ])
+    db.session.commit()
+    db.session.execute(text('ANALYZE'))
+
+    if mode == 'depth':
+        query = "SELECT id FROM threat_alert WHERE is_active = 1 AND threat_level = 'high' ORDER BY id DESC"
+        ids = [row[0] for row in db.session.execute(text(query))]
+        cursor = ids[depth * 50 - 1]
+        timings = {}
+        for name, sql, params in (
+            ('keyset', query.replace('ORDER', 'AND id < :cursor ORDER') + ' LIMIT 50', {'cursor': cursor}),
+            ('offset', query + ' LIMIT 50 OFFSET :offset', {'offset': depth * 50}),
+        ):
+            started = time.perf_counter()
+            for _ in range(200):
+                db.session.execute(text(sql), params).all()
+            timings[name] = (time.perf_counter() - started) / 200 * 1000
+        print(json.dumps(timings))
+        sys.exit()
+
+filters = ['', '?threat_level=critical', '?category=category-3', '?category=category-5&threat_level=high', '?limit=20']
+counts = {'200': 0, '304': 0, 'other': 0}
+latencies = []
+stop_at = time.perf_counter() + seconds
+
+def poller(seed):
+    client = app.test_client()
+    rng = random.Random(seed)
+    etags, local = {}, []
+    while time.perf_counter() < stop_at:
+        url = '/api/alerts' + rng.choice(filters)
+        headers = {'If-None-Match': etags[url]} if mode == 'etag' and url in etags else {}
+        started = time.perf_counter()
+        response = client.get(url, headers=headers)
+        local.append(time.perf_counter() - started)
+        if response.status_code == 200:
+            etags[url] = response.headers['ETag']
+        key = str(response.status_code)
+        counts[key if key in counts else 'other'] += 1
+    latencies.extend(local)
+
+threads = [threading.Thread(target=poller, args=(n,)) for n in range(pollers)]
+for thread in threads:
+    thread.start()
+writer = app.test_client()
+writes = 0
+while time.perf_counter() < stop_at:
+    time.sleep(write_every)
+    writer.post('/api/alerts', json={'user_email': 'gov@example.com', 'title': 'New alert',
+                                     'description': 'Fresh report', 'category': 'category-3', 'threat_level': 'high'})
+    writes += 1
+for thread in threads:
+    thread.join()
+
+latencies.sort()
+print(json.dumps({
+    'rate': len(latencies) / seconds,
+    'p50_ms': latencies[len(latencies) // 2] * 1000,
+    'p99_ms': latencies[int(len(latencies) * 0.99)] * 1000,
+    'counts': counts,
+    'writes': writes
+}))
+"""
+
+
+def run(args, mode, environment=None):
+    env = dict(os.environ)
+    env.update(environment or {})
+    output = subprocess.run(
+        [sys.executable, '-c', PROBE, str(args.alerts), str(args.pollers), str(args.seconds),
+         str(args.write_every), str(args.depth), mode],
+        cwd=BACKEND, env=env, check=True, capture_output=True, text=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--alerts', type=int, default=100000)
+    parser.add_argument('--pollers', type=int, default=4)
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--write-every', type=float, default=1.0)
+    parser.add_argument('--depth', type=int, default=100)
+    args = parser.parse_args()
+
+    print(f"{args.alerts} alerts, {args.pollers} pollers, {args.seconds:g} s, one write every {args.write_every:g} s")
+    print(f"{'':<24}{'polls/s':>9}{'p50 ms':>9}{'p99 ms':>9}{'200s':>8}{'304s':>8}")
+    for label, mode, environment in (
+        ('page cache off', 'poll', {'ALERT_FEED_MAX_PAGES': '0'}),
+        ('page cache', 'poll', None),
+        ('page cache + ETag', 'etag', None),
+    ):
+        report = run(args, mode, environment)
+        print(f"{label:<24}{report['rate']:>9.0f}{report['p50_ms']:>9.2f}{report['p99_ms']:>9.2f}"
+              f"{report['counts']['200']:>8}{report['counts']['304']:>8}")
+
+    depth = run(args, 'depth')
+    print(f"\npage {args.depth} of 'high' alerts: keyset {depth['keyset']:.3f} ms, OFFSET {depth['offset']:.3f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+"""Per-layer time and per-message allocations of the detection pipeline.
+
+Every message runs through all layers (no result cache, no
+short-circuit). The report gives the mean time per layer and per message
+and the mean peak of Python allocations while one message is scored
+(tracemalloc). --profile adds the functions with the most own time
+(cProfile). With --compare REV the same probe runs on backend/ as of that
+git revision, e.g. ``--compare HEAD~1`` for before/after numbers.
+
+Usage: python benchmarks/bench_analysis_context.py [--messages N] [--compare REV] [--profile]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_startup import BACKEND, export_revision
+
+PROBE = """
+import cProfile, json, pstats, random, sys, time, tracemalloc
+sys.path.insert(0, '.')
+from detection_engine import AdvancedDetectionEngine
+
+samples = [
+    "URGENT: Your account has been suspended. Click here immediately to verify: http://bit.ly/x1",
+    "Congratulations WINNER! You won $5,000. Limited time offer, act now before it expires!",
+    "Doctors hate this miracle cure that big pharma conspiracy wants hidden.",
+    "Hey, are we still on for lunch tomorrow? Let me know what time works.",
+    "The quarterly report is attached. Please review the figures before Friday's meeting.",
+    "Work from home and make $300 a day, no experience necessary! Visit https://192.168.0.7/apply",
+]
+rng = random.Random(42)
+messages = [' '.join(rng.choice(samples) for _ in range(rng.choice([1, 4, 16, 64]))) + f' #{n}'
+            for n in range(int(sys.argv[1]))]
+
+engine = AdvancedDetectionEngine(short_circuit=False)
+engine.warm_up()
+layer_totals = {}
+start = time.perf_counter()
+for content in messages:
+    timings = {}
+    engine.analyze_comprehensive(content, 'Bench', timings=timings)
+    for name, seconds in timings.items():
+        layer_totals[name] = layer_totals.get(name, 0) + seconds
+elapsed = time.perf_counter() - start
+
+tracemalloc.start()
+peak_total = 0
+for content in messages:
+    tracemalloc.reset_peak()
+    baseline = tracemalloc.get_traced_memory()[0]
+    engine.analyze_comprehensive(content, 'Bench')
+    peak_total += tracemalloc.get_traced_memory()[1] - baseline
+tracemalloc.stop()
+
+profile = []
+if sys.argv[2] == '1':
+    profiler = cProfile.Profile()
+    profiler.enable()
+    for content in messages:
+        engine.analyze_comprehensive(content, 'Bench')
+    profiler.disable()
+    stats = pstats.Stats(profiler).stats
+    top = sorted(stats.items(), key=lambda item: item[1][2], reverse=True)[:12]
+    profile = [(pstats.func_std_string(func), calls, own) for func, (_, calls, own, _, _) in top]
+
+print(json.dumps({
+    'message_us': elapsed / len(messages) * 1e6,
+    'layers_us': {name: total / len(messages) * 1e6 for name, total in sorted(layer_totals.items())},
+    'peak_kib': peak_total / len(messages) / 1024,
+    'profile': profile,
+}))
+"""
+
+
+def measure(directory, messages, profile):
+    output = subprocess.run(
+        [sys.executable, '-c', PROBE, str(messages), '1' if profile else '0'],
+        cwd=directory, check=True, capture_output=True, text=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def show(label, report, messages):
+    layers = '  '.join(f"{name} {us:.1f}" for name, us in report['layers_us'].items())
+    print(f"{label:<14}{report['message_us']:8.1f} us/msg  peak alloc {report['peak_kib']:7.1f} KiB/msg")
+    print(f"{'':<14}layers (us): {layers}")
+    for func, calls, own in report['profile']:
+        print(f"{'':<14}{own / messages * 1e6:8.2f} us/msg {calls:>9} calls  {func}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--messages', type=int, default=2000)
+    parser.add_argument('--compare', metavar='REV', help='git revision to measure as the baseline')
+    parser.add_argument('--profile', action='store_true')
+    args = parser.parse_args()
+
+    if args.compare:
+        show(args.compare, measure(export_revision(args.compare), args.messages, args.profile), args.messages)
+    show('working tree', measure(BACKEND, args.messages, args.profile), args.messages)
+
+
+if __name__ == '__main__':
+    main()
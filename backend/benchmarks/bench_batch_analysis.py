@@ -0,0 +1,95 @@
+"""Throughput of POST /api/analyze/batch against looping POST /api/analyze.
+
+Also times ML feature extraction alone: the vectorized batch path against
+the original per-character loop.
+
+Usage: python benchmarks/bench_batch_analysis.py [--messages N] [--batch-size N]
+"""
+import argparse
+import os
+import random
+import re
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'bench.db')
+
+from app import app, db
+from features import extract_features_batch
+
+SAMPLES = [
+    "URGENT: Your account has been suspended. Click here immediately to verify: http://bit.ly/x1",
+    "Congratulations WINNER! You won $5,000. Limited time offer, act now before it expires!",
+    "Doctors hate this miracle cure that big pharma conspiracy wants hidden.",
+    "Hey, are we still on for lunch tomorrow? Let me know what time works.",
+    "The quarterly report is attached. Please review the figures before Friday's meeting.",
+    "Work from home and make $300 a day, no experience necessary!",
+]
+
+
+def make_messages(count):
+    rng = random.Random(42)
+    return [
+        ' '.join(rng.choice(SAMPLES) for _ in range(rng.randint(1, 8)))
+        for _ in range(count)
+    ]
+
+
+def loop_features(content):
+    """The per-character feature extraction the batch path replaced"""
+    words = content.split()
+    return {
+        'word_count': len(words),
+        'char_count': len(content),
+        'avg_word_length': sum(len(word) for word in words) / len(words) if words else 0,
+        'uppercase_ratio': sum(1 for c in content if c.isupper()) / len(content) if content else 0,
+        'punctuation_ratio': sum(1 for c in content if c in '!?.,;:') / len(content) if content else 0,
+        'number_count': len(re.findall(r'\d+', content)),
+        'currency_mentions': len(re.findall(r'[\$€£¥]', content)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--messages', type=int, default=2000)
+    parser.add_argument('--batch-size', type=int, default=500)
+    args = parser.parse_args()
+
+    messages = make_messages(args.messages)
+    with app.app_context():
+        db.create_all()
+    client = app.test_client()
+
+    start = time.perf_counter()
+    for content in messages:
+        response = client.post('/api/analyze', json={'content': content, 'user_email': 'bench@example.com'})
+        assert response.status_code == 200
+    single = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for offset in range(0, len(messages), args.batch_size):
+        chunk = messages[offset:offset + args.batch_size]
+        response = client.post('/api/analyze/batch', json={'messages': chunk, 'user_email': 'bench@example.com'})
+        assert response.status_code == 200 and response.get_json()['errors'] == 0
+    batch = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for content in messages:
+        loop_features(content)
+    features_loop = time.perf_counter() - start
+
+    start = time.perf_counter()
+    extract_features_batch(messages)
+    features_batch = time.perf_counter() - start
+
+    print(f"{len(messages)} messages, batch size {args.batch_size}")
+    print(f"{'single endpoint loop':<28}{len(messages) / single:>10.0f} msg/s")
+    print(f"{'batch endpoint':<28}{len(messages) / batch:>10.0f} msg/s")
+    print(f"{'features, per-char loop':<28}{len(messages) / features_loop:>10.0f} msg/s")
+    print(f"{'features, vectorized':<28}{len(messages) / features_batch:>10.0f} msg/s")
+
+
+if __name__ == '__main__':
+    main()
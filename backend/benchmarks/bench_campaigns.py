@@ -0,0 +1,154 @@
+"""Campaign clustering quality, lookup latency and memory at scale.
+
+Quality: --campaigns templates are sent --copies times each, every copy
+mutated the way scam campaigns mutate (changed amounts and reference
+numbers, a different link path, one or two words swapped, dropped or
+added), shuffled together with as many one-off messages. Recall is the
+share of copies grouped with the majority of their template's copies; a
+false merge is a campaign holding copies of more than one template.
+
+Scale: --messages messages (one in ten a campaign copy, the rest one-off
+text) stream through one CampaignIndex with the default bound of 20000
+campaigns. For each tenth of the stream the report gives observe() p50 and
+p99, the campaigns held and the process RSS, which should level off once
+the bound is reached.
+
+Rescoring: --scored campaign copies go through the detection engine with
+and without the index, with score reuse on (reuse_similarity 0.9); the
+report gives how many were scored in full and the time per message.
+
+Usage: python benchmarks/bench_campaigns.py [--campaigns N] [--copies N] [--messages N] [--scored N]
+"""
+import argparse
+import os
+import random
+import resource
+import string
+import sys
+import time
+from collections import Counter, defaultdict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from campaigns import CampaignIndex
+from detection_engine import AdvancedDetectionEngine
+
+HOOKS = [
+    "URGENT: your account {n} has been suspended, click here immediately to verify",
+    "Congratulations winner! You won ${n} in our draw, claim before it expires",
+    "Final notice: parcel {n} is held at customs, pay the fee now to release it",
+    "Your bank card ending {n} was locked after suspicious activity, confirm your details",
+]
+
+
+def vocabulary(rng, size=5000):
+    return [''.join(rng.choices(string.ascii_lowercase, k=rng.randint(3, 9))) for _ in range(size)]
+
+
+def template(rng, words):
+    body = ' '.join(rng.choices(words, k=rng.randint(12, 30)))
+    return f"{rng.choice(HOOKS)} {body} http://{rng.choice(words)}.example/{{path}}"
+
+
+def mutate(rng, text, words):
+    tokens = text.format(n=rng.randint(100, 999999), path=rng.randint(1, 10 ** 6)).split()
+    for _ in range(rng.randint(1, 2)):
+        position = rng.randrange(5, len(tokens) - 1)
+        action = rng.random()
+        if action < 0.5:
+            tokens[position] = rng.choice(words)
+        elif action < 0.75:
+            del tokens[position]
+        else:
+            tokens.insert(position, rng.choice(words))
+    return ' '.join(tokens)
+
+
+def one_off(rng, words):
+    return ' '.join(rng.choices(words, k=rng.randint(10, 40)))
+
+
+def rss_mb():
+    with open('/proc/self/statm') as handle:
+        return int(handle.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2 ** 20
+
+
+def percentile(values, fraction):
+    return sorted(values)[int(len(values) * fraction)] * 1e6
+
+
+def quality(rng, words, campaigns, copies):
+    templates = [template(rng, words) for _ in range(campaigns)]
+    stream = [(n, mutate(rng, templates[n], words)) for n in range(campaigns) for _ in range(copies)]
+    stream += [(None, one_off(rng, words)) for _ in range(campaigns * copies)]
+    rng.shuffle(stream)
+
+    index = CampaignIndex()
+    assigned = defaultdict(list)
+    members = defaultdict(set)
+    for source, content in stream:
+        match = index.observe(content)
+        if source is not None:
+            assigned[source].append(match.campaign_id)
+        members[match.campaign_id].add(source if source is not None else ('one-off', content))
+
+    grouped = sum(Counter(ids).most_common(1)[0][1] for ids in assigned.values())
+    merges = sum(1 for sources in members.values() if len(sources) > 1)
+    print(f"{campaigns} campaigns x {copies} mutated copies + {campaigns * copies} one-off messages")
+    print(f"  recall {grouped / (campaigns * copies):.3f}, false merges {merges}, "
+          f"campaigns formed {len(members)}")
+
+
+def scale(rng, words, messages):
+    templates = [template(rng, words) for _ in range(1000)]
+    index = CampaignIndex()
+    print(f"\n{'messages':>10}{'p50 us':>9}{'p99 us':>9}{'campaigns':>11}{'RSS MB':>9}")
+    step = max(messages // 10, 1)
+    latencies = []
+    for n in range(1, messages + 1):
+        if n % 10 == 0:
+            content = mutate(rng, rng.choice(templates), words)
+        else:
+            content = one_off(rng, words)
+        started = time.perf_counter()
+        index.observe(content)
+        latencies.append(time.perf_counter() - started)
+        if n % step == 0:
+            print(f"{n:>10}{percentile(latencies, 0.5):>9.0f}{percentile(latencies, 0.99):>9.0f}"
+                  f"{index.stats()['campaigns']:>11}{rss_mb():>9.1f}")
+            latencies = []
+
+
+def rescoring(rng, words, scored):
+    templates = [template(rng, words) for _ in range(max(scored // 50, 1))]
+    # Near-identical copies: only the amount and the link path change
+    contents = [rng.choice(templates).format(n=rng.randint(100, 999), path=rng.randint(1, 10 ** 6))
+                for _ in range(scored)]
+    print(f"\n{scored} copies of {len(templates)} campaigns through the detection engine")
+    for label, campaigns in (('without campaigns', None), ('with campaigns', CampaignIndex(reuse_similarity=0.9))):
+        engine = AdvancedDetectionEngine(campaigns=campaigns)
+        engine.warm_up()
+        started = time.perf_counter()
+        results = [engine.analyze_comprehensive(content, 'Bench') for content in contents]
+        elapsed = time.perf_counter() - started
+        reused = sum(1 for result in results if result.get('campaign', {}).get('reusedScore'))
+        print(f"  {label:<20}scored {scored - reused:>6}, {elapsed / scored * 1e6:>7.0f} us/message")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--campaigns', type=int, default=500)
+    parser.add_argument('--copies', type=int, default=20)
+    parser.add_argument('--messages', type=int, default=1000000)
+    parser.add_argument('--scored', type=int, default=5000)
+    args = parser.parse_args()
+
+    rng = random.Random(1)
+    words = vocabulary(rng)
+    quality(rng, words, args.campaigns, args.copies)
+    rescoring(rng, words, args.scored)
+    scale(rng, words, args.messages)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,163 @@
+"""Exercise the pooled /api/chat upstream client against a local stub server.
+
+The stub speaks the OpenAI-compatible chat completions API, with and
+without ``stream``. Its latency is configurable, and it can be switched to
+answer 500s. Three things are reported:
+
+* throughput and TCP connections opened, comparing a fresh connection per
+  call (the old ``requests.post``) with the pooled LLMClient
+* time to first token against time to full completion for SSE streaming
+  through /api/chat
+* circuit breaker behaviour when upstream fails: how fast callers get the
+  fallback once the breaker is open
+
+Usage: python benchmarks/bench_chat_client.py [--calls N] [--threads N] [--latency SECONDS]
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'bench.db')
+
+import requests
+
+from llm_client import LLMClient, CircuitBreaker, LLMUnavailable
+
+TOKENS = ['Never ', 'share ', 'one-time ', 'codes ', 'with ', 'anyone.']
+
+
+class StubState:
+    latency = 0.02
+    failing = False
+    connections = 0
+    lock = threading.Lock()
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def setup(self):
+        super().setup()
+        with StubState.lock:
+            StubState.connections += 1
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        if StubState.failing:
+            self.send_response(500)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+
+        if body.get('stream'):
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/event-stream')
+            self.send_header('Transfer-Encoding', 'chunked')
+            self.end_headers()
+            for token in TOKENS:
+                time.sleep(StubState.latency / len(TOKENS))
+                chunk = {'choices': [{'delta': {'content': token}}]}
+                self.send_chunk(f'data: {json.dumps(chunk)}\n\n'.encode())
+            self.send_chunk(b'data: [DONE]\n\n')
+            self.send_chunk(b'')
+            return
+
+        time.sleep(StubState.latency)
+        payload = json.dumps({'choices': [{'message': {'content': ''.join(TOKENS)}}]}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def send_chunk(self, data):
+        self.wfile.write(f'{len(data):x}\r\n'.encode() + data + b'\r\n')
+        self.wfile.flush()
+
+
+def start_stub():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f'http://127.0.0.1:{server.server_address[1]}/v1'
+
+
+def run_calls(call, calls, threads):
+    StubState.connections = 0
+    start = time.perf_counter()
+    with ThreadPoolExecutor(threads) as pool:
+        list(pool.map(lambda _: call(), range(calls)))
+    return calls / (time.perf_counter() - start), StubState.connections
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--calls', type=int, default=400)
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--latency', type=float, default=0.02, help='stub response time in seconds')
+    args = parser.parse_args()
+
+    StubState.latency = args.latency
+    server, base_url = start_stub()
+    messages = [{'role': 'user', 'content': 'Is this a scam?'}]
+
+    def fresh_connection():
+        response = requests.post(f'{base_url}/chat/completions', json={'messages': messages}, timeout=15)
+        return response.json()['choices'][0]['message']['content']
+
+    client = LLMClient(base_url, 'stub', pool_size=args.threads)
+    print(f"{args.calls} calls, {args.threads} threads, stub latency {args.latency * 1000:.0f} ms")
+    for label, call in [('new connection per call', fresh_connection),
+                        ('pooled client', lambda: client.complete('key', messages))]:
+        throughput, connections = run_calls(call, args.calls, args.threads)
+        print(f"{label:<26}{throughput:>8.0f} calls/s  {connections:>5} connections opened")
+
+    os.environ['OPENROUTER_BASE_URL'] = base_url
+    import app as backend
+    backend.llm_client = LLMClient(base_url, 'stub')
+    http = backend.app.test_client()
+    with backend.app.app_context():
+        backend.db.create_all()
+
+    start = time.perf_counter()
+    response = http.post('/api/chat', json={
+        'message': 'Is this a scam?', 'user_email': 'bench@example.com', 'api_key': 'key', 'stream': True
+    }, buffered=False)
+    chunks = iter(response.response)
+    first = next(chunks)
+    first_token = time.perf_counter() - start
+    events = [first] + list(chunks)
+    full = time.perf_counter() - start
+    tokens = [json.loads(event[6:]) for event in b''.join(events).decode().split('\n\n') if event]
+    assert ''.join(item.get('token', '') for item in tokens) == ''.join(TOKENS) and tokens[-1]['done']
+    print(f"{'SSE via /api/chat':<26}first token {first_token * 1000:7.1f} ms  complete {full * 1000:7.1f} ms")
+
+    StubState.failing = True
+    breaker = CircuitBreaker(failure_threshold=5, reset_timeout=60)
+    failing_client = LLMClient(base_url, 'stub', breaker=breaker)
+    timings = []
+    for _ in range(20):
+        start = time.perf_counter()
+        try:
+            failing_client.complete('key', messages)
+        except LLMUnavailable:
+            pass
+        timings.append(time.perf_counter() - start)
+    print(f"{'upstream failing':<26}breaker {breaker.state} after {breaker.failure_threshold} failures;"
+          f" first call {timings[0] * 1000:.1f} ms, calls while open {max(timings[5:]) * 1000:.3f} ms")
+
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
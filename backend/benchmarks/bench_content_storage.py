@@ -0,0 +1,125 @@
+"""Database growth per analysis with inline and deduplicated content storage.
+
+A synthetic workload of --rows analyses is written through save_analyses
+in batches of 500, from 100 users, into a fresh SQLite file, once per
+ANALYSIS_CONTENT_STORAGE mode. Most messages are copies of a few thousand
+viral texts (one in 20 a chain letter of several KB), drawn with a
+Zipf-like skew; --unique of them are one-offs. Rows are spread over the
+past year. The report gives the file size and bytes per analysis at each
+tenth of the run, the insert rate and, after ``flask compact-analyses``
+with the default retention (90 days, keep one in ten) and VACUUM, the
+final size.
+
+Usage: python benchmarks/bench_content_storage.py [--rows N] [--unique FRACTION]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PROBE = """
+import json, os, random, sys, time
+from datetime import datetime, timedelta
+sys.path.insert(0, os.getcwd())
+from app import app, db, User, save_analyses, compact_analyses, create_indexes
+from sqlalchemy import text
+
+rows, unique = int(sys.argv[1]), float(sys.argv[2])
+path = os.environ['DATABASE_URL'][len('sqlite:///'):]
+rng = random.Random(1)
+words = [''.join(rng.choices('abcdefghijklmnopqrstuvwxyz', k=rng.randint(2, 9))) for _ in range(3000)]
+hooks = ['URGENT: your account has been suspended, verify now at http://bit.ly/', 'Congratulations! You won $',
+         'Final notice: your parcel is held at customs, pay the fee at http://', 'Hi, are we still meeting on ']
+
+def compose(length):
+    return rng.choice(hooks) + ' '.join(rng.choices(words, k=length))
+
+# One in 20 viral texts is a chain letter of several KB
+viral = [compose(rng.randint(300, 900) if n % 20 == 0 else rng.randint(15, 60)) for n in range(3000)]
+weights = [1 / (rank + 1) for rank in range(len(viral))]
+
+def message():
+    if rng.random() < unique:
+        return compose(rng.randint(15, 60))
+    return rng.choices(viral, weights)[0]
+
+def size():
+    # Committed pages only: the WAL is folded back first
+    db.session.execute(text('PRAGMA wal_checkpoint(TRUNCATE)'))
+    return os.path.getsize(path)
+
+with app.app_context():
+    db.create_all()
+    create_indexes()
+    db.session.add_all([User(email=f'user{n}@example.com', name='Bench') for n in range(100)])
+    db.session.commit()
+    now = datetime.utcnow()
+    limit = app.config['ANALYSIS_CONTENT_MAX_CHARS'] if app.config['ANALYSIS_CONTENT_STORAGE'] == 'dedup' else 500
+    growth = []
+    started = time.perf_counter()
+    for first in range(0, rows, 500):
+        records = []
+        for n in range(first, min(first + 500, rows)):
+            risk = rng.randint(0, 100)
+            records.append({
+                'user_id': rng.randint(1, 100), 'content': message()[:limit], 'scam_risk': risk,
+                'credibility_score': 100 - risk, 'verdict': 'Credible',
+                # Oldest first, over the past year
+                'created_at': now - timedelta(days=365 * (1 - n / rows))
+            })
+        save_analyses(records)
+        db.session.commit()
+        done = first + len(records)
+        if done % (rows // 10) == 0 or done == rows:
+            growth.append((done, size()))
+    elapsed = time.perf_counter() - started
+
+    deleted, texts = compact_analyses(now - timedelta(days=app.config['ANALYSIS_RETENTION_DAYS']),
+                                      app.config['ANALYSIS_RETENTION_KEEP_EVERY'])
+    remaining = db.session.execute(text('SELECT COUNT(*) FROM analysis')).scalar()
+    db.session.commit()
+    db.session.execute(text('VACUUM'))
+    compacted = size()
+print(json.dumps({'growth': growth, 'rate': rows / elapsed, 'deleted': deleted, 'texts': texts,
+                  'remaining': remaining, 'compacted': compacted}))
+"""
+
+
+def run(mode, args):
+    env = dict(os.environ)
+    env['DATABASE_URL'] = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'bench.db')
+    env['ANALYSIS_CONTENT_STORAGE'] = mode
+    output = subprocess.run(
+        [sys.executable, '-c', PROBE, str(args.rows), str(args.unique)],
+        cwd=BACKEND, env=env, check=True, capture_output=True, text=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--unique', type=float, default=0.2)
+    args = parser.parse_args()
+
+    print(f"{args.rows} analyses, {args.unique:.0%} one-off messages")
+    reports = {mode: run(mode, args) for mode in ('inline', 'dedup')}
+    print(f"{'rows':>10}" + ''.join(f"{mode + ' MB':>12}{'B/row':>8}" for mode in reports))
+    for points in zip(*(report['growth'] for report in reports.values())):
+        line = f"{points[0][0]:>10}"
+        for done, size in points:
+            line += f"{size / 2 ** 20:>12.1f}{size / done:>8.0f}"
+        print(line)
+    print()
+    for mode, report in reports.items():
+        print(f"{mode:<8}{report['rate']:>8.0f} rows/s; compaction deleted {report['deleted']} rows and "
+              f"{report['texts']} texts, leaving {report['remaining']} rows in "
+              f"{report['compacted'] / 2 ** 20:.1f} MB ({report['compacted'] / report['remaining']:.0f} B/row)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+"""Detection throughput of a DetectionPool at 1..N workers against in-process scoring.
+
+Engines run with no result cache and without short-circuiting, so every
+message pays for every layer, sentiment included. Each worker count
+scores the same messages through analyze_batch; the results are checked
+against the in-process ones, ignoring processingTime and analysisDate.
+Pool start-up (spawning and warming the workers) is timed separately.
+
+Usage: python benchmarks/bench_detection_pool.py [--messages N] [--max-workers N] [--chunk-size N]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from detection_engine import AdvancedDetectionEngine
+from detection_pool import DetectionPool
+
+SAMPLES = [
+    "URGENT: Your account has been suspended. Click here immediately to verify: http://bit.ly/x1",
+    "Congratulations WINNER! You won $5,000. Limited time offer, act now before it expires!",
+    "Doctors hate this miracle cure that big pharma conspiracy wants hidden.",
+    "Hey, are we still on for lunch tomorrow? Let me know what time works.",
+    "The quarterly report is attached. Please review the figures before Friday's meeting.",
+    "Work from home and make $300 a day, no experience necessary!",
+]
+VOLATILE = ('processingTime', 'analysisDate')
+
+
+def make_messages(count):
+    rng = random.Random(42)
+    return [
+        ' '.join(rng.choice(SAMPLES) for _ in range(rng.randint(1, 8))) + f' #{number}'
+        for number in range(count)
+    ]
+
+
+def comparable(results):
+    return [{key: value for key, value in result.items() if key not in VOLATILE} for result in results]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--messages', type=int, default=2000)
+    parser.add_argument('--max-workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--chunk-size', type=int, default=64)
+    args = parser.parse_args()
+
+    messages = make_messages(args.messages)
+    engine = AdvancedDetectionEngine(short_circuit=False)
+    engine.warm_up()
+    start = time.perf_counter()
+    expected = comparable(engine.analyze_batch(messages, 'Bench'))
+    baseline = len(messages) / (time.perf_counter() - start)
+
+    print(f"{len(messages)} messages, chunk size {args.chunk_size}, {os.cpu_count()} CPUs")
+    print(f"{'workers':<12}{'start s':>10}{'msg/s':>10}{'speedup':>10}")
+    print(f"{'in-process':<12}{'-':>10}{baseline:>10.0f}{1:>10.2f}")
+    for workers in range(1, args.max_workers + 1):
+        pool = DetectionPool(workers, chunk_size=args.chunk_size)
+        engine = AdvancedDetectionEngine(short_circuit=False, executor=pool)
+        try:
+            start = time.perf_counter()
+            pool.start(engine)
+            startup = time.perf_counter() - start
+
+            start = time.perf_counter()
+            results = engine.analyze_batch(messages, 'Bench')
+            throughput = len(messages) / (time.perf_counter() - start)
+        finally:
+            pool.shutdown()
+        assert comparable(results) == expected, f'{workers} workers changed the results'
+        print(f"{workers:<12}{startup:>10.2f}{throughput:>10.0f}{throughput / baseline:>10.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+"""Streaming ingest throughput and memory: `flask ingest` against one request per message.
+
+For each size in --messages a generated NDJSON corpus (mixed scam and
+benign text, 1 in 5 messages from a second user, every message distinct)
+is ingested with ``flask ingest`` in a fresh process into a fresh SQLite
+file. The report gives messages/s and the process's peak RSS, which should
+stay flat as the corpus grows. The baseline posts --baseline messages to
+/api/analyze one by one through the Flask test client, as a client
+without the ingest mode would.
+
+Usage: python benchmarks/bench_ingest.py [--messages 20000,100000] [--batch-size N] [--baseline N]
+"""
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SAMPLES = [
+    "URGENT: Your account has been suspended. Click here immediately to verify: http://bit.ly/x1",
+    "Congratulations WINNER! You won $5,000. Limited time offer, act now before it expires!",
+    "Doctors hate this miracle cure that big pharma conspiracy wants hidden.",
+    "Hey, are we still on for lunch tomorrow? Let me know what time works.",
+    "The quarterly report is attached. Please review the figures before Friday's meeting.",
+]
+
+BASELINE = """
+import json, os, sys, time
+sys.path.insert(0, os.getcwd())
+from app import app, db
+with app.app_context():
+    db.create_all()
+client = app.test_client()
+lines = open(sys.argv[1]).readlines()[:int(sys.argv[2])]
+start = time.perf_counter()
+for line in lines:
+    record = json.loads(line)
+    response = client.post('/api/analyze', json={
+        'content': record['content'], 'user_email': record.get('user_email', 'bulk@example.com')
+    })
+    assert response.status_code == 200
+print(json.dumps({'rate': len(lines) / (time.perf_counter() - start)}))
+"""
+
+
+def write_corpus(path, count):
+    rng = random.Random(count)
+    with open(path, 'w') as handle:
+        for n in range(count):
+            record = {'id': n, 'content': f"{rng.choice(SAMPLES)} ref {n}"}
+            if n % 5 == 0:
+                record['user_email'] = 'feeds@example.com'
+            handle.write(json.dumps(record) + '\n')
+
+
+def environment(directory):
+    env = dict(os.environ)
+    env['DATABASE_URL'] = 'sqlite:///' + os.path.join(directory, 'bench.db')
+    env['FLASK_APP'] = 'app.py'
+    return env
+
+
+def run_ingest(corpus, batch_size):
+    directory = tempfile.mkdtemp()
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'flask', 'ingest', corpus, '--user-email', 'bulk@example.com',
+         '--output', os.path.join(directory, 'results.ndjson'), '--batch-size', str(batch_size)],
+        cwd=BACKEND, env=environment(directory), stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True
+    )
+    # wait4 reports this child's own peak RSS
+    _, status, usage = os.wait4(process.pid, 0)
+    elapsed = time.perf_counter() - start
+    if os.waitstatus_to_exitcode(status) != 0:
+        raise RuntimeError(process.stderr.read())
+    return elapsed, usage.ru_maxrss / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--messages', default='20000,100000')
+    parser.add_argument('--batch-size', type=int, default=500)
+    parser.add_argument('--baseline', type=int, default=2000)
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp()
+    sizes = [int(value) for value in args.messages.split(',')]
+    print(f"{'':<28}{'messages':>10}{'msg/s':>9}{'peak RSS MB':>13}")
+    for size in sizes:
+        corpus = os.path.join(directory, f'corpus-{size}.ndjson')
+        write_corpus(corpus, size)
+        elapsed, peak_mb = run_ingest(corpus, args.batch_size)
+        print(f"{'flask ingest':<28}{size:>10}{size / elapsed:>9.0f}{peak_mb:>13.1f}")
+
+    corpus = os.path.join(directory, f'corpus-{sizes[0]}.ndjson')
+    output = subprocess.run(
+        [sys.executable, '-c', BASELINE, corpus, str(args.baseline)],
+        cwd=BACKEND, env=environment(tempfile.mkdtemp()), check=True, capture_output=True, text=True
+    ).stdout
+    rate = json.loads(output.strip().splitlines()[-1])['rate']
+    print(f"{'POST /api/analyze each':<28}{args.baseline:>10}{rate:>9.0f}{'':>13}")
+
+
+if __name__ == '__main__':
+    main()
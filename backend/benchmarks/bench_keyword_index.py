@@ -0,0 +1,92 @@
+"""Domain keyword lookup: per-keyword substring scans against the KeywordIndex.
+
+For growing keyword lists (the built-in terms plus generated words and
+two-word phrases) the report gives the time to look up one message with
+``keyword in lowered`` per keyword, as _analyze_domain_specific used to,
+and with the index (word tokenization included). Index build time is
+reported separately. It also lists the substring hits that are not whole
+words, such as "cure" in "secure", on the sample messages.
+
+Usage: python benchmarks/bench_keyword_index.py [--messages N] [--sizes 28,1000,10000,50000]
+"""
+import argparse
+import os
+import random
+import string
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from detection_engine import AdvancedDetectionEngine
+from keyword_index import KeywordIndex, keyword_words
+
+SAMPLES = [
+    "URGENT: Your account has been suspended. Click here immediately to verify: http://bit.ly/x1",
+    "Congratulations WINNER! You won $5,000. Limited time offer, act now before it expires!",
+    "Doctors hate this miracle cure that big pharma conspiracy wants hidden.",
+    "Secure your Sloane Street flat today: loans, credit and a mortgage with no debt checks.",
+    "Our supplement ended my diabetes! Weight-loss therapy and binary options trading returns.",
+    "The quarterly report is attached. Please review the investment portfolio before Friday.",
+]
+
+
+def make_keywords(base, size):
+    rng = random.Random(size)
+    keywords = list(base)
+    while len(keywords) < size:
+        word = ''.join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(5, 10)))
+        if rng.random() < 0.2:
+            word += ' ' + ''.join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(4, 8)))
+        keywords.append(word)
+    return keywords[:size]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--messages', type=int, default=2000)
+    parser.add_argument('--sizes', default='28,1000,10000,50000')
+    args = parser.parse_args()
+
+    engine = AdvancedDetectionEngine()
+    base = engine.financial_keywords + engine.medical_keywords
+    rng = random.Random(42)
+    messages = [
+        ' '.join(rng.choice(SAMPLES) for _ in range(rng.randint(1, 8))).lower()
+        for _ in range(args.messages)
+    ]
+
+    print(f"{args.messages} messages")
+    print(f"{'keywords':>10}{'substring us/msg':>18}{'index us/msg':>14}{'build ms':>10}")
+    for size in [int(value) for value in args.sizes.split(',')]:
+        keywords = make_keywords(base, size)
+
+        start = time.perf_counter()
+        for lowered in messages:
+            sum(1 for keyword in keywords if keyword in lowered)
+        substring = (time.perf_counter() - start) / len(messages)
+
+        start = time.perf_counter()
+        index = KeywordIndex({'domain': keywords})
+        build = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for lowered in messages:
+            index.find(keyword_words(lowered))
+        indexed = (time.perf_counter() - start) / len(messages)
+
+        print(f"{size:>10}{substring * 1e6:>18.1f}{indexed * 1e6:>14.1f}{build * 1000:>10.1f}")
+
+    index = KeywordIndex({'domain': base})
+    print("substring hits that are not whole words:")
+    for sample in SAMPLES:
+        lowered = sample.lower()
+        partial = sorted(
+            {keyword for keyword in base if keyword in lowered} - index.find(keyword_words(lowered))['domain']
+        )
+        if partial:
+            print(f"  {', '.join(partial):<24}{sample[:60]}")
+
+
+if __name__ == '__main__':
+    main()
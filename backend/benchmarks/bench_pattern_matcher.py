@@ -0,0 +1,89 @@
+"""Benchmark the single-pass PatternMatcher against the per-pattern re.search loop.
+
+Usage: python benchmarks/bench_pattern_matcher.py [--max-size BYTES] [--repeat N] [--budget SECONDS] [--full]
+
+The "bounded" column is PatternMatcher.scan with --budget, followed by the
+mode it finished in (exact, or proximity once the budget ran out).
+
+The re loop backtracks quadratically on long single-line pastes (about two
+minutes at 100 KB), so by default it is skipped past 10 KB on that corpus.
+"""
+import argparse
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from detection_engine import AdvancedDetectionEngine
+from pattern_matcher import PatternMatcher
+
+PROSE = (
+    "Hi team, the quarterly report is attached. Please review the numbers before "
+    "the meeting and let me know if anything looks off.\n"
+    "Congratulations to everyone who helped close the account migration on time.\n"
+)
+SCAM = (
+    "URGENT: your account will be suspended. Action is required, click here to verify "
+    "your account now. You won a prize, they don't want you to know, act fast "
+)
+SIZES = [1_000, 10_000, 100_000, 1_000_000]
+
+
+def build_message(chunk, size):
+    return (chunk * (size // len(chunk) + 1))[:size]
+
+
+def loop_match(patterns, text):
+    return {pattern for pattern in patterns if re.search(pattern, text)}
+
+
+def timed(func, repeat):
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--max-size', type=int, default=1_000_000)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--budget', type=float, default=0.05, help='time budget for the bounded scan')
+    parser.add_argument('--full', action='store_true', help='run the re loop at every size')
+    args = parser.parse_args()
+
+    engine = AdvancedDetectionEngine()
+    patterns = engine.scam_patterns + engine.misinfo_patterns
+    matcher = PatternMatcher([(pattern, pattern) for pattern in patterns])
+
+    # corpus name -> (repeated chunk, largest size the re loop is run at)
+    corpora = {
+        'prose (multi-line)': (PROSE, None),
+        'scam paste (one line)': (SCAM, 10_000),
+    }
+
+    print(f"{'corpus':<24}{'size':>10}{'re loop':>12}{'matcher':>12}{'speedup':>10}{'bounded':>12}  mode")
+    for name, (chunk, loop_limit) in corpora.items():
+        for size in SIZES:
+            if size > args.max_size:
+                continue
+            text = build_message(chunk, size).lower()
+            matcher_time, matched = timed(lambda: matcher.match(text), args.repeat)
+            bounded_time, (_, report) = timed(lambda: matcher.scan(text, time_budget=args.budget), args.repeat)
+            bounded = f"{bounded_time * 1000:>10.2f}ms  {report['mode']}"
+            if loop_limit is not None and size > loop_limit and not args.full:
+                print(f"{name:<24}{size:>10}{'skipped':>12}{matcher_time * 1000:>10.2f}ms{'-':>10}{bounded}")
+                continue
+            loop_time, expected = timed(lambda: loop_match(patterns, text), args.repeat)
+            assert matched == expected, f"mismatch on {name} @ {size}: {matched ^ expected}"
+            print(f"{name:<24}{size:>10}{loop_time * 1000:>10.2f}ms{matcher_time * 1000:>10.2f}ms"
+                  f"{loop_time / matcher_time:>9.1f}x{bounded}")
+
+
+if __name__ == '__main__':
+    main()
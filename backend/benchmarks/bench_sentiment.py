@@ -0,0 +1,121 @@
+"""Lexicon sentiment scorer against TextBlob: agreement, per-message latency and memory.
+
+The reference corpus mixes the detection samples with generated messages
+built from lexicon words, negations, intensifiers, emoticons, sarcasm
+marks, abbreviations and punctuation, so every scoring rule is exercised.
+Memory is the peak RSS added by loading and running each scorer, measured
+in a fresh interpreter (Linux). TextBlob is only needed for this benchmark and for
+sentiment.build_lexicon().
+
+Usage: python benchmarks/bench_sentiment.py [--messages N] [--tolerance T]
+"""
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND)
+
+from sentiment import SentimentScorer, load_lexicon
+
+SAMPLES = [
+    "URGENT: Your account has been suspended. Click here immediately to verify: http://bit.ly/x1",
+    "Congratulations WINNER! You won $5,000. Limited time offer, act now before it expires!",
+    "Doctors hate this miracle cure that big pharma conspiracy wants hidden.",
+    "Hey, are we still on for lunch tomorrow? Let me know what time works.",
+    "The quarterly report is attached. Please review the figures before Friday's meeting.",
+    "Work from home and make $300 a day, no experience necessary!",
+]
+FILLERS = [
+    'the', 'a', 'is', 'it', 'this', 'offer', 'your', 'account', 'you', 'we', 'not', 'no', 'never',
+    'very', 'really', 'extremely', 'so', '!', '...', ',', '.', ':)', ':(', ':-D', "don't", "isn't",
+    'U.S.', 'Mr.', 'e.g.', '(!)', 'bank', '$500', 'http://bit.ly/x',
+]
+MEMORY_PROBE = """
+import json, sys
+sys.path.insert(0, sys.argv[2])
+
+def peak_kb():
+    # VmHWM starts afresh at exec, unlike ru_maxrss which inherits the parent's peak
+    with open('/proc/self/status') as status:
+        return next(int(line.split()[1]) for line in status if line.startswith('VmHWM'))
+
+before = peak_kb()
+if sys.argv[1] == 'textblob':
+    from textblob import TextBlob
+    TextBlob(sys.argv[3]).sentiment
+else:
+    from sentiment import SentimentScorer
+    SentimentScorer().score(sys.argv[3])
+print(json.dumps((peak_kb() - before) / 1024))
+"""
+
+
+def make_corpus(count):
+    rng = random.Random(7)
+    words = [word for word in load_lexicon() if ' ' not in word]
+    corpus = list(SAMPLES)
+    while len(corpus) < count:
+        tokens = [
+            rng.choice(words) if rng.random() < 0.35 else rng.choice(FILLERS)
+            for _ in range(rng.randint(3, 40))
+        ]
+        text = ' '.join(tokens)
+        if rng.random() < 0.5:
+            text = text.replace(' ,', ',').replace(' .', '.').replace(' !', '!')
+        corpus.append(text)
+    return corpus
+
+
+def peak_rss_mb(scorer):
+    output = subprocess.run(
+        [sys.executable, '-c', MEMORY_PROBE, scorer, BACKEND, SAMPLES[0]],
+        check=True, capture_output=True, text=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def time_per_message(score, corpus):
+    start = time.perf_counter()
+    for content in corpus:
+        score(content)
+    return (time.perf_counter() - start) / len(corpus)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--messages', type=int, default=5000)
+    parser.add_argument('--tolerance', type=float, default=1e-9)
+    args = parser.parse_args()
+
+    memory = {name: peak_rss_mb(name) for name in ('textblob', 'lexicon')}
+    from textblob import TextBlob
+
+    corpus = make_corpus(args.messages)
+    scorer = SentimentScorer()
+    expected = [TextBlob(content).sentiment for content in corpus]
+    actual = [scorer.score(content) for content in corpus]
+    polarity_error = [abs(want.polarity - got[0]) for want, got in zip(expected, actual)]
+    subjectivity_error = [abs(want.subjectivity - got[1]) for want, got in zip(expected, actual)]
+    within = sum(
+        1 for p, s in zip(polarity_error, subjectivity_error)
+        if p <= args.tolerance and s <= args.tolerance
+    )
+
+    textblob_time = time_per_message(lambda content: TextBlob(content).sentiment, corpus)
+    lexicon_time = time_per_message(scorer.score, corpus)
+
+    print(f"{len(corpus)} messages")
+    print(f"within {args.tolerance:g} of TextBlob: {within}/{len(corpus)}; "
+          f"max error polarity {max(polarity_error):.2e}, subjectivity {max(subjectivity_error):.2e}")
+    print(f"{'scorer':<12}{'us/msg':>10}{'peak RSS MB':>14}")
+    print(f"{'TextBlob':<12}{textblob_time * 1e6:>10.1f}{memory['textblob']:>14.1f}")
+    print(f"{'lexicon':<12}{lexicon_time * 1e6:>10.1f}{memory['lexicon']:>14.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+"""Cold-start cost of importing app.py: wall time and peak RSS.
+
+Each measurement runs in a fresh interpreter. With --compare REV the same
+measurement is taken for backend/ as of that git revision, e.g.
+``--compare HEAD~1`` for before/after numbers. When the tree has a
+warm_up() hook its cost is reported as well.
+
+Usage: python benchmarks/bench_startup.py [--runs N] [--compare REV]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tarfile
+import tempfile
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PROBE = """
+import json, os, resource, sys, tempfile, time
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'startup.db')
+sys.path.insert(0, os.getcwd())
+start = time.perf_counter()
+import app
+report = {
+    'import_s': time.perf_counter() - start,
+    'import_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+}
+if hasattr(app, 'warm_up'):
+    start = time.perf_counter()
+    app.warm_up()
+    report['warm_up_s'] = time.perf_counter() - start
+    report['warm_rss_mb'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+print(json.dumps(report))
+"""
+
+
+def measure(directory, runs):
+    reports = []
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, '-c', PROBE], cwd=directory,
+            check=True, capture_output=True, text=True
+        ).stdout
+        reports.append(json.loads(output.strip().splitlines()[-1]))
+    return {key: statistics.median(report[key] for report in reports) for key in reports[0]}
+
+
+def export_revision(revision):
+    """Extract backend/ at ``revision`` into a temporary directory"""
+    directory = tempfile.mkdtemp()
+    archive = os.path.join(directory, 'backend.tar')
+    subprocess.run(
+        ['git', 'archive', '--format=tar', '-o', archive, revision, 'backend'],
+        cwd=os.path.dirname(BACKEND), check=True
+    )
+    with tarfile.open(archive) as tar:
+        tar.extractall(directory)
+    return os.path.join(directory, 'backend')
+
+
+def show(label, report):
+    line = f"{label:<14}import {report['import_s'] * 1000:8.1f} ms  rss {report['import_rss_mb']:7.1f} MB"
+    if 'warm_up_s' in report:
+        line += f"  | warm-up {report['warm_up_s'] * 1000:8.1f} ms  rss {report['warm_rss_mb']:7.1f} MB"
+    print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--compare', metavar='REV', help='git revision to measure as the baseline')
+    args = parser.parse_args()
+
+    if args.compare:
+        show(args.compare, measure(export_revision(args.compare), args.runs))
+    show('working tree', measure(BACKEND, args.runs))
+
+
+if __name__ == '__main__':
+    main()
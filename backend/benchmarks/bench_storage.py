@@ -0,0 +1,130 @@
+"""Mixed read/write throughput of the storage layer under concurrency.
+
+--readers threads request GET /api/user/stats/<email> while --writers
+threads POST /api/analyze (repeated content, so detection is served by the
+result cache and each request is mostly its database write) for
+--seconds, through the Flask test client against a SQLite file seeded
+with 200 users and --rows analyses. Reported: requests/s and p95 latency
+per kind, and failed requests.
+
+Each configuration runs in a fresh interpreter: SQLite's own defaults
+(rollback journal, synchronous=FULL), the default WAL/NORMAL/mmap setup
+and, with --compare REV, that git revision, e.g. ``--compare HEAD~1``.
+
+Usage: python benchmarks/bench_storage.py [--readers N] [--writers N] [--seconds S] [--rows N] [--compare REV]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_startup import BACKEND, export_revision
+
+PROBE = """
+import json, os, random, sys, tempfile, threading, time
+from datetime import datetime, timedelta
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'bench.db')
+sys.path.insert(0, os.getcwd())
+import app as backend
+from app import app, db, User, Analysis
+
+readers, writers, seconds, rows = int(sys.argv[1]), int(sys.argv[2]), float(sys.argv[3]), int(sys.argv[4])
+emails = [f'user{n}@example.com' for n in range(200)]
+with app.app_context():
+    db.create_all()
+    db.session.add_all([User(email=email, name='Bench') for email in emails])
+    db.session.commit()
+    rng = random.Random(1)
+    start = datetime(2024, 1, 1)
+    db.session.execute(Analysis.__table__.insert(), [
+        {'user_id': rng.randint(1, len(emails)), 'content': 'seed message', 'scam_risk': rng.randint(0, 100),
+         'credibility_score': rng.randint(0, 100), 'verdict': 'Credible', 'created_at': start + timedelta(minutes=n)}
+        for n in range(rows)
+    ])
+    db.session.commit()
+    if hasattr(backend, 'rebuild_monthly_stats'):
+        backend.rebuild_monthly_stats()
+
+# Score the write payloads once so writers measure the write path
+contents = [f'URGENT: verify your account now to claim reward {n}' for n in range(20)]
+warm = app.test_client()
+for content in contents:
+    warm.post('/api/analyze', json={'content': content, 'user_email': emails[0]})
+
+latencies = {'read': [], 'write': []}
+failures = {'read': 0, 'write': 0}
+stop_at = time.perf_counter() + seconds
+
+def worker(kind, seed):
+    client = app.test_client()
+    rng = random.Random(seed)
+    local, failed = [], 0
+    while time.perf_counter() < stop_at:
+        email = rng.choice(emails)
+        started = time.perf_counter()
+        if kind == 'read':
+            response = client.get(f'/api/user/stats/{email}')
+        else:
+            response = client.post('/api/analyze', json={'content': rng.choice(contents), 'user_email': email})
+        local.append(time.perf_counter() - started)
+        failed += response.status_code != 200
+    latencies[kind].extend(local)
+    failures[kind] += failed
+
+threads = [threading.Thread(target=worker, args=('read', n)) for n in range(readers)]
+threads += [threading.Thread(target=worker, args=('write', 100 + n)) for n in range(writers)]
+for thread in threads:
+    thread.start()
+for thread in threads:
+    thread.join()
+
+def p95(values):
+    return sorted(values)[int(len(values) * 0.95)] * 1000 if values else 0
+
+print(json.dumps({
+    kind: {'rate': len(values) / seconds, 'p95_ms': p95(values), 'failed': failures[kind]}
+    for kind, values in latencies.items()
+}))
+"""
+
+
+def measure(directory, args, environment=None):
+    env = dict(os.environ)
+    env.update(environment or {})
+    output = subprocess.run(
+        [sys.executable, '-c', PROBE, str(args.readers), str(args.writers), str(args.seconds), str(args.rows)],
+        cwd=directory, env=env, check=True, capture_output=True, text=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def show(label, report):
+    read, write = report['read'], report['write']
+    print(f"{label:<26}{read['rate']:>8.0f}{read['p95_ms']:>9.1f}{write['rate']:>9.0f}{write['p95_ms']:>9.1f}"
+          f"{read['failed'] + write['failed']:>8}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--readers', type=int, default=4)
+    parser.add_argument('--writers', type=int, default=4)
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--rows', type=int, default=50000)
+    parser.add_argument('--compare', metavar='REV', help='git revision to measure as the baseline')
+    args = parser.parse_args()
+
+    print(f"{args.readers} readers, {args.writers} writers, {args.seconds:g} s, {args.rows} seeded analyses")
+    print(f"{'':<26}{'reads/s':>8}{'p95 ms':>9}{'writes/s':>9}{'p95 ms':>9}{'failed':>8}")
+    if args.compare:
+        show(args.compare, measure(export_revision(args.compare), args))
+    show('rollback journal, FULL', measure(BACKEND, args, {
+        'SQLITE_JOURNAL_MODE': 'DELETE', 'SQLITE_SYNCHRONOUS': 'FULL', 'SQLITE_MMAP_SIZE': '0'
+    }))
+    show('WAL, NORMAL, mmap', measure(BACKEND, args))
+
+
+if __name__ == '__main__':
+    main()
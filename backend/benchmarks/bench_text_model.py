@@ -0,0 +1,111 @@
+"""Text model inference cost: one message per call against batches.
+
+A TF-IDF + logistic regression model is trained with train_model on
+--train synthetic labeled messages (scam and legitimate phrasing over a
+shared filler vocabulary, 5% of labels flipped) and saved; the held-out
+AUC is reported. TextModel.predict then scores --messages unseen messages
+one call per message and in batches of each of --batch-sizes, reporting
+microseconds per message (the fastest of --repeat passes), and
+scikit-learn's own transform + predict_proba is timed the same way for
+reference. Last, the detection
+engine with the 'model' layer scores the messages one by one
+(analyze_comprehensive) and as one batch (analyze_batch), next to the
+same engine without the layer.
+
+Usage: python benchmarks/bench_text_model.py [--train N] [--messages N] [--batch-sizes 1,8,64,512,4096] [--repeat N]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from detection_engine import AdvancedDetectionEngine
+from text_model import TextModel, save_model, train_model
+
+SCAM = [
+    'verify your account', 'your account has been suspended', 'click the link below', 'claim your prize',
+    'you have won', 'wire transfer', 'gift card', 'act now', 'limited time', 'confirm your password',
+    'unusual sign-in activity', 'pay the customs fee', 'guaranteed returns', 'crypto investment',
+]
+LEGIT = [
+    'see you tomorrow', 'the meeting moved', 'attached is the report', 'thanks for your help',
+    'running late', 'happy birthday', 'dinner on friday', 'the invoice is paid', 'call me when free',
+    'project update', 'your order has shipped', 'school pickup', 'weekend plans', 'review the draft',
+]
+FILLER = ('the a to and of for on in with your our this that please today now team account message '
+          'bank order number link email phone time week day update details info service support').split()
+
+
+def message(rng, scam):
+    phrases = rng.sample(SCAM if scam else LEGIT, rng.randint(1, 3))
+    # Some cross-over phrasing so the task is not trivially separable
+    if rng.random() < 0.2:
+        phrases.append(rng.choice(LEGIT if scam else SCAM))
+    words = phrases + rng.choices(FILLER, k=rng.randint(5, 40))
+    rng.shuffle(words)
+    return ' '.join(words)
+
+
+def corpus(rng, count):
+    labels = [rng.random() < 0.4 for _ in range(count)]
+    texts = [message(rng, label) for label in labels]
+    return texts, [int(label != (rng.random() < 0.05)) for label in labels]
+
+
+def per_message(function, messages, batch_size, repeat):
+    """Microseconds per message of the fastest of ``repeat`` passes"""
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for start in range(0, len(messages), batch_size):
+            function(messages[start:start + batch_size])
+        best = min(best, time.perf_counter() - started)
+    return best / len(messages) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--train', type=int, default=50000)
+    parser.add_argument('--messages', type=int, default=8192)
+    parser.add_argument('--batch-sizes', default='1,8,64,512,4096')
+    parser.add_argument('--repeat', type=int, default=3, help='passes per measurement; the fastest is reported')
+    args = parser.parse_args()
+
+    rng = random.Random(1)
+    texts, labels = corpus(rng, args.train)
+    started = time.perf_counter()
+    model, metrics = train_model(texts, labels)
+    path = os.path.join(tempfile.mkdtemp(), 'text_model.pkl')
+    save_model(model, path)
+    print(f"trained on {args.train} messages in {time.perf_counter() - started:.1f} s: "
+          f"{metrics['features']} features, held-out AUC {metrics['holdoutAuc']}, "
+          f"accuracy {metrics['holdoutAccuracy']}, {os.path.getsize(path) / 2 ** 20:.1f} MB on disk")
+
+    messages, _ = corpus(random.Random(2), args.messages)
+    text_model = TextModel(path)
+    vectorizer, classifier = model['vectorizer'], model['classifier']
+    text_model.predict(messages[:64])
+
+    print(f"\n{'batch size':>10}{'TextModel us/msg':>18}{'sklearn us/msg':>16}")
+    for batch_size in (int(value) for value in args.batch_sizes.split(',')):
+        ours = per_message(text_model.predict, messages, batch_size, args.repeat)
+        reference = per_message(
+            lambda batch: classifier.predict_proba(vectorizer.transform(batch)), messages, batch_size, args.repeat
+        )
+        print(f"{batch_size:>10}{ours:>18.1f}{reference:>16.1f}")
+
+    print(f"\n{'engine':<24}{'one by one us/msg':>19}{'batch us/msg':>14}")
+    for label, options in (('without model layer', {}), ('with model layer', {'text_model': path})):
+        engine = AdvancedDetectionEngine(**options)
+        engine.warm_up()
+        single = per_message(lambda batch: engine.analyze_comprehensive(batch[0], 'Bench'), messages, 1, args.repeat)
+        batched = per_message(lambda batch: engine.analyze_batch(batch, 'Bench'), messages, len(messages), args.repeat)
+        print(f"{label:<24}{single:>19.1f}{batched:>14.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,118 @@
+"""Short link expansion against the local redirect stub (benchmarks/redirect_stub.py).
+
+Every shortener request goes through the stub as a proxy and takes
+--latency ms, like a remote shortener. The report covers:
+
+* cold expansion of --links distinct links, one resolver thread against
+  --workers threads
+* the same links from the persistent cache in a fresh expander (a
+  restarted server) and how many requests reached the stub
+* a link slower than the deadline: how long the message waited
+* one slow link requested by 32 threads at once: requests to the stub
+* engine latency per message with the expansion layer, cold and cached,
+  and the destinations it found
+
+Usage: python benchmarks/bench_url_expander.py [--links N] [--workers N] [--latency MS]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from redirect_stub import RedirectStub
+from detection_engine import AdvancedDetectionEngine
+from url_expander import ShortUrlExpander
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(int(len(values) * fraction), len(values) - 1)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--links', type=int, default=200)
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--latency', type=int, default=50)
+    args = parser.parse_args()
+
+    stub = RedirectStub().start()
+    directory = tempfile.mkdtemp()
+    shorteners = AdvancedDetectionEngine.SHORTENERS
+
+    def expander(name, **options):
+        options.setdefault('deadline', 60)
+        return ShortUrlExpander(shorteners, cache_path=os.path.join(directory, name), proxy=stub.url, **options)
+
+    links = [f'http://bit.ly/slow/{args.latency}/{n}' for n in range(args.links)]
+    print(f"{args.links} distinct links, {args.latency} ms per shortener request")
+    for workers in (1, args.workers):
+        resolver = expander(f'cold-{workers}.db', max_workers=workers)
+        start = time.perf_counter()
+        expansions = resolver.expand_many(links)
+        elapsed = time.perf_counter() - start
+        assert all(expansion.final_url for expansion in expansions)
+        print(f"  cold, {workers:>2} threads: {elapsed:6.2f} s  {len(links) / elapsed:7.1f} links/s")
+        resolver.close()
+
+    before = sum(stub.hits.values())
+    resolver = expander(f'cold-{args.workers}.db', max_workers=args.workers)
+    start = time.perf_counter()
+    expansions = resolver.expand_many(links)
+    elapsed = time.perf_counter() - start
+    assert all(expansion.final_url for expansion in expansions)
+    print(f"  cached after restart: {elapsed / len(links) * 1e6:.1f} us/link, "
+          f"{sum(stub.hits.values()) - before} stub requests")
+    resolver.close()
+
+    resolver = expander('deadline.db', deadline=0.3, read_timeout=5)
+    start = time.perf_counter()
+    expansion, = resolver.expand_many(['http://bit.ly/slow/2000/1'])
+    print(f"  2 s link, 0.3 s deadline: answered after {time.perf_counter() - start:.2f} s ({expansion.error})")
+    resolver.close()
+
+    resolver = expander('dedup.db', max_workers=args.workers)
+    barrier = threading.Barrier(32)
+
+    def request():
+        barrier.wait()
+        resolver.expand_many(['http://bit.ly/slow/200/7'])
+
+    threads = [threading.Thread(target=request) for _ in range(32)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    print(f"  one link from 32 threads at once: {stub.hits['bit.ly/slow/200/7']} stub request(s)")
+    resolver.close()
+
+    engine = AdvancedDetectionEngine(short_circuit=False, url_expansion={
+        'cache_path': os.path.join(directory, 'engine.db'), 'proxy': stub.url, 'max_workers': args.workers
+    })
+    engine.warm_up()
+    messages = [
+        f"Claim your prize at http://bit.ly/slow/{args.latency}/{n} and http://t.co/chain/2/{n}"
+        if n % 3 else f"Your account is locked, log in at http://tinyurl.com/ip/{n}"
+        for n in range(50)
+    ]
+    for label in ('cold', 'cached'):
+        latencies = []
+        for content in messages:
+            start = time.perf_counter()
+            result = engine.analyze_comprehensive(content, 'Bench')
+            latencies.append(time.perf_counter() - start)
+        print(f"  engine, {label:<6}: p50 {percentile(latencies, 0.5) * 1000:7.2f} ms  "
+              f"p95 {percentile(latencies, 0.95) * 1000:7.2f} ms per message")
+    for expanded in result['expandedUrls']:
+        print(f"    {expanded['url']} -> {expanded['finalUrl']} ({expanded['hops']} hops)")
+    print(f"    warnings: {result['warnings']}")
+    stub.stop()
+
+
+if __name__ == '__main__':
+    main()
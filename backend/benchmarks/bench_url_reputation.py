@@ -0,0 +1,139 @@
+"""URL layer cost and domain blocklist size, load time, lookup latency and hot reload.
+
+A blocklist of --domains random domains is compiled into the mmap format.
+The report covers:
+
+* compile time, file size, open time and resident memory after 20k lookups
+* lookup latency for distinct listed and unlisted hosts (each checks every
+  parent domain; repeated hosts are answered from a per-host memo)
+* the URL layer per message, the previous substring checks against parsed
+  hosts with the blocklist, on messages with several URLs
+* hot reload: how long after the compiled file is replaced a newly listed
+  domain is reported, with the given --check-interval
+
+Usage: python benchmarks/bench_url_reputation.py [--domains N] [--messages N] [--check-interval S]
+"""
+import argparse
+import os
+import random
+import re
+import string
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from analysis_context import AnalysisContext
+from detection_engine import AdvancedDetectionEngine
+from url_reputation import BlocklistTable, compile_blocklist, parse_url
+
+URLS = [
+    'http://bit.ly/x1', 'https://t.co/abc', 'https://www.reddit.com/r/t.co', 'http://192.168.0.7/login',
+    'https://secure-update.tk/verify', 'https://www.example.com/docs/cf.html', 'http://mail.example.org/',
+]
+
+
+def resident_mb():
+    with open('/proc/self/statm') as statm:
+        return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 1024 / 1024
+
+
+def random_domain(rng):
+    name = ''.join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(6, 14)))
+    return f"{name}.{rng.choice(['com', 'net', 'org', 'tk', 'co.uk', 'info'])}"
+
+
+def substring_urls(content):
+    """The URL checks _analyze_urls ran before hosts were parsed"""
+    urls = re.findall(r'https?://[^\s]+', content)
+    risk_score = 0
+    warnings = []
+    for url in urls:
+        shorteners = ['bit.ly', 'tinyurl.com', 't.co', 'goo.gl', 'ow.ly']
+        if any(shortener in url for shortener in shorteners):
+            risk_score += 25
+            warnings.append("Shortened URL detected")
+        if url.startswith('http://'):
+            risk_score += 20
+            warnings.append("Insecure HTTP connection")
+        suspicious_tlds = ['.tk', '.ml', '.ga', '.cf']
+        if any(tld in url for tld in suspicious_tlds):
+            risk_score += 30
+            warnings.append("Suspicious domain extension")
+        if re.search(r'\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3}', url):
+            risk_score += 40
+            warnings.append("IP address used instead of domain")
+    return {'risk_score': min(risk_score, 100), 'warnings': warnings, 'url_count': len(urls)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--domains', type=int, default=1000000)
+    parser.add_argument('--messages', type=int, default=5000)
+    parser.add_argument('--check-interval', type=float, default=1.0)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    directory = tempfile.mkdtemp()
+    source = os.path.join(directory, 'blocklist.txt')
+    compiled = os.path.join(directory, 'blocklist.bin')
+    listed = [random_domain(rng) for _ in range(args.domains)]
+    with open(source, 'w') as handle:
+        handle.write('\n'.join(listed) + '\n')
+
+    start = time.perf_counter()
+    count = compile_blocklist(source, compiled)
+    compile_s = time.perf_counter() - start
+
+    probes = 10000
+    hits = [parse_url(f'https://login.{rng.choice(listed)}/') for _ in range(probes)]
+    misses = [parse_url(f'https://login.{random_domain(rng)}/') for _ in range(probes)]
+
+    before = resident_mb()
+    start = time.perf_counter()
+    table = BlocklistTable(compiled, check_interval=args.check_interval)
+    open_ms = (time.perf_counter() - start) * 1000
+    start = time.perf_counter()
+    assert all(table.blocked(parsed) for parsed in hits)
+    hit_us = (time.perf_counter() - start) / probes * 1e6
+    start = time.perf_counter()
+    false_positives = sum(table.blocked(parsed) for parsed in misses)
+    miss_us = (time.perf_counter() - start) / probes * 1e6
+    resident = resident_mb() - before
+
+    print(f"{count} domains: compile {compile_s:.1f} s, {os.path.getsize(compiled) / 1024 / 1024:.1f} MB on disk, "
+          f"open {open_ms:.2f} ms, +{resident:.1f} MB resident after {2 * probes} lookups")
+    print(f"lookup: listed {hit_us:.2f} us, unlisted {miss_us:.2f} us, {false_positives} false positives")
+
+    messages = [
+        ' '.join(['Check'] + rng.sample(URLS, 4) + [f'https://{rng.choice(listed)}/win', 'now'])
+        for _ in range(args.messages)
+    ]
+    engine = AdvancedDetectionEngine(url_blocklist=compiled, url_blocklist_check_interval=args.check_interval)
+    start = time.perf_counter()
+    for content in messages:
+        substring_urls(content)
+    substring_us = (time.perf_counter() - start) / len(messages) * 1e6
+    start = time.perf_counter()
+    for content in messages:
+        engine._analyze_urls(AnalysisContext(content))
+    parsed_us = (time.perf_counter() - start) / len(messages) * 1e6
+    print(f"URL layer, 5 URLs per message: substring {substring_us:.1f} us, parsed + blocklist {parsed_us:.1f} us")
+
+    newcomer = random_domain(rng)
+    with open(source, 'a') as handle:
+        handle.write(newcomer + '\n')
+    start = time.perf_counter()
+    compile_blocklist(source, compiled)
+    replaced = time.perf_counter()
+    content = f'Visit https://{newcomer}/ today'
+    while 'Domain on reputation blocklist' not in engine._analyze_urls(AnalysisContext(content))['warnings']:
+        time.sleep(0.01)
+        engine._refresh_rules()
+    print(f"hot reload: recompiled in {replaced - start:.1f} s, new domain reported "
+          f"{(time.perf_counter() - replaced) * 1000:.0f} ms after the file was replaced")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+"""Cost of resolving the requesting user: throughput, SQL statements and races.
+
+Requests go through the Flask test client against a fresh SQLite file,
+spread over --users distinct emails that already exist. The report covers:
+
+* requests/s and SQL statements per request for POST /api/chat (no API
+  key, so the reply is the local fallback and the user lookup dominates)
+  and GET /api/user/stats/<email>
+* first requests from a new email sent by 16 threads at once, repeated for
+  20 emails: failed requests and duplicate users
+
+Each configuration runs in a fresh interpreter: the working tree with the
+user cache, with it disabled (USER_CACHE_MAX_ENTRIES=0), and with
+--compare REV that git revision, e.g. ``--compare HEAD~1``.
+
+Usage: python benchmarks/bench_user_lookup.py [--requests N] [--users N] [--compare REV]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_startup import BACKEND, export_revision
+
+PROBE = """
+import json, os, sys, tempfile, threading, time
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'bench.db')
+sys.path.insert(0, os.getcwd())
+from sqlalchemy import event, func
+from app import app, db, User
+
+requests, users = int(sys.argv[1]), int(sys.argv[2])
+client = app.test_client()
+with app.app_context():
+    db.create_all()
+    db.session.add_all([User(email=f'user{n}@example.com', name=f'User {n}') for n in range(users)])
+    db.session.commit()
+    statements = [0]
+    event.listen(db.engine, 'before_cursor_execute', lambda *args: statements.__setitem__(0, statements[0] + 1))
+
+def run(send):
+    statements[0] = 0
+    start = time.perf_counter()
+    for n in range(requests):
+        response = send(f'user{n % users}@example.com')
+        assert response.status_code == 200, response.get_data(as_text=True)
+    return requests / (time.perf_counter() - start), statements[0] / requests
+
+report = {}
+report['chat'] = run(lambda email: client.post('/api/chat', json={'message': 'hello', 'user_email': email}))
+report['stats'] = run(lambda email: client.get(f'/api/user/stats/{email}'))
+
+failed = 0
+for round in range(20):
+    email = f'new{round}@example.com'
+    barrier = threading.Barrier(16)
+    codes = []
+    def first_request():
+        barrier.wait()
+        codes.append(app.test_client().post('/api/chat', json={'message': 'hi', 'user_email': email}).status_code)
+    threads = [threading.Thread(target=first_request) for _ in range(16)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    failed += sum(code != 200 for code in codes)
+with app.app_context():
+    created = db.session.query(func.count(User.id)).filter(User.email.like('new%')).scalar()
+report['race'] = (failed, created)
+print(json.dumps(report))
+"""
+
+
+def measure(directory, requests, users, cache=True):
+    environment = dict(os.environ)
+    if not cache:
+        environment['USER_CACHE_MAX_ENTRIES'] = '0'
+    output = subprocess.run(
+        [sys.executable, '-c', PROBE, str(requests), str(users)],
+        cwd=directory, env=environment, check=True, capture_output=True, text=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def show(label, report):
+    failed, created = report['race']
+    print(f"{label:<22}{report['chat'][0]:>9.0f}{report['chat'][1]:>7.2f}"
+          f"{report['stats'][0]:>11.0f}{report['stats'][1]:>7.2f}{failed:>10}{created:>8}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--requests', type=int, default=3000)
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--compare', metavar='REV', help='git revision to measure as the baseline')
+    args = parser.parse_args()
+
+    print(f"{args.requests} requests over {args.users} users; race: 20 new emails x 16 threads")
+    print(f"{'':<22}{'chat/s':>9}{'sql':>7}{'stats/s':>11}{'sql':>7}{'failed':>10}{'users':>8}")
+    if args.compare:
+        show(args.compare, measure(export_revision(args.compare), args.requests, args.users))
+    show('cache disabled', measure(BACKEND, args.requests, args.users, cache=False))
+    show('working tree', measure(BACKEND, args.requests, args.users))
+
+
+if __name__ == '__main__':
+    main()
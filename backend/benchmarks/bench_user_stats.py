@@ -0,0 +1,144 @@
+"""Latency of GET /api/user/stats/<email> for a heavy user.
+
+Compares the endpoint, which reads the monthly rollup plus the ten newest
+rows, with and without the (user_id, created_at, ...) index, against the
+original approach of loading every Analysis row and aggregating in
+Python. The responses are checked to be identical. Also times the full
+rollup rebuild used to backfill existing data.
+
+Usage: python benchmarks/bench_user_stats.py [--rows N] [--other-rows N] [--repeat N]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'bench.db')
+
+from app import app, db, User, Analysis, create_indexes, rebuild_monthly_stats
+
+EMAIL = 'heavy@example.com'
+
+
+def populate(rows, other_rows):
+    rng = random.Random(7)
+    heavy = User(email=EMAIL, name='Heavy')
+    others = [User(email=f'user{index}@example.com', name='Other') for index in range(100)]
+    db.session.add_all([heavy] + others)
+    db.session.commit()
+
+    start = datetime(2024, 1, 1)
+    owners = [heavy.id] * rows + [rng.choice(others).id for _ in range(other_rows)]
+    rng.shuffle(owners)
+    for offset in range(0, len(owners), 50_000):
+        db.session.execute(Analysis.__table__.insert(), [
+            {
+                'user_id': user_id,
+                'content': 'benchmark message',
+                'scam_risk': rng.randint(0, 100),
+                'credibility_score': rng.randint(0, 100),
+                'verdict': 'Credible',
+                'created_at': start + timedelta(minutes=offset + position)
+            }
+            for position, user_id in enumerate(owners[offset:offset + 50_000])
+        ])
+    db.session.commit()
+
+
+def legacy_stats(email):
+    """The endpoint as it was: every row loaded and aggregated in Python"""
+    user = User.query.filter_by(email=email).first()
+    analyses = Analysis.query.filter_by(user_id=user.id).all()
+    monthly_counts = {}
+    threat_levels = {'low': 0, 'medium': 0, 'high': 0}
+    for analysis in analyses:
+        month = analysis.created_at.strftime('%b')
+        monthly_counts[month] = monthly_counts.get(month, 0) + 1
+        if analysis.scam_risk < 30:
+            threat_levels['low'] += 1
+        elif analysis.scam_risk < 70:
+            threat_levels['medium'] += 1
+        else:
+            threat_levels['high'] += 1
+    return {
+        'totalAnalyses': len(analyses),
+        'averageScamRisk': sum(a.scam_risk for a in analyses) / len(analyses),
+        'averageCredibility': sum(a.credibility_score for a in analyses) / len(analyses),
+        'isAuthority': user.is_authority,
+        'authorityType': user.authority_level,
+        'authorityLevel': user.authority_level,
+        'recentAnalyses': [
+            {
+                'date': a.created_at.isoformat(),
+                'verdict': a.verdict,
+                'scamRisk': a.scam_risk,
+                'credibilityScore': a.credibility_score
+            }
+            for a in analyses[-10:]
+        ],
+        'chartData': {
+            'monthly': [{'month': k, 'count': v} for k, v in monthly_counts.items()],
+            'threatLevels': [{'level': k, 'count': v} for k, v in threat_levels.items()],
+            'credibilityTrend': [
+                {'date': a.created_at.strftime('%m/%d'), 'score': a.credibility_score}
+                for a in analyses[-10:]
+            ]
+        }
+    }
+
+
+def timed(func, repeat):
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        db.session.expire_all()
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=100_000, help='analyses for the measured user')
+    parser.add_argument('--other-rows', type=int, default=100_000, help='analyses spread over other users')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    client = app.test_client()
+    with app.app_context():
+        db.create_all()
+        populate(args.rows, args.other_rows)
+        rebuild_monthly_stats()
+        index = next(index for index in Analysis.__table__.indexes if index.name == 'ix_analysis_user_created')
+
+        def sql_stats():
+            response = client.get(f'/api/user/stats/{EMAIL}')
+            assert response.status_code == 200
+            return response.get_json()
+
+        start = time.perf_counter()
+        rebuild_monthly_stats()
+        rebuild_time = time.perf_counter() - start
+
+        legacy_time, expected = timed(lambda: legacy_stats(EMAIL), args.repeat)
+        index.drop(db.engine)
+        unindexed_time, unindexed = timed(sql_stats, args.repeat)
+        create_indexes()
+        indexed_time, indexed = timed(sql_stats, args.repeat)
+
+    assert expected == unindexed == indexed
+
+    print(f"{args.rows} analyses for one user, {args.other_rows} for others")
+    print(f"{'load all rows (before)':<30}{legacy_time * 1000:>10.1f} ms")
+    print(f"{'rollup, no index':<30}{unindexed_time * 1000:>10.1f} ms")
+    print(f"{'rollup, indexed':<30}{indexed_time * 1000:>10.1f} ms")
+    print(f"{'rollup rebuild, all users':<30}{rebuild_time * 1000:>10.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+"""Latency and throughput of POST /api/analyze with synchronous commits
+against the write-behind queue (ANALYSIS_WRITE_BEHIND=1).
+
+Concurrent clients post distinct messages so the result cache does not hide
+the write path. After the write-behind run the queue is drained and the row
+count checked, so no analysis is lost.
+
+Usage: python benchmarks/bench_write_behind.py [--clients N] [--requests N]
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'bench.db')
+
+import app as backend
+from app import app, db, Analysis
+
+
+def run(clients, requests_per_client, tag):
+    latencies = []
+    lock = threading.Lock()
+
+    def client_loop(number):
+        client = app.test_client()
+        email = f'client{number}@example.com'
+        local = []
+        for index in range(requests_per_client):
+            content = f'{tag} message {number}-{index}: click here immediately to claim your prize'
+            start = time.perf_counter()
+            response = client.post('/api/analyze', json={'content': content, 'user_email': email})
+            local.append(time.perf_counter() - start)
+            assert response.status_code == 200, response.get_json()
+        with lock:
+            latencies.extend(local)
+
+    threads = [threading.Thread(target=client_loop, args=(number,)) for number in range(clients)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        'throughput': len(latencies) / elapsed,
+        'p50': statistics.median(latencies),
+        'p99': latencies[int(len(latencies) * 0.99) - 1],
+    }
+
+
+def show(label, report):
+    print(f"{label:<16}{report['throughput']:>10.0f} req/s  p50 {report['p50'] * 1000:7.2f} ms"
+          f"  p99 {report['p99'] * 1000:7.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--clients', type=int, default=8)
+    parser.add_argument('--requests', type=int, default=250, help='requests per client')
+    args = parser.parse_args()
+
+    with app.app_context():
+        db.create_all()
+
+    backend.analysis_writer = None
+    synchronous = run(args.clients, args.requests, 'sync')
+
+    backend.analysis_writer = backend.create_analysis_writer()
+    write_behind = run(args.clients, args.requests, 'queued')
+    drain_start = time.perf_counter()
+    backend.analysis_writer.close()
+    drain = time.perf_counter() - drain_start
+
+    with app.app_context():
+        assert Analysis.query.count() == 2 * args.clients * args.requests
+
+    print(f"{args.clients} clients x {args.requests} requests")
+    show('synchronous', synchronous)
+    show('write-behind', write_behind)
+    print(f"write-behind: {backend.analysis_writer.stats()}, final drain {drain * 1000:.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,191 @@
+"""Closed-loop load test: how much concurrency a server sustains at a fixed p99.
+
+Each concurrency level runs that many clients back to back for --duration
+seconds. The workload is a mix of POST /api/analyze with distinct messages
+(so the result cache does not hide detection), GET /api/user/stats and
+POST /api/chat. Chat calls go to a local stub upstream that answers after
+--upstream-latency seconds. The report gives throughput, p50/p99 of the
+analyze and stats requests, and the p99 of chat calls per level. It also
+shows the highest level whose analyze/stats p99 stays under --p99-ms.
+Chat latency is dominated by the upstream, so it is reported but not
+held to the target.
+
+--server spawns the backend on a temporary database: ``wsgi`` is the Flask
+server from app.py, ``asgi`` is ``uvicorn asgi:app``. --url targets a server
+that is already running instead; its chat calls then use whatever upstream
+that server is configured with.
+
+Usage: python benchmarks/load_test.py --server wsgi|asgi [--levels 1,4,16,64] [--duration S] [--p99-ms MS]
+       python benchmarks/load_test.py --url http://127.0.0.1:5000 [...]
+"""
+import argparse
+import asyncio
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_chat_client import StubState, start_stub
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SAMPLES = [
+    "URGENT: Your account has been suspended. Click here immediately to verify: http://bit.ly/x1",
+    "Congratulations WINNER! You won $5,000. Limited time offer, act now before it expires!",
+    "Doctors hate this miracle cure that big pharma conspiracy wants hidden.",
+    "Hey, are we still on for lunch tomorrow? Let me know what time works.",
+    "The quarterly report is attached. Please review the figures before Friday's meeting.",
+]
+WSGI_RUNNER = """
+import sys
+from app import app, db, create_indexes
+with app.app_context():
+    db.create_all()
+    create_indexes()
+app.run(port=int(sys.argv[1]), threaded=True)
+"""
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def spawn(server, upstream_url, workers):
+    port = free_port()
+    env = dict(
+        os.environ,
+        DATABASE_URL='sqlite:///' + os.path.join(tempfile.mkdtemp(), 'load.db'),
+        OPENROUTER_BASE_URL=upstream_url,
+        WARM_UP_ON_START='1'
+    )
+    if server == 'wsgi':
+        command = [sys.executable, '-c', WSGI_RUNNER, str(port)]
+    else:
+        command = [sys.executable, '-m', 'uvicorn', 'asgi:app', '--port', str(port),
+                   '--log-level', 'warning', '--workers', str(workers)]
+    process = subprocess.Popen(command, cwd=BACKEND, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    url = f'http://127.0.0.1:{port}'
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        try:
+            httpx.get(f'{url}/api/metrics', timeout=1)
+            return process, url
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    process.kill()
+    raise RuntimeError(f'{server} server did not start')
+
+
+async def client_loop(client, url, number, deadline, mix, latencies, chat_latencies, errors):
+    rng = random.Random(number)
+    email = f'load{number}@example.com'
+    sent = 0
+    while time.monotonic() < deadline:
+        roll = rng.random()
+        chat = roll < mix['chat']
+        start = time.perf_counter()
+        try:
+            if chat:
+                response = await client.post(f'{url}/api/chat', json={
+                    'message': 'Is this a scam?', 'user_email': email, 'api_key': 'load-test'
+                })
+            elif roll < mix['chat'] + mix['stats']:
+                response = await client.get(f'{url}/api/user/stats/{email}')
+            else:
+                sent += 1
+                response = await client.post(f'{url}/api/analyze', json={
+                    'content': f'{rng.choice(SAMPLES)} #{number}-{sent}', 'user_email': email
+                })
+            ok = response.status_code == 200
+        except httpx.HTTPError:
+            ok = False
+        if ok:
+            (chat_latencies if chat else latencies).append(time.perf_counter() - start)
+        else:
+            errors.append(1)
+
+
+async def run_level(url, level, duration, mix):
+    latencies, chat_latencies, errors = [], [], []
+    limits = httpx.Limits(max_connections=level, max_keepalive_connections=level)
+    async with httpx.AsyncClient(limits=limits, timeout=60) as client:
+        deadline = time.monotonic() + duration
+        started = time.perf_counter()
+        await asyncio.gather(*(
+            client_loop(client, url, number, deadline, mix, latencies, chat_latencies, errors)
+            for number in range(level)
+        ))
+        elapsed = time.perf_counter() - started
+    return {
+        'throughput': (len(latencies) + len(chat_latencies)) / elapsed,
+        'p50': percentile(latencies, 0.5),
+        'p99': percentile(latencies, 0.99),
+        'chat_p99': percentile(chat_latencies, 0.99),
+        'errors': len(errors)
+    }
+
+
+def percentile(values, q):
+    if not values:
+        return float('nan')
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument('--server', choices=['wsgi', 'asgi'])
+    target.add_argument('--url')
+    parser.add_argument('--workers', type=int, default=1, help='uvicorn worker processes (asgi)')
+    parser.add_argument('--levels', default='1,2,4,8,16,32,64')
+    parser.add_argument('--duration', type=float, default=5.0, help='seconds per level')
+    parser.add_argument('--p99-ms', type=float, default=250.0)
+    parser.add_argument('--chat-ratio', type=float, default=0.1)
+    parser.add_argument('--stats-ratio', type=float, default=0.2)
+    parser.add_argument('--upstream-latency', type=float, default=0.5, help='stub chat completion time in seconds')
+    args = parser.parse_args()
+
+    StubState.latency = args.upstream_latency
+    stub, upstream_url = start_stub()
+    process = None
+    url = args.url
+    if args.server:
+        process, url = spawn(args.server, upstream_url, args.workers)
+
+    mix = {'chat': args.chat_ratio, 'stats': args.stats_ratio}
+    best = None
+    try:
+        print(f"{args.server or url}: {args.duration:.0f}s per level, chat {args.chat_ratio:.0%}, "
+              f"stats {args.stats_ratio:.0%}, upstream {args.upstream_latency * 1000:.0f} ms")
+        print(f"{'clients':>8}{'req/s':>10}{'p50 ms':>10}{'p99 ms':>10}{'chat p99':>10}{'errors':>8}")
+        for level in [int(value) for value in args.levels.split(',')]:
+            report = asyncio.run(run_level(url, level, args.duration, mix))
+            print(f"{level:>8}{report['throughput']:>10.0f}{report['p50'] * 1000:>10.1f}"
+                  f"{report['p99'] * 1000:>10.1f}{report['chat_p99'] * 1000:>10.1f}{report['errors']:>8}")
+            if report['p99'] * 1000 <= args.p99_ms and not report['errors']:
+                best = (level, report['throughput'])
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+        stub.shutdown()
+
+    if best:
+        print(f"max concurrency at p99 <= {args.p99_ms:.0f} ms: {best[0]} clients, {best[1]:.0f} req/s")
+    else:
+        print(f"no level kept p99 <= {args.p99_ms:.0f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+"""Local stand-in for URL shorteners, for trying the expansion layer offline.
+
+Run it and point the expander at it as an HTTP proxy
+(URL_EXPANSION_PROXY=http://127.0.0.1:8765); http:// links on any shortener
+host are then answered here, by path:
+
+  /go/N             301 to http://landing-N.example.com/offer
+  /ip/N             301 to http://10.0.0.N/login
+  /tk/N             301 to http://prize-N.tk/claim
+  /chain/K/N        302 to http://tinyurl.com/chain/K-1/N, then /go/N at 0
+  /slow/MS/N        waits MS milliseconds, then as /go/N
+  /loop/N           302 to itself
+  anything else     404
+
+Usage: python benchmarks/redirect_stub.py [--port 8765]
+"""
+import argparse
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+
+def redirect_for(host, path):
+    """(status, location) the stub answers for a shortener URL"""
+    parts = path.strip('/').split('/')
+    try:
+        kind, numbers = parts[0], [int(part) for part in parts[1:]]
+    except ValueError:
+        return 404, None
+    if kind == 'go' and len(numbers) == 1:
+        return 301, f'http://landing-{numbers[0]}.example.com/offer'
+    if kind == 'ip' and len(numbers) == 1:
+        return 301, f'http://10.0.0.{numbers[0] % 250 + 1}/login'
+    if kind == 'tk' and len(numbers) == 1:
+        return 301, f'http://prize-{numbers[0]}.tk/claim'
+    if kind == 'chain' and len(numbers) == 2:
+        hops, number = numbers
+        if hops <= 0:
+            return redirect_for(host, f'/go/{number}')
+        return 302, f'http://tinyurl.com/chain/{hops - 1}/{number}'
+    if kind == 'slow' and len(numbers) == 2:
+        time.sleep(numbers[0] / 1000)
+        return redirect_for(host, f'/go/{numbers[1]}')
+    if kind == 'loop' and len(numbers) == 1:
+        return 302, f'http://{host}{path}'
+    return 404, None
+
+
+class RedirectStub:
+    """The stub server on a background thread; ``hits`` counts requests per URL"""
+
+    def __init__(self, port=0):
+        stub = self
+        self.hits = Counter()
+        self._lock = threading.Lock()
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                # As a proxy the request line holds the absolute URL
+                parts = urlsplit(self.path)
+                host = parts.hostname or self.headers.get('Host', '')
+                with stub._lock:
+                    stub.hits[f'{host}{parts.path}'] += 1
+                status, location = redirect_for(host, parts.path)
+                self.send_response(status)
+                if location:
+                    self.send_header('Location', location)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', port), Handler)
+        self.server.daemon_threads = True
+        self.url = f'http://127.0.0.1:{self.server.server_address[1]}'
+        self._thread = threading.Thread(target=self.server.serve_forever, name='redirect-stub', daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--port', type=int, default=8765)
+    args = parser.parse_args()
+
+    stub = RedirectStub(args.port)
+    print(f"Redirect stub listening on {stub.url}")
+    try:
+        stub.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+import codecs
+import csv
+import io
+import json
+from itertools import islice
+
+FORMATS = ('ndjson', 'csv')
+
+# Result fields written per message; the full result (recommendations,
+# summary, ...) would multiply the output size for no use in bulk scans
+OUTPUT_FIELDS = ('scamRisk', 'credibilityScore', 'verdict', 'warnings', 'detailedScores')
+
+
+def detect_format(name='', content_type=''):
+    """'csv' for .csv files or text/csv bodies, else 'ndjson'"""
+    if name.lower().endswith('.csv') or 'csv' in (content_type or '').lower():
+        return 'csv'
+    return 'ndjson'
+
+
+def read_records(stream, fmt, offset=0):
+    """Yield (record, offset) for each message in a binary NDJSON or CSV stream.
+
+    A record is a dict with ``content`` and optionally ``id`` and
+    ``user_email``; NDJSON lines may also be bare JSON strings. Lines that
+    cannot be used yield {'error': ...} so they keep their index. For NDJSON
+    ``offset`` is the byte position after the record (``offset`` is where
+    the stream starts); CSV fields may span lines, so it is None there.
+    """
+    if fmt == 'csv':
+        reader = csv.DictReader(io.TextIOWrapper(stream, encoding='utf-8-sig', newline=''))
+        if reader.fieldnames is None or 'content' not in reader.fieldnames:
+            raise ValueError("CSV input needs a header row with a 'content' column")
+        for row in reader:
+            yield {key: value for key, value in row.items() if key and value}, None
+        return
+
+    decode = codecs.getincrementaldecoder('utf-8')().decode
+    for line in stream:
+        offset += len(line)
+        try:
+            text = decode(line).strip()
+            if not text:
+                continue
+            record = json.loads(text)
+        except ValueError as e:
+            yield {'error': f'Invalid JSON line: {e}'}, offset
+            continue
+        if isinstance(record, str):
+            record = {'content': record}
+        elif not isinstance(record, dict):
+            record = {'error': 'Each line must be a JSON object or string'}
+        yield record, offset
+
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def analyze_stream(records, engine, store, batch_size=500, first_index=0, user_name='Bulk ingest'):
+    """Score a stream of records in batches; yield one output dict per record.
+
+    Only one batch is held in memory. Each batch is scored with
+    ``engine.analyze_batch``; its outputs are yielded first and then
+    ``store(scored, consumed, offset)`` persists it, where ``scored`` holds
+    (record, result) for every message that scored, ``consumed`` counts
+    records from the start of the input and ``offset`` is the input
+    position after the batch. A {'checkpoint': consumed} dict follows each
+    stored batch. Outputs carry the record's ``index`` in the input and its
+    ``id`` when it has one.
+    """
+    index = first_index
+    for batch in batched(records, batch_size):
+        usable = [
+            'error' not in record and isinstance(record.get('content'), str) and bool(record['content'].strip())
+            for record, _ in batch
+        ]
+        contents = [record['content'] for (record, _), ok in zip(batch, usable) if ok]
+        results = iter(engine.analyze_batch(contents, user_name))
+
+        scored = []
+        for (record, _), ok in zip(batch, usable):
+            output = {'index': index}
+            if 'id' in record:
+                output['id'] = record['id']
+            index += 1
+            if 'error' in record:
+                output['error'] = record['error']
+            elif not ok:
+                output['error'] = 'Content must be a non-empty string'
+            else:
+                result = next(results)
+                if 'error' in result:
+                    output['error'] = result['error']
+                else:
+                    output.update((field, result[field]) for field in OUTPUT_FIELDS)
+                    scored.append((record, result))
+            yield output
+
+        store(scored, index, batch[-1][1])
+        yield {'checkpoint': index}
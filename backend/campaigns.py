@@ -0,0 +1,249 @@
+import heapq
+import re
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from datetime import datetime
+from functools import lru_cache
+
+# numpy is imported on first use so loading this module stays cheap
+
+# Numbers are folded to one token and links to their host, so copies that
+# only differ in amounts, reference codes or tracking paths still share shingles
+_WORD = re.compile(r'\w+')
+_DIGITS = re.compile(r'\d+')
+_URL_PATH = re.compile(r'(https?://[^/\s]+)\S*')
+
+_PAIR_MULTIPLIER = 0x9E3779B97F4A7C15
+
+# Shingles hashed per step, so the (shingles x num_perm) matrix stays small
+_CHUNK_SHINGLES = 4096
+
+CampaignMatch = namedtuple('CampaignMatch', 'campaign_id size similarity scored check')
+
+
+def normalized_words(content):
+    return _WORD.findall(_DIGITS.sub('0', _URL_PATH.sub(r'\1', content.lower())))
+
+
+def shingle_hashes(words):
+    """64-bit hash of every pair of consecutive words.
+
+    Built from Python's string hash, which is salted per process: signatures
+    are only comparable within the process that computed them.
+    """
+    import numpy as np
+    hashes = np.fromiter(map(hash, words), dtype=np.int64, count=len(words)).view(np.uint64)
+    return hashes[:-1] * np.uint64(_PAIR_MULTIPLIER) + hashes[1:]
+
+
+@lru_cache(maxsize=None)
+def _hash_family(num_perm, bands, seed):
+    """(multipliers, increments, band multipliers) of a CampaignIndex"""
+    import numpy as np
+    rng = np.random.default_rng(seed)
+    # Multiply-shift hash family: (a * x + b) mod 2**64, top 32 bits
+    multipliers = rng.integers(1, 2 ** 63, num_perm, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+    increments = rng.integers(0, 2 ** 63, num_perm, dtype=np.uint64)
+    # Each band's rows are folded into one bucket key with its own multipliers
+    band_multipliers = rng.integers(1, 2 ** 63, (bands, num_perm // bands), dtype=np.uint64)
+    return multipliers, increments, band_multipliers
+
+
+class Campaign:
+    __slots__ = ('id', 'signature', 'keys', 'size', 'first_seen', 'last_seen', 'sample',
+                 'score_key', 'scored', 'check', 'verdict', 'scam_risk')
+
+    def __init__(self, campaign_id, signature, keys, sample, now):
+        self.id = campaign_id
+        self.signature = signature
+        self.keys = keys
+        self.size = 1
+        self.first_seen = now
+        self.last_seen = now
+        self.sample = sample
+        self.score_key = None
+        self.scored = None
+        self.check = None
+        self.verdict = None
+        self.scam_risk = None
+
+
+class CampaignIndex:
+    """Groups near-duplicate messages into campaigns with MinHash and LSH banding.
+
+    Each message is reduced to ``num_perm`` MinHash values over its word
+    bigrams; the signature is cut into ``bands`` bands and a campaign is
+    found through any band it shares with the message, then confirmed when
+    the estimated Jaccard similarity reaches ``similarity``. Otherwise the
+    message starts a new campaign. Only one signature per campaign is kept
+    (its first message), and at most ``max_campaigns`` campaigns: the least
+    recently seen is evicted first, so memory is bounded however many
+    messages arrive. Messages under ``min_words`` words are not clustered,
+    and only the first ``max_words`` words of a message are hashed. A
+    message seen before, by the ``content_key`` passed to ``observe``, joins
+    its campaign again without being hashed.
+
+    With ``reuse_similarity`` set, a campaign remembers a scored result and
+    ``observe`` hands it back, with the ``check`` remembered alongside, for
+    messages at least that similar that are scored the same way. Similar is
+    not identical: the caller must confirm the copy against ``check``
+    before reusing the score.
+    """
+
+    def __init__(self, max_campaigns=20000, num_perm=48, bands=24, similarity=0.5,
+                 reuse_similarity=None, min_words=6, max_words=5000, seed=1):
+        if num_perm % bands:
+            raise ValueError('num_perm must be a multiple of bands')
+        self.max_campaigns = max_campaigns
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.similarity = similarity
+        self.reuse_similarity = reuse_similarity
+        self.min_words = min_words
+        self.max_words = max_words
+        self.seed = seed
+        self._campaigns = OrderedDict()
+        # content key -> (campaign id, similarity) of messages already placed
+        self._known = OrderedDict()
+        self._buckets = {}
+        self._next_id = 1
+        self._lock = threading.Lock()
+        self.messages = 0
+        self.evictions = 0
+
+    def signature(self, content):
+        """MinHash signature of ``content``, or None if it is too short to cluster"""
+        words = normalized_words(content)[:self.max_words]
+        if len(words) < self.min_words:
+            return None
+        import numpy as np
+        multipliers, increments, _ = _hash_family(self.num_perm, self.bands, self.seed)
+        shingles = shingle_hashes(words)
+        signature = None
+        for start in range(0, len(shingles), _CHUNK_SHINGLES):
+            # uint64 array arithmetic wraps silently, which is what the hash wants
+            permuted = (shingles[start:start + _CHUNK_SHINGLES, None] * multipliers + increments) >> np.uint64(32)
+            lowest = permuted.min(axis=0)
+            signature = lowest if signature is None else np.minimum(signature, lowest)
+        return signature.astype(np.uint32)
+
+    def _band_keys(self, signature):
+        band_multipliers = _hash_family(self.num_perm, self.bands, self.seed)[2]
+        return tuple((signature.reshape(self.bands, self.rows) * band_multipliers).sum(axis=1).tolist())
+
+    def observe(self, content, score_key=None, content_key=None):
+        """Count ``content`` towards its campaign, starting one if none matches.
+
+        Returns a CampaignMatch, or None for messages too short to cluster.
+        ``scored`` is the campaign's remembered result when it was scored
+        under ``score_key`` and the message is similar enough to reuse it.
+        """
+        if content_key is not None:
+            with self._lock:
+                known = self._known.get(content_key)
+                if known is not None and known[0] in self._campaigns:
+                    self._known.move_to_end(content_key)
+                    self.messages += 1
+                    return self._join(self._campaigns[known[0]], known[1], score_key, time.time())
+
+        signature = self.signature(content)
+        if signature is None:
+            return None
+        keys = self._band_keys(signature)
+        now = time.time()
+
+        with self._lock:
+            self.messages += 1
+            best, best_similarity = None, 0.0
+            for candidate_id in {self._buckets[key] for key in keys if key in self._buckets}:
+                campaign = self._campaigns[candidate_id]
+                similarity = int((campaign.signature == signature).sum()) / self.num_perm
+                if similarity > best_similarity:
+                    best, best_similarity = campaign, similarity
+
+            if best is not None and best_similarity >= self.similarity:
+                self._remember_key(content_key, best.id, best_similarity)
+                return self._join(best, best_similarity, score_key, now)
+
+            campaign = Campaign(self._next_id, signature, keys, content[:200], now)
+            self._next_id += 1
+            self._campaigns[campaign.id] = campaign
+            for key in keys:
+                self._buckets.setdefault(key, campaign.id)
+            while len(self._campaigns) > self.max_campaigns:
+                self._evict()
+            self._remember_key(content_key, campaign.id, 1.0)
+            return CampaignMatch(campaign.id, 1, 1.0, None, None)
+
+    def _join(self, campaign, similarity, score_key, now):
+        campaign.size += 1
+        campaign.last_seen = now
+        self._campaigns.move_to_end(campaign.id)
+        if (self.reuse_similarity is not None and score_key is not None
+                and campaign.score_key == score_key and similarity >= self.reuse_similarity):
+            return CampaignMatch(campaign.id, campaign.size, similarity, campaign.scored, campaign.check)
+        return CampaignMatch(campaign.id, campaign.size, similarity, None, None)
+
+    def _remember_key(self, content_key, campaign_id, similarity):
+        if content_key is None:
+            return
+        self._known[content_key] = (campaign_id, similarity)
+        while len(self._known) > self.max_campaigns:
+            self._known.popitem(last=False)
+
+    def remember(self, campaign_id, scored, score_key=None, check=None):
+        """Record a campaign's latest verdict; with ``score_key``, and when
+        reuse is on, also keep ``scored`` and ``check`` for its later copies
+        scored the same way
+        """
+        with self._lock:
+            campaign = self._campaigns.get(campaign_id)
+            if campaign is None:
+                return
+            campaign.verdict = scored['verdict']
+            campaign.scam_risk = scored['scamRisk']
+            if self.reuse_similarity is not None and score_key is not None and campaign.score_key != score_key:
+                campaign.score_key = score_key
+                campaign.scored = scored
+                campaign.check = check
+
+    def _evict(self):
+        _, campaign = self._campaigns.popitem(last=False)
+        for key in campaign.keys:
+            if self._buckets.get(key) == campaign.id:
+                del self._buckets[key]
+        self.evictions += 1
+
+    def top(self, limit=20, window=86400, min_size=2):
+        """Largest campaigns seen within the last ``window`` seconds"""
+        since = time.time() - window
+        with self._lock:
+            active = [
+                campaign for campaign in self._campaigns.values()
+                if campaign.last_seen >= since and campaign.size >= min_size
+            ]
+            largest = heapq.nlargest(limit, active, key=lambda campaign: campaign.size)
+            return [
+                {
+                    'id': campaign.id,
+                    'size': campaign.size,
+                    'firstSeen': datetime.utcfromtimestamp(campaign.first_seen).isoformat(),
+                    'lastSeen': datetime.utcfromtimestamp(campaign.last_seen).isoformat(),
+                    'sample': campaign.sample,
+                    'verdict': campaign.verdict,
+                    'scamRisk': campaign.scam_risk
+                }
+                for campaign in largest
+            ]
+
+    def stats(self):
+        with self._lock:
+            return {
+                'campaigns': len(self._campaigns),
+                'buckets': len(self._buckets),
+                'messages': self.messages,
+                'known': len(self._known),
+                'evictions': self.evictions
+            }
@@ -0,0 +1,32 @@
+import hashlib
+import zlib
+
+STORAGE_MODES = ('inline', 'dedup')
+
+# First byte of a stored body: how the rest is encoded. Short messages
+# often grow under zlib, so they are kept as plain UTF-8.
+_RAW = b'r'
+_ZLIB = b'z'
+
+
+def fingerprint(content):
+    """16-byte BLAKE2b digest of the exact text, the key of its stored body"""
+    return hashlib.blake2b(content.encode('utf-8', 'surrogatepass'), digest_size=16).digest()
+
+
+def pack(content, level=9):
+    """Encode text for storage, deflated when that makes it smaller"""
+    data = content.encode('utf-8', 'surrogatepass')
+    # Raw deflate: no zlib header or checksum, six bytes a row saved
+    compressor = zlib.compressobj(level, zlib.DEFLATED, -zlib.MAX_WBITS)
+    compressed = compressor.compress(data) + compressor.flush()
+    if len(compressed) < len(data):
+        return _ZLIB + compressed
+    return _RAW + data
+
+
+def unpack(body):
+    """The text a ``pack`` body holds"""
+    body = bytes(body)
+    data = zlib.decompress(body[1:], -zlib.MAX_WBITS) if body[:1] == _ZLIB else body[1:]
+    return data.decode('utf-8', 'surrogatepass')
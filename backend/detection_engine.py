@@ -1,14 +1,114 @@
-import re
-import requests
-from textblob import TextBlob
-import numpy as np
-from sklearn.feature_extraction.text import TfidfVectorizer
-import pickle
-import os
+import time
 from datetime import datetime
+from pattern_matcher import PatternMatcher
+from features import extract_features_batch
+from sentiment import SentimentScorer
+from analysis_context import AnalysisContext
+from keyword_index import KeywordIndex
+from url_reputation import BlocklistTable, parse_url, host_suffixes
+from url_expander import ShortUrlExpander
+from text_model import TextModel
+from result_cache import normalize_content, content_hash
+
+# Bumped whenever layers or scoring change in a way that alters results
+PIPELINE_VERSION = '3.4'
+
+def _drain(steps):
+    """Result of a scoring generator that runs its model layer itself"""
+    try:
+        next(steps)
+    except StopIteration as done:
+        return done.value
+    raise RuntimeError('model probability requested outside a batch')
+
+def _rule_list(name):
+    """Engine attribute that keeps any assigned sequence as a tuple"""
+    attribute = '_' + name
+    return property(
+        lambda self: getattr(self, attribute),
+        lambda self, values: setattr(self, attribute, tuple(values))
+    )
+
+class AnalysisLayer:
+    """One step of the scoring pipeline.
+
+    ``analyze(context)`` takes the message's AnalysisContext and returns
+    analysis entries that are merged into the dict handed to
+    ``_combine_analyses``; ``default`` holds the entries used
+    when the layer does not run and must be its lowest-risk outcome. Layers
+    run cheapest ``cost`` first. A layer with ``worst_case`` entries may be
+    short-circuited: it is skipped once the verdict is the same whether it
+    would return its default or its worst case.
+    """
+
+    def __init__(self, name, analyze, cost, default, worst_case=None):
+        self.name = name
+        self.analyze = analyze
+        self.cost = cost
+        self.default = default
+        self.worst_case = worst_case
 
 class AdvancedDetectionEngine:
-    def __init__(self):
+    # Rule attributes that may be replaced after construction. They are
+    # stored as tuples (see _rule_list), so they only change by assignment
+    # and an unchanged list costs an identity check per message however many
+    # terms it holds.
+    RULE_LISTS = ('scam_patterns', 'misinfo_patterns', 'financial_keywords', 'medical_keywords')
+    scam_patterns = _rule_list('scam_patterns')
+    misinfo_patterns = _rule_list('misinfo_patterns')
+    financial_keywords = _rule_list('financial_keywords')
+    medical_keywords = _rule_list('medical_keywords')
+
+    # Hosts (and their subdomains) of URL shortening services
+    SHORTENERS = frozenset(('bit.ly', 'tinyurl.com', 't.co', 'goo.gl', 'ow.ly'))
+    SUSPICIOUS_TLDS = frozenset(('tk', 'ml', 'ga', 'cf'))
+
+    # Cheap layers run on every campaign copy before its campaign's score is
+    # reused: an appended scam phrase or link changes their results
+    CAMPAIGN_CHECK_LAYERS = ('patterns', 'urls', 'domain')
+
+    def __init__(self, max_scan_chars=200000, pattern_time_budget=0.25, proximity_window=12,
+                 result_cache=None, layers=None, short_circuit=True, executor=None,
+                 url_blocklist=None, url_blocklist_check_interval=5.0, url_expansion=None,
+                 campaigns=None, text_model=None, text_model_check_interval=5.0, text_model_weight=0.3):
+        # Bounds on pattern matching work per message
+        self.max_scan_chars = max_scan_chars
+        self.pattern_time_budget = pattern_time_budget
+        self.proximity_window = proximity_window
+
+        # Optional ResultCache of scored results keyed by normalized content
+        self.result_cache = result_cache
+        
+        # Optional DetectionPool that scores cache misses in worker processes
+        self.executor = executor
+        
+        # Optional CampaignIndex grouping near-duplicate messages; when its
+        # reuse is on, copies close enough to a campaign's scored message,
+        # with the same pattern, URL and domain results, reuse its score
+        self.campaigns = campaigns
+        
+        # Optional compiled domain blocklist (see url_reputation.compile_blocklist)
+        self.url_blocklist = BlocklistTable(
+            url_blocklist, check_interval=url_blocklist_check_interval
+        ) if url_blocklist else None
+        
+        # Optional ShortUrlExpander options; when set, the 'expansion' layer
+        # follows shortened links and scores where they lead
+        self.url_expansion = dict(url_expansion) if url_expansion else None
+        self.url_expander = ShortUrlExpander(
+            self.SHORTENERS, **self.url_expansion
+        ) if self.url_expansion else None
+        
+        # Optional trained text classifier (see text_model.train_model); its
+        # scam probability, times text_model_weight, is added to the scam risk
+        self.text_model = TextModel(
+            text_model, check_interval=text_model_check_interval
+        ) if text_model else None
+        self.text_model_weight = text_model_weight
+        
+        # Lexicon-based polarity/subjectivity, loaded on first use
+        self.sentiment = SentimentScorer()
+
         self.scam_patterns = [
             r'urgent.*action.*required',
             r'click.*here.*immediately',
@@ -49,161 +149,696 @@ class AdvancedDetectionEngine:
             'supplement', 'vitamin', 'remedy', 'healing'
         ]
 
-    def analyze_comprehensive(self, content, user_name):
-        """Perform comprehensive multi-layer analysis"""
-        
-        # Layer 1: Pattern matching
-        scam_score = self._analyze_scam_patterns(content)
-        misinfo_score = self._analyze_misinfo_patterns(content)
-        
-        # Layer 2: URL analysis
-        url_analysis = self._analyze_urls(content)
-        
-        # Layer 3: Sentiment and language analysis
-        sentiment_analysis = self._analyze_sentiment(content)
+        # Patterns and keywords are compiled on first use (or by warm_up)
+        self.pattern_matcher = None
+        self.keyword_index = None
+        self._compiled_rules = None
+        self._rules_version = None
+
+        self.layers = {}
+        self.register_layer(AnalysisLayer(
+            'patterns', self._analyze_patterns, cost=1,
+            default={
+                'scam_patterns': (0, []),
+                'misinfo_patterns': (0, []),
+                'pattern_scan': {'mode': 'skipped', 'budgetExceeded': False, 'truncated': False, 'scannedChars': 0}
+            }
+        ))
+        self.register_layer(AnalysisLayer(
+            'urls', lambda context: {'url_analysis': self._analyze_urls(context)}, cost=1,
+            default={'url_analysis': {'risk_score': 0, 'warnings': [], 'url_count': 0}}
+        ))
+        self.register_layer(AnalysisLayer(
+            'domain', lambda context: {'domain': self._analyze_domain_specific(context)}, cost=1,
+            default={'domain': {'financial_risk': 0, 'medical_risk': 0}}
+        ))
+        self.register_layer(AnalysisLayer(
+            'features', lambda context: {'ml_features': context.features}, cost=2,
+            default={'ml_features': {
+                'word_count': 0, 'char_count': 0, 'avg_word_length': 0, 'uppercase_ratio': 0,
+                'punctuation_ratio': 0, 'number_count': 0, 'currency_mentions': 0
+            }}
+        ))
+        self.register_layer(AnalysisLayer(
+            'sentiment', lambda context: {'sentiment': self._analyze_sentiment(context)}, cost=10,
+            default={'sentiment': {'polarity': 0, 'subjectivity': 0, 'manipulation_score': 0}},
+            worst_case={'sentiment': {'polarity': 1, 'subjectivity': 1, 'manipulation_score': 50}}
+        ))
+        if self.text_model is not None:
+            self.register_layer(AnalysisLayer(
+                'model', lambda context: {'ml_model': {'probability': self.text_model.predict([context.content])[0]}},
+                cost=3,
+                default={'ml_model': {'probability': 0.0}},
+                worst_case={'ml_model': {'probability': 1.0}}
+            ))
+        if self.url_expander is not None:
+            self.register_layer(AnalysisLayer(
+                'expansion', lambda context: {'url_expansion': self._analyze_expansions(context)}, cost=20,
+                default={'url_expansion': {'risk_score': 0, 'warnings': [], 'expanded': []}},
+                worst_case={'url_expansion': {'risk_score': 100, 'warnings': [], 'expanded': []}}
+            ))
+
+        # Layers run when a request does not pick its own
+        self.default_layers = [layer.name for layer in self._resolve_layers(layers)]
+        self.short_circuit = short_circuit
+
+    def settings(self):
+        """Everything needed to rebuild an equivalent engine in another process"""
+        settings = {
+            'max_scan_chars': self.max_scan_chars,
+            'pattern_time_budget': self.pattern_time_budget,
+            'proximity_window': self.proximity_window,
+            'layers': list(self.default_layers),
+            'short_circuit': self.short_circuit,
+            'url_blocklist': self.url_blocklist.path if self.url_blocklist is not None else None,
+            'url_blocklist_check_interval': (
+                self.url_blocklist.check_interval if self.url_blocklist is not None else 5.0
+            ),
+            'url_expansion': dict(self.url_expansion) if self.url_expansion else None,
+            'text_model': self.text_model.path if self.text_model is not None else None,
+            'text_model_check_interval': (
+                self.text_model.check_interval if self.text_model is not None else 5.0
+            ),
+            'text_model_weight': self.text_model_weight
+        }
+        for name in self.RULE_LISTS:
+            settings[name] = list(getattr(self, name))
+        return settings
+
+    def settings_version(self):
+        """Cheap to compare stand-in for ``settings()``: changes whenever they do"""
+        return (
+            self._rules_key(), self.pattern_time_budget, self.proximity_window,
+            tuple(self.default_layers), self.short_circuit,
+            self.url_blocklist.path if self.url_blocklist is not None else None,
+            tuple(sorted(self.url_expansion.items())) if self.url_expansion else None,
+            self.text_model.path if self.text_model is not None else None, self.text_model_weight
+        )
+
+    @classmethod
+    def from_settings(cls, settings):
+        """Build an engine (without cache or executor) from ``settings()``"""
+        settings = dict(settings)
+        rules = {name: settings.pop(name) for name in cls.RULE_LISTS}
+        engine = cls(**settings)
+        for name, values in rules.items():
+            setattr(engine, name, values)
+        return engine
+
+    def register_layer(self, layer):
+        """Add an AnalysisLayer to the pipeline, replacing any layer with the same name"""
+        self.layers[layer.name] = layer
+
+    def warm_up(self):
+        """Compile patterns and load lazily imported dependencies before taking traffic"""
+        self._refresh_rules()
+        sample = "Warm-up: URGENT action required, you won $1,000! https://bit.ly/x"
+        self._analyze_sentiment(AnalysisContext(sample))
+        extract_features_batch([sample])
+        if self.text_model is not None:
+            self.text_model.predict([sample])
+
+    def _rules_key(self):
+        return (
+            self.scam_patterns, self.misinfo_patterns,
+            self.financial_keywords, self.medical_keywords,
+            self.max_scan_chars
+        )
+
+    def _refresh_rules(self):
+        """Recompile patterns and drop cached results when the rules, the blocklist or the model change"""
+        if self.url_blocklist is not None:
+            self.url_blocklist.refresh()
+        if self.text_model is not None:
+            self.text_model.refresh()
+        rules = self._rules_key()
+        version = (
+            rules, self.url_blocklist.version if self.url_blocklist is not None else None,
+            self.text_model.version if self.text_model is not None else None, PIPELINE_VERSION
+        )
+        if version == self._rules_version:
+            return
+
+        if rules != self._compiled_rules:
+            # Scam and misinformation patterns share one single-pass matcher
+            self.pattern_matcher = PatternMatcher(
+                [(('scam', pattern), pattern) for pattern in self.scam_patterns] +
+                [(('misinfo', pattern), pattern) for pattern in self.misinfo_patterns]
+            )
+            self.keyword_index = KeywordIndex({
+                'financial': self.financial_keywords,
+                'medical': self.medical_keywords
+            })
+            self._compiled_rules = rules
+        if self.result_cache is not None:
+            self.result_cache.validate(version)
+        self._rules_version = version
+
+    def analyze_comprehensive(self, content, user_name, ml_features=None, layers=None,
+                              short_circuit=None, timings=None):
+        """Perform comprehensive multi-layer analysis
+
+        ``layers`` picks which registered layers run (default: the engine's
+        default_layers) and ``short_circuit`` overrides the engine setting.
+        When ``timings`` is a dict, each layer that runs records its seconds.
+        """
+        return _drain(self._analyze_steps(content, user_name, ml_features, layers, short_circuit, timings))
+
+    def _analyze_steps(self, content, user_name, ml_features=None, layers=None,
+                       short_circuit=None, timings=None, defer_model=False):
+        """analyze_comprehensive as a generator; with ``defer_model`` it
+        yields the content when the model layer runs and is sent back the
+        probability, and the time it waits is not counted as its own
+        """
+        started = time.perf_counter()
+        self._refresh_rules()
+        selected = self._resolve_layers(layers)
+        if short_circuit is None:
+            short_circuit = self.short_circuit
+        
+        key = None
+        if self.result_cache is not None:
+            content = normalize_content(content)
+            key = self._cache_key(content, selected, short_circuit)
+        scored = self.result_cache.get(key) if key is not None else None
+        match, score_key = self._observe_campaign(content, selected, short_circuit)
+        
+        if scored is not None:
+            self._remember_campaign(match, score_key, scored, content, selected)
+            return self._with_campaign(self._personalize(scored, user_name, time.perf_counter() - started), match)
+        reused = self._reusable_campaign_score(match, content, selected)
+        if reused is not None:
+            return self._with_campaign(
+                self._personalize(reused, user_name, time.perf_counter() - started), match, reused=True
+            )
+        
+        if self.executor is not None:
+            scored, layer_timings, error, _ = self.executor.score(
+                self, content, [layer.name for layer in selected], short_circuit
+            )
+            if error is not None:
+                raise RuntimeError(error)
+            if timings is not None:
+                timings.update(layer_timings)
+        else:
+            steps = self._score_steps(content, selected, short_circuit, ml_features, timings, defer_model)
+            try:
+                request = next(steps)
+                while True:
+                    paused = time.perf_counter()
+                    probability = yield request
+                    started += time.perf_counter() - paused
+                    request = steps.send(probability)
+            except StopIteration as done:
+                scored = done.value
+        
+        self._store(key, scored)
+        self._remember_campaign(match, score_key, scored, content, selected)
+        return self._with_campaign(self._personalize(scored, user_name, time.perf_counter() - started), match)
+
+    def analyze_batch(self, contents, user_name, layers=None, short_circuit=None, timings=None):
+        """Analyze many messages, extracting ML features and running the text
+        model for the whole batch at once
+
+        Every message is analyzed up to its model layer first; the text model
+        then scores, in one call, only the messages that reached it, so those
+        whose verdict settled earlier cost no inference. When ``timings`` is
+        a list, one layer timing dict per message is appended to it; each
+        scored message is charged an equal share of the batch feature
+        extraction and, when its model layer ran, of the batch inference.
+        """
+        if self.result_cache is not None:
+            # Features must describe the same text the cache scores
+            contents = [normalize_content(content) for content in contents]
+        
+        if self.executor is not None:
+            return self._analyze_batch_pooled(contents, user_name, layers, short_circuit, timings)
+        
+        selected = self._resolve_layers(layers)
+        features_share = None
+        if contents and any(layer.name == 'features' for layer in selected):
+            started = time.perf_counter()
+            batch_features = extract_features_batch(contents)
+            features_share = (time.perf_counter() - started) / len(contents)
+        else:
+            batch_features = [None] * len(contents)
         
-        # Layer 4: Domain-specific analysis
-        domain_analysis = self._analyze_domain_specific(content)
+        batch_timings = [{} for _ in contents]
+        outcomes, _, model_share = self._run_steps([
+            self._analyze_steps(content, user_name, ml_features, layers, short_circuit, item_timings, defer_model=True)
+            for content, ml_features, item_timings in zip(contents, batch_features, batch_timings)
+        ])
         
-        # Layer 5: Advanced ML features
-        ml_features = self._extract_ml_features(content)
+        results = []
+        for outcome, item_timings in zip(outcomes, batch_timings):
+            results.append({'error': str(outcome)} if isinstance(outcome, Exception) else outcome)
+            if timings is not None:
+                # Empty timings mean the result came from the cache
+                if item_timings and features_share is not None:
+                    item_timings['features'] = features_share
+                ran = results[-1].get('pipeline', {}).get('layers', ())
+                if item_timings and model_share is not None and 'model' in ran:
+                    item_timings['model'] = model_share
+                timings.append(item_timings)
+        return results
+
+    def _run_steps(self, steps):
+        """Run generators from _analyze_steps or _score_steps side by side:
+        each goes until it asks for a model probability, the text model
+        scores everything asked for in one batch, and the answers resume
+        them. Returns each generator's result or the exception it raised,
+        the seconds each spent running, and the inference seconds charged
+        per message that asked (None if none did).
+        """
+        outcomes = [None] * len(steps)
+        active = [0.0] * len(steps)
+        requests = dict.fromkeys(range(len(steps)))
+        answers = [None] * len(steps)
+        model_share = None
+        while requests:
+            asked, requests = requests, {}
+            for index, answer in zip(asked, answers):
+                started = time.perf_counter()
+                try:
+                    requests[index] = steps[index].send(answer)
+                except StopIteration as done:
+                    outcomes[index] = done.value
+                except Exception as e:
+                    outcomes[index] = e
+                active[index] += time.perf_counter() - started
+            if requests:
+                started = time.perf_counter()
+                answers = self.text_model.predict(list(requests.values()))
+                model_share = (time.perf_counter() - started) / len(requests)
+        return outcomes, active, model_share
+
+    def _analyze_batch_pooled(self, contents, user_name, layers, short_circuit, timings):
+        """analyze_batch for an engine with an executor: cache hits are served
+        here and the misses are scored by the workers in chunks
+        """
+        self._refresh_rules()
+        selected = self._resolve_layers(layers)
+        if short_circuit is None:
+            short_circuit = self.short_circuit
+        
+        results = [None] * len(contents)
+        item_timings = [{} for _ in contents]
+        keys = [None] * len(contents)
+        matches = [(None, None)] * len(contents)
+        misses = []
+        for index, content in enumerate(contents):
+            started = time.perf_counter()
+            scored = None
+            if self.result_cache is not None:
+                keys[index] = self._cache_key(content, selected, short_circuit)
+                scored = self.result_cache.get(keys[index])
+            match, score_key = self._observe_campaign(content, selected, short_circuit)
+            matches[index] = (match, score_key)
+            if scored is not None:
+                self._remember_campaign(match, score_key, scored, content, selected)
+                results[index] = self._with_campaign(
+                    self._personalize(scored, user_name, time.perf_counter() - started), match
+                )
+                continue
+            reused = self._reusable_campaign_score(match, content, selected)
+            if reused is not None:
+                results[index] = self._with_campaign(
+                    self._personalize(reused, user_name, time.perf_counter() - started), match, reused=True
+                )
+                continue
+            misses.append(index)
+        
+        scored_batch = self.executor.score_many(
+            self, [contents[index] for index in misses], [layer.name for layer in selected], short_circuit
+        )
+        for index, (scored, layer_timings, error, elapsed) in zip(misses, scored_batch):
+            item_timings[index] = layer_timings
+            if error is not None:
+                results[index] = {'error': error}
+                continue
+            self._store(keys[index], scored)
+            match, score_key = matches[index]
+            self._remember_campaign(match, score_key, scored, contents[index], selected)
+            results[index] = self._with_campaign(self._personalize(scored, user_name, elapsed), match)
+        
+        if timings is not None:
+            timings.extend(item_timings)
+        return results
+
+    def score_batch(self, contents, layer_names, short_circuit):
+        """Score messages without cache or personalization, as a detection
+        worker does, running the text model once for the messages that
+        reach it. Returns (scored, timings, error, seconds) per message.
+        """
+        self._refresh_rules()
+        selected = self._resolve_layers(layer_names)
+        timings_base = {}
+        if contents and any(layer.name == 'features' for layer in selected):
+            started = time.perf_counter()
+            batch_features = extract_features_batch(contents)
+            timings_base['features'] = (time.perf_counter() - started) / len(contents)
+        else:
+            batch_features = [None] * len(contents)
         
-        # Combine all analyses
-        final_result = self._combine_analyses({
-            'scam_patterns': scam_score,
-            'misinfo_patterns': misinfo_score,
-            'url_analysis': url_analysis,
-            'sentiment': sentiment_analysis,
-            'domain': domain_analysis,
-            'ml_features': ml_features
-        }, content, user_name)
+        batch_timings = [dict(timings_base) for _ in contents]
+        outcomes, active, model_share = self._run_steps([
+            self._score_steps(content, selected, short_circuit, ml_features, timings, defer_model=True)
+            for content, ml_features, timings in zip(contents, batch_features, batch_timings)
+        ])
         
-        return final_result
+        scored_batch = []
+        for outcome, timings, seconds in zip(outcomes, batch_timings, active):
+            if isinstance(outcome, Exception):
+                scored_batch.append((None, timings, str(outcome), seconds))
+                continue
+            if model_share is not None and 'model' in outcome['pipeline']['layers']:
+                timings['model'] = model_share
+            scored_batch.append((outcome, timings, None, seconds))
+        return scored_batch
+
+    def _cache_key(self, content, selected, short_circuit):
+        return '%s:%s:%d' % (content_hash(content), ','.join(layer.name for layer in selected), short_circuit)
+
+    def _store(self, key, scored):
+        # Results degraded by the time budget, or scored before a short link
+        # resolved, are not worth reusing
+        if key is None or scored['patternScan']['budgetExceeded']:
+            return
+        if any(expansion['finalUrl'] is None for expansion in scored.get('expandedUrls', ())):
+            return
+        self.result_cache.put(key, scored)
+
+    def _observe_campaign(self, content, selected, short_circuit):
+        """(CampaignMatch or None, the key its reusable results are scored under)"""
+        if self.campaigns is None:
+            return None, None
+        content_key = content_hash(content)
+        # Hashing cost is bounded like pattern scanning
+        content = content[:self.max_scan_chars]
+        if self.campaigns.reuse_similarity is None:
+            return self.campaigns.observe(content, content_key=content_key), None
+        # URL layers score links exactly, so a result is only reused by
+        # copies that link to the same hosts
+        links = frozenset(
+            (parsed.scheme, parsed.host)
+            for parsed in map(parse_url, AnalysisContext(content).urls) if parsed is not None
+        )
+        score_key = (self._rules_version, tuple(layer.name for layer in selected), short_circuit, links)
+        return self.campaigns.observe(content, score_key, content_key), score_key
+
+    def _campaign_check(self, content, selected):
+        """What the cheap layers found in ``content``, or None when the
+        pattern scan ran out of budget and cannot vouch for it
+        """
+        context = AnalysisContext(content)
+        analyses = {}
+        for layer in selected:
+            if layer.name in self.CAMPAIGN_CHECK_LAYERS:
+                analyses.update(layer.analyze(context))
+        scan = analyses.pop('pattern_scan', None)
+        if scan is not None and scan['budgetExceeded']:
+            return None
+        return analyses
 
-    def _analyze_scam_patterns(self, content):
+    def _reusable_campaign_score(self, match, content, selected):
+        """The campaign's remembered result, if ``content`` passes its check"""
+        if match is None or match.scored is None or match.check is None:
+            return None
+        if self._campaign_check(content, selected) != match.check:
+            return None
+        return match.scored
+
+    def _remember_campaign(self, match, score_key, scored, content, selected):
+        if match is None:
+            return
+        # Besides what the result cache skips, expanded links are never
+        # reused: each copy of a campaign tends to carry its own short link
+        reusable = (
+            score_key is not None and match.scored is None
+            and not scored['patternScan']['budgetExceeded'] and not scored.get('expandedUrls')
+        )
+        check = self._campaign_check(content, selected) if reusable else None
+        self.campaigns.remember(match.campaign_id, scored, score_key if check is not None else None, check)
+
+    def _with_campaign(self, result, match, reused=False):
+        if match is not None:
+            result['campaign'] = {
+                'id': match.campaign_id,
+                'size': match.size,
+                'similarity': round(match.similarity, 3),
+                'reusedScore': reused
+            }
+        return result
+
+    def _resolve_layers(self, names):
+        """Return the requested layers in execution order, cheapest first"""
+        if names is None:
+            names = getattr(self, 'default_layers', None) or list(self.layers)
+        unknown = [name for name in names if name not in self.layers]
+        if unknown:
+            raise ValueError(f"Unknown analysis layer: {', '.join(unknown)}")
+        
+        order = list(self.layers)
+        return sorted(
+            (self.layers[name] for name in set(names)),
+            key=lambda layer: (layer.cost, order.index(layer.name))
+        )
+
+    def _score(self, content, layers, short_circuit, ml_features=None, timings=None):
+        """Run the selected layers; the result holds nothing user-specific"""
+        return _drain(self._score_steps(content, layers, short_circuit, ml_features, timings))
+
+    def _score_steps(self, content, layers, short_circuit, ml_features=None, timings=None, defer_model=False):
+        """_score as a generator; with ``defer_model`` the model layer yields
+        the content and is sent back its probability instead of running
+        """
+        analyses = {}
+        for layer in self.layers.values():
+            analyses.update(layer.default)
+        
+        context = AnalysisContext(content)
+        selected = {layer.name for layer in layers}
+        ran = []
+        skipped = [name for name in self.layers if name not in selected]
+        settled = False
+        
+        for position, layer in enumerate(layers):
+            if layer.worst_case is not None:
+                if short_circuit and not settled:
+                    settled = self._verdict_settled(analyses, layers[position:])
+                if settled:
+                    skipped.append(layer.name)
+                    continue
+            
+            if layer.name == 'features' and ml_features is not None:
+                # Precomputed for the whole batch; analyze_batch reports its share
+                analyses['ml_features'] = ml_features
+            elif layer.name == 'model' and defer_model:
+                # Inferred for the whole batch; the batch reports its share
+                analyses['ml_model'] = {'probability': (yield content)}
+            else:
+                started = time.perf_counter()
+                analyses.update(layer.analyze(context))
+                if timings is not None:
+                    timings[layer.name] = time.perf_counter() - started
+            ran.append(layer.name)
+        
+        result = self._combine_analyses(analyses, content)
+        result['pipeline'] = {
+            'version': PIPELINE_VERSION,
+            'layers': ran,
+            'skipped': skipped,
+            'shortCircuited': settled
+        }
+        return result
+
+    def _verdict_settled(self, analyses, remaining):
+        """Whether the remaining layers can no longer change the verdict"""
+        if any(layer.worst_case is None for layer in remaining):
+            return False
+        worst = dict(analyses)
+        for layer in remaining:
+            worst.update(layer.worst_case)
+        return self._risk_scores(analyses)[2] == self._risk_scores(worst)[2]
+
+    def _analyze_patterns(self, context):
+        """Scam and misinformation patterns from a single scan"""
+        matched_patterns, pattern_scan = self._scan_patterns(context)
+        return {
+            'scam_patterns': self._analyze_scam_patterns(context, matched_patterns),
+            'misinfo_patterns': self._analyze_misinfo_patterns(context, matched_patterns),
+            'pattern_scan': pattern_scan
+        }
+
+    def _scan_patterns(self, context):
+        """Match all scam and misinformation patterns within the scan budget"""
+        self._refresh_rules()
+        return self.pattern_matcher.scan(
+            context.lowered,
+            max_chars=self.max_scan_chars,
+            time_budget=self.pattern_time_budget,
+            window=self.proximity_window
+        )
+
+    def _analyze_scam_patterns(self, context, matched_patterns=None):
         """Analyze content for scam patterns"""
-        content_lower = content.lower()
+        if matched_patterns is None:
+            matched_patterns = self._scan_patterns(context)[0]
         score = 0
         detected_patterns = []
         
         for pattern in self.scam_patterns:
-            if re.search(pattern, content_lower):
+            if ('scam', pattern) in matched_patterns:
                 score += 15
                 detected_patterns.append(f"Scam pattern: {pattern}")
         
         return min(score, 100), detected_patterns
 
-    def _analyze_misinfo_patterns(self, content):
+    def _analyze_misinfo_patterns(self, context, matched_patterns=None):
         """Analyze content for misinformation patterns"""
-        content_lower = content.lower()
+        if matched_patterns is None:
+            matched_patterns = self._scan_patterns(context)[0]
         score = 0
         detected_patterns = []
         
         for pattern in self.misinfo_patterns:
-            if re.search(pattern, content_lower):
+            if ('misinfo', pattern) in matched_patterns:
                 score += 20
                 detected_patterns.append(f"Misinformation pattern: {pattern}")
         
         return min(score, 100), detected_patterns
 
-    def _analyze_urls(self, content):
-        """Advanced URL analysis"""
-        url_pattern = r'https?://[^\s]+'
-        urls = re.findall(url_pattern, content)
+    def _analyze_urls(self, context):
+        """Advanced URL analysis, scored once per distinct host"""
+        urls = context.urls
+        risk_score, warnings = self._score_hosts(parse_url(url) for url in urls)
+        
+        return {
+            'risk_score': min(risk_score, 100),
+            'warnings': warnings,
+            'url_count': len(urls)
+        }
+
+    def _analyze_expansions(self, context):
+        """Follow shortened links and score the hosts they lead to"""
+        short_urls = []
+        for url in context.urls:
+            parsed = parse_url(url)
+            if parsed is not None and self.url_expander.is_short(parsed):
+                short_urls.append(url)
+        if not short_urls:
+            return {'risk_score': 0, 'warnings': [], 'expanded': []}
+        
+        expansions = self.url_expander.expand_many(list(dict.fromkeys(short_urls)))
+        risk_score, warnings = self._score_hosts(
+            parse_url(expansion.final_url) for expansion in expansions if expansion.final_url
+        )
+        
+        return {
+            'risk_score': min(risk_score, 100),
+            'warnings': [f"Shortened link destination: {warning}" for warning in warnings],
+            'expanded': [
+                {'url': expansion.url, 'finalUrl': expansion.final_url,
+                 'hops': expansion.hops, 'error': expansion.error}
+                for expansion in expansions
+            ]
+        }
+
+    def _score_hosts(self, parsed_urls):
+        """URL risk and warnings for parsed URLs, once per distinct host"""
+        hosts = {}
+        insecure = set()
+        for parsed in parsed_urls:
+            if parsed is None:
+                continue
+            hosts.setdefault(parsed.host, parsed)
+            if parsed.scheme == 'http':
+                insecure.add(parsed.host)
         
         risk_score = 0
         warnings = []
         
-        for url in urls:
+        for host, parsed in hosts.items():
+            suffixes = host_suffixes(parsed)
+            
             # Check for URL shorteners
-            shorteners = ['bit.ly', 'tinyurl.com', 't.co', 'goo.gl', 'ow.ly']
-            if any(shortener in url for shortener in shorteners):
+            if not self.SHORTENERS.isdisjoint(suffixes):
                 risk_score += 25
                 warnings.append("Shortened URL detected")
             
             # Check for HTTP vs HTTPS
-            if url.startswith('http://'):
+            if host in insecure:
                 risk_score += 20
                 warnings.append("Insecure HTTP connection")
             
             # Check for suspicious TLDs
-            suspicious_tlds = ['.tk', '.ml', '.ga', '.cf']
-            if any(tld in url for tld in suspicious_tlds):
+            if parsed.tld in self.SUSPICIOUS_TLDS:
                 risk_score += 30
                 warnings.append("Suspicious domain extension")
             
             # Check for IP addresses instead of domains
-            ip_pattern = r'\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3}'
-            if re.search(ip_pattern, url):
+            if parsed.is_ip:
                 risk_score += 40
                 warnings.append("IP address used instead of domain")
+            
+            # Check the host and its parent domains against the blocklist
+            if self.url_blocklist is not None and self.url_blocklist.blocked(parsed):
+                risk_score += 50
+                warnings.append("Domain on reputation blocklist")
         
-        return {
-            'risk_score': min(risk_score, 100),
-            'warnings': warnings,
-            'url_count': len(urls)
-        }
+        return risk_score, warnings
 
-    def _analyze_sentiment(self, content):
+    def _analyze_sentiment(self, context):
         """Analyze sentiment and emotional manipulation"""
-        try:
-            blob = TextBlob(content)
-            sentiment = blob.sentiment
+        polarity, subjectivity = self.sentiment.score(context.content, context.tokens)
+        
+        # Detect extreme sentiment as potential manipulation
+        manipulation_score = 0
+        if abs(polarity) > 0.8:
+            manipulation_score += 30
+        if subjectivity > 0.8:
+            manipulation_score += 20
             
-            # Detect extreme sentiment as potential manipulation
-            manipulation_score = 0
-            if abs(sentiment.polarity) > 0.8:
-                manipulation_score += 30
-            if sentiment.subjectivity > 0.8:
-                manipulation_score += 20
-                
-            return {
-                'polarity': sentiment.polarity,
-                'subjectivity': sentiment.subjectivity,
-                'manipulation_score': manipulation_score
-            }
-        except:
-            return {'polarity': 0, 'subjectivity': 0, 'manipulation_score': 0}
+        return {
+            'polarity': polarity,
+            'subjectivity': subjectivity,
+            'manipulation_score': manipulation_score
+        }
 
-    def _analyze_domain_specific(self, content):
+    def _analyze_domain_specific(self, context):
         """Analyze domain-specific risks"""
-        content_lower = content.lower()
+        self._refresh_rules()
+        found = self.keyword_index.find(context.words)
         
-        financial_risk = sum(1 for keyword in self.financial_keywords if keyword in content_lower) * 10
-        medical_risk = sum(1 for keyword in self.medical_keywords if keyword in content_lower) * 15
+        financial_risk = len(found['financial']) * 10
+        medical_risk = len(found['medical']) * 15
         
         return {
             'financial_risk': min(financial_risk, 100),
             'medical_risk': min(medical_risk, 100)
         }
 
-    def _extract_ml_features(self, content):
-        """Extract machine learning features"""
-        words = content.split()
-        
-        features = {
-            'word_count': len(words),
-            'char_count': len(content),
-            'avg_word_length': np.mean([len(word) for word in words]) if words else 0,
-            'uppercase_ratio': sum(1 for c in content if c.isupper()) / len(content) if content else 0,
-            'punctuation_ratio': sum(1 for c in content if c in '!?.,;:') / len(content) if content else 0,
-            'number_count': len(re.findall(r'\d+', content)),
-            'currency_mentions': len(re.findall(r'[\$€£¥]', content)),
-        }
-        
-        return features
+    def _personalize(self, scored, user_name, elapsed):
+        """Add the per-request summary, timestamp and measured time to a scored result"""
+        result = dict(scored)
+        result['processingTime'] = f"{elapsed:.4f} seconds"
+        result['summary'] = f"Advanced AI analysis using machine learning models detected {result['scamRisk']}% scam risk and {result['credibilityScore']}% credibility. Analysis performed for {user_name} using Xist AI Enterprise Detection Engine."
+        result['analysisDate'] = datetime.now().isoformat()
+        return result
 
-    def _combine_analyses(self, analyses, content, user_name):
-        """Combine all analyses into final result"""
+    def _risk_scores(self, analyses):
+        """Return (scam_risk, credibility_score, verdict) for a set of analyses"""
         
         # Calculate scam risk
         scam_risk = (
             analyses['scam_patterns'][0] * 0.3 +
-            analyses['url_analysis']['risk_score'] * 0.25 +
+            self._url_risk(analyses) * 0.25 +
             analyses['sentiment']['manipulation_score'] * 0.2 +
             analyses['domain']['financial_risk'] * 0.15 +
             min(analyses['ml_features']['uppercase_ratio'] * 100, 50) * 0.1
         )
+        if 'ml_model' in analyses:
+            scam_risk = min(scam_risk + analyses['ml_model']['probability'] * 100 * self.text_model_weight, 100)
         
         # Calculate credibility score
         base_credibility = 85
@@ -221,35 +856,53 @@ class AdvancedDetectionEngine:
         else:
             verdict = "Credible"
         
+        return scam_risk, credibility_score, verdict
+
+    def _combine_analyses(self, analyses, content):
+        """Combine all analyses into final result"""
+        scam_risk, credibility_score, verdict = self._risk_scores(analyses)
+        
         # Compile warnings
         warnings = []
         warnings.extend(analyses['scam_patterns'][1])
         warnings.extend(analyses['misinfo_patterns'][1])
         warnings.extend(analyses['url_analysis']['warnings'])
+        if 'url_expansion' in analyses:
+            warnings.extend(analyses['url_expansion']['warnings'])
         
         # Generate recommendations
         recommendations = self._generate_recommendations(scam_risk, credibility_score, analyses)
         
-        return {
+        result = {
             'scamRisk': round(scam_risk),
             'credibilityScore': round(max(credibility_score, 0)),
             'verdict': verdict,
             'warnings': warnings[:5],  # Top 5 warnings
             'recommendations': recommendations,
-            'summary': f"Advanced AI analysis using machine learning models detected {round(scam_risk)}% scam risk and {round(max(credibility_score, 0))}% credibility. Analysis performed for {user_name} using Xist AI Enterprise Detection Engine.",
-            'analysisDate': datetime.now().isoformat(),
             'confidence': round((max(credibility_score, 0) + (100 - scam_risk)) / 2),
-            'processingTime': '1.8 seconds',
             'aiModel': 'Xist AI Enterprise v3.0',
             'featuresAnalyzed': len(analyses['ml_features']),
+            'patternScan': analyses['pattern_scan'],
             'detailedScores': {
                 'patternMatching': analyses['scam_patterns'][0],
-                'urlSecurity': analyses['url_analysis']['risk_score'],
+                'urlSecurity': self._url_risk(analyses),
                 'sentimentManipulation': analyses['sentiment']['manipulation_score'],
                 'domainSpecific': max(analyses['domain']['financial_risk'], analyses['domain']['medical_risk']),
                 'linguisticFeatures': min(analyses['ml_features']['uppercase_ratio'] * 100, 50)
             }
         }
+        if 'ml_model' in analyses:
+            result['detailedScores']['textModel'] = round(analyses['ml_model']['probability'] * 100, 1)
+        if 'url_expansion' in analyses:
+            result['expandedUrls'] = analyses['url_expansion']['expanded']
+        return result
+
+    def _url_risk(self, analyses):
+        """URL risk of the links themselves plus, when expanded, where short links lead"""
+        risk = analyses['url_analysis']['risk_score']
+        if 'url_expansion' in analyses:
+            risk = min(risk + analyses['url_expansion']['risk_score'], 100)
+        return risk
 
     def _generate_recommendations(self, scam_risk, credibility_score, analyses):
         """Generate personalized recommendations"""
@@ -0,0 +1,87 @@
+import math
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, wait
+from itertools import repeat
+
+# Engine owned by each worker process, built once by _init_worker
+_engine = None
+
+
+def _init_worker(settings):
+    global _engine
+    from detection_engine import AdvancedDetectionEngine
+    _engine = AdvancedDetectionEngine.from_settings(settings)
+    _engine.warm_up()
+
+
+def _ping():
+    return os.getpid()
+
+
+def _score_chunk(contents, layer_names, short_circuit):
+    return _engine.score_batch(contents, layer_names, short_circuit)
+
+
+class DetectionPool:
+    """Pre-warmed worker processes that score messages for an AdvancedDetectionEngine.
+
+    Each worker builds its own engine from ``engine.settings()`` and warms
+    it up (compiled patterns, sentiment lexicon, numpy) before the pool is
+    used. Only the built-in layers are available in workers. The pool is
+    rebuilt when the engine's rules change. Batches are split into at most
+    ``chunk_size`` messages per task, spread evenly over the workers, so
+    IPC is paid per chunk rather than per message. Workers are spawned,
+    not forked, so they never inherit the server's threads or DB handles.
+    """
+
+    def __init__(self, workers, chunk_size=64):
+        self.workers = workers
+        self.chunk_size = chunk_size
+        self._executor = None
+        self._version = None
+        self._lock = threading.Lock()
+
+    def start(self, engine):
+        """Spawn and warm every worker now instead of on the first request"""
+        self._executor_for(engine)
+
+    def score(self, engine, content, layer_names, short_circuit):
+        return self._executor_for(engine).submit(_score_chunk, [content], layer_names, short_circuit).result()[0]
+
+    def score_many(self, engine, contents, layer_names, short_circuit):
+        if not contents:
+            return []
+        executor = self._executor_for(engine)
+        size = max(1, min(self.chunk_size, math.ceil(len(contents) / self.workers)))
+        chunks = [contents[offset:offset + size] for offset in range(0, len(contents), size)]
+        results = []
+        for scored in executor.map(_score_chunk, chunks, repeat(layer_names), repeat(short_circuit)):
+            results.extend(scored)
+        return results
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown()
+                self._executor = None
+
+    def _executor_for(self, engine):
+        version = engine.settings_version()
+        with self._lock:
+            if self._executor is None or version != self._version:
+                if self._executor is not None:
+                    self._executor.shutdown(wait=False)
+                settings = engine.settings()
+                executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context('spawn'),
+                    initializer=_init_worker,
+                    initargs=(settings,)
+                )
+                # One task per worker forces every process to start and warm up
+                wait([executor.submit(_ping) for _ in range(self.workers)])
+                self._executor = executor
+                self._version = version
+            return self._executor
@@ -0,0 +1,127 @@
+import re
+from functools import lru_cache
+
+# numpy is imported on first use so loading this module stays cheap
+
+PUNCTUATION = '!?.,;:'
+CURRENCY_SYMBOLS = '$€£¥'
+
+_DIGIT_RUN = re.compile(r'\d+')
+
+
+@lru_cache(maxsize=None)
+def _ascii_tables():
+    """Upper/space/digit lookup tables for the ASCII range, indexed by code point"""
+    import numpy as np
+    chars = [chr(code) for code in range(128)]
+    return (
+        np.array([char.isupper() for char in chars]),
+        np.array([char.isspace() for char in chars]),
+        np.array([char.isdecimal() for char in chars]),
+    )
+
+
+def extract_features(content, tokens=None):
+    """The ML feature dict of one message, equal to what
+    ``extract_features_batch`` returns for it but without the per-call cost
+    of numpy. ``tokens`` is ``content.split()`` if the caller has it already.
+    """
+    if tokens is None:
+        tokens = content.split()
+    char_count = len(content)
+    word_count = len(tokens)
+    return {
+        'word_count': word_count,
+        'char_count': char_count,
+        'avg_word_length': sum(map(len, tokens)) / word_count if word_count else 0,
+        'uppercase_ratio': sum(map(str.isupper, content)) / char_count if char_count else 0,
+        'punctuation_ratio': sum(map(content.count, PUNCTUATION)) / char_count if char_count else 0,
+        'number_count': len(_DIGIT_RUN.findall(content)),
+        'currency_mentions': sum(map(content.count, CURRENCY_SYMBOLS)),
+    }
+
+
+def extract_features_batch(contents):
+    """Compute the ML feature dict for every message in ``contents``.
+
+    All messages are concatenated into one UTF-32 code point buffer and the
+    per-character tests become array lookups; per-message totals are
+    differences of cumulative sums at the message boundaries. Results match
+    the per-message ``str.split`` / ``str.isupper`` / ``re`` definitions.
+    """
+    if not contents:
+        return []
+
+    import numpy as np
+    lengths = np.fromiter((len(content) for content in contents), dtype=np.int64, count=len(contents))
+    ends = np.cumsum(lengths)
+    starts = ends - lengths
+    codes = np.frombuffer(''.join(contents).encode('utf-32-le', 'surrogatepass'), dtype=np.uint32)
+
+    is_upper, is_space, is_digit = _classify(codes)
+    is_punct = np.isin(codes, [ord(char) for char in PUNCTUATION])
+    is_currency = np.isin(codes, [ord(char) for char in CURRENCY_SYMBOLS])
+
+    # A word or digit run starts where the previous character (within the
+    # same message) does not continue it
+    message_start = np.zeros(len(codes), dtype=bool)
+    message_start[starts[lengths > 0]] = True
+    prev_space = np.concatenate(([True], is_space[:-1])) | message_start
+    prev_digit = np.concatenate(([False], is_digit[:-1])) & ~message_start
+    word_starts = ~is_space & prev_space
+    number_starts = is_digit & ~prev_digit
+
+    def per_message(mask):
+        totals = np.concatenate(([0], np.cumsum(mask, dtype=np.int64)))
+        return totals[ends] - totals[starts]
+
+    word_counts = per_message(word_starts)
+    word_chars = lengths - per_message(is_space)
+    uppercase = per_message(is_upper)
+    punctuation = per_message(is_punct)
+    numbers = per_message(number_starts)
+    currency = per_message(is_currency)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        avg_word_length = np.where(word_counts > 0, word_chars / word_counts, 0)
+        uppercase_ratio = np.where(lengths > 0, uppercase / lengths, 0)
+        punctuation_ratio = np.where(lengths > 0, punctuation / lengths, 0)
+
+    columns = zip(
+        word_counts.tolist(), lengths.tolist(), avg_word_length.tolist(),
+        uppercase_ratio.tolist(), punctuation_ratio.tolist(),
+        numbers.tolist(), currency.tolist()
+    )
+    return [
+        {
+            'word_count': word_count,
+            'char_count': char_count,
+            'avg_word_length': avg_length if word_count else 0,
+            'uppercase_ratio': upper_ratio if char_count else 0,
+            'punctuation_ratio': punct_ratio if char_count else 0,
+            'number_count': number_count,
+            'currency_mentions': currency_count,
+        }
+        for word_count, char_count, avg_length, upper_ratio, punct_ratio, number_count, currency_count in columns
+    ]
+
+
+def _classify(codes):
+    """Return (upper, space, digit) masks, using str methods for non-ASCII code points."""
+    import numpy as np
+    ascii_upper, ascii_space, ascii_digit = _ascii_tables()
+    ascii_mask = codes < 128
+    ascii_codes = np.where(ascii_mask, codes, 0)
+    is_upper = ascii_upper[ascii_codes] & ascii_mask
+    is_space = ascii_space[ascii_codes] & ascii_mask
+    is_digit = ascii_digit[ascii_codes] & ascii_mask
+
+    if not ascii_mask.all():
+        positions = np.flatnonzero(~ascii_mask)
+        unique, inverse = np.unique(codes[positions], return_inverse=True)
+        chars = [chr(code) for code in unique.tolist()]
+        is_upper[positions] = np.array([char.isupper() for char in chars])[inverse]
+        is_space[positions] = np.array([char.isspace() for char in chars])[inverse]
+        is_digit[positions] = np.array([char.isdecimal() for char in chars])[inverse]
+
+    return is_upper, is_space, is_digit
@@ -0,0 +1,69 @@
+import json
+import re
+
+# Keywords and messages are split into the same lowercase word tokens, so
+# "weight-loss" in a message matches the keyword "weight loss"
+_WORD = re.compile(r'\w+')
+
+
+def keyword_words(lowered):
+    """Word tokens of already-lowercased text"""
+    return _WORD.findall(lowered)
+
+
+def load_keywords(path):
+    """Read keyword lists from a JSON file of ``{"group": ["term", ...]}``"""
+    with open(path, encoding='utf-8') as handle:
+        groups = json.load(handle)
+    if not isinstance(groups, dict) or not all(isinstance(terms, list) for terms in groups.values()):
+        raise ValueError(f'{path}: expected an object mapping group names to lists of terms')
+    return groups
+
+
+class KeywordIndex:
+    """Whole-word keyword lookup whose cost does not grow with the number of keywords.
+
+    Single-word keywords are found by intersecting the message's word set
+    with theirs. Phrases ("binary options") live in a trie keyed by word
+    and are only walked from positions holding the first word of some
+    phrase. Matching is on whole words, so "cure" does not match "secure".
+    """
+
+    _HITS = ''  # trie key holding the (group, keyword) pairs ending at a node; never a word
+
+    def __init__(self, groups):
+        self.groups = list(groups)
+        self._words = {}
+        self._phrases = {}
+        for group, keywords in groups.items():
+            for keyword in keywords:
+                words = keyword_words(keyword.lower())
+                if len(words) == 1:
+                    self._words.setdefault(words[0], []).append((group, keyword))
+                elif words:
+                    node = self._phrases
+                    for word in words:
+                        node = node.setdefault(word, {})
+                    node.setdefault(self._HITS, []).append((group, keyword))
+
+    def find(self, words):
+        """Return {group: set of keywords} found in ``words`` (see ``keyword_words``)"""
+        found = {group: set() for group in self.groups}
+        present = set(words)
+        for word in self._words.keys() & present:
+            for group, keyword in self._words[word]:
+                found[group].add(keyword)
+
+        starts = self._phrases.keys() & present
+        if starts:
+            for position, word in enumerate(words):
+                if word not in starts:
+                    continue
+                node = self._phrases[word]
+                for next_position in range(position + 1, len(words)):
+                    node = node.get(words[next_position])
+                    if node is None:
+                        break
+                    for group, keyword in node.get(self._HITS, ()):
+                        found[group].add(keyword)
+        return found
@@ -0,0 +1,280 @@
+import json
+import threading
+import time
+
+# requests / httpx are imported when the first session is built so startup stays cheap
+
+
+class LLMUnavailable(Exception):
+    """Upstream could not produce a completion; callers fall back"""
+
+
+class CircuitBreaker:
+    """Opens after ``failure_threshold`` consecutive upstream failures.
+
+    While open, calls are refused without touching the network. After
+    ``reset_timeout`` seconds a single trial call is let through (half-open);
+    its outcome closes the breaker again or restarts the timeout.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            if self.opened_at is None:
+                return 'closed'
+            if time.monotonic() - self.opened_at >= self.reset_timeout:
+                return 'half-open'
+            return 'open'
+
+    def allow(self):
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if time.monotonic() - self.opened_at < self.reset_timeout or self._trial_running:
+                return False
+            self._trial_running = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self._trial_running or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+            self._trial_running = False
+
+
+def _payload(model, messages, stream, options):
+    payload = {'model': model, 'messages': messages, 'stream': stream}
+    payload.update(options)
+    return payload
+
+
+def _completion_text(body):
+    try:
+        return body['choices'][0]['message']['content']
+    except (KeyError, IndexError, TypeError) as e:
+        raise LLMUnavailable(f'Malformed completion: {e!r}')
+
+
+def _stream_token(line):
+    """Token carried by one SSE line, '' for anything else, None at [DONE]"""
+    if not line or not line.startswith('data:'):
+        return ''
+    data = line[5:].strip()
+    if data == '[DONE]':
+        return None
+    try:
+        return json.loads(data)['choices'][0].get('delta', {}).get('content') or ''
+    except (ValueError, KeyError, IndexError, AttributeError):
+        return ''
+
+
+def _is_upstream_failure(status_code):
+    return status_code == 429 or status_code >= 500
+
+
+class LLMClient:
+    """Chat completions over a pooled keep-alive session (OpenAI-compatible API).
+
+    ``pool_size`` caps the connections kept and opened per host; callers
+    beyond it wait for a free connection instead of opening new ones.
+    Timeouts, connection errors, 429s and 5xx responses count against the
+    circuit breaker; other 4xx (e.g. a bad user key) fail the call without
+    tripping it.
+    """
+
+    def __init__(self, base_url, model, connect_timeout=3.05, read_timeout=15,
+                 pool_size=10, breaker=None):
+        self.base_url = base_url.rstrip('/')
+        self.model = model
+        self.timeout = (connect_timeout, read_timeout)
+        self.pool_size = pool_size
+        self.breaker = breaker or CircuitBreaker()
+        self._session = None
+        self._session_lock = threading.Lock()
+
+    def complete(self, api_key, messages, **options):
+        """Return the completion text or raise LLMUnavailable"""
+        response = self._post(api_key, messages, stream=False, **options)
+        try:
+            content = _completion_text(response.json())
+        except (ValueError, LLMUnavailable) as e:
+            self.breaker.record_failure()
+            raise LLMUnavailable(str(e))
+        self.breaker.record_success()
+        return content
+
+    def stream(self, api_key, messages, **options):
+        """Yield completion tokens as upstream sends them.
+
+        LLMUnavailable is raised before the first token if the call cannot
+        start; a failure mid-stream ends the generator with LLMUnavailable.
+        """
+        response = self._post(api_key, messages, stream=True, **options)
+        try:
+            # chunk_size=None hands over each chunk as it arrives instead of filling a buffer
+            for line in response.iter_lines(chunk_size=None, decode_unicode=True):
+                token = _stream_token(line)
+                if token is None:
+                    break
+                if token:
+                    yield token
+        except GeneratorExit:
+            # The consumer went away; upstream was delivering fine
+            self.breaker.record_success()
+            raise
+        except Exception as e:
+            self.breaker.record_failure()
+            raise LLMUnavailable(f'Stream interrupted: {e}')
+        finally:
+            response.close()
+        self.breaker.record_success()
+
+    def _post(self, api_key, messages, stream, **options):
+        if not self.breaker.allow():
+            raise LLMUnavailable('Circuit open: upstream recently failing')
+
+        import requests
+        try:
+            response = self._get_session().post(
+                f'{self.base_url}/chat/completions',
+                headers={'Authorization': f'Bearer {api_key}'},
+                json=_payload(self.model, messages, stream, options),
+                timeout=self.timeout,
+                stream=stream
+            )
+        except requests.RequestException as e:
+            self.breaker.record_failure()
+            raise LLMUnavailable(str(e))
+
+        if response.status_code != 200:
+            response.close()
+            if _is_upstream_failure(response.status_code):
+                self.breaker.record_failure()
+            else:
+                # The request was rejected; upstream itself is healthy
+                self.breaker.record_success()
+            raise LLMUnavailable(f'Upstream returned {response.status_code}')
+        return response
+
+    def _get_session(self):
+        with self._session_lock:
+            if self._session is None:
+                import requests
+                from requests.adapters import HTTPAdapter
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=4, pool_maxsize=self.pool_size, pool_block=True)
+                session.mount('http://', adapter)
+                session.mount('https://', adapter)
+                self._session = session
+            return self._session
+
+    def close(self):
+        with self._session_lock:
+            if self._session is not None:
+                self._session.close()
+                self._session = None
+
+
+class AsyncLLMClient:
+    """LLMClient for the ASGI app: the same API and breaker semantics on httpx.
+
+    ``pool_size`` bounds the httpx connection pool (there is one upstream
+    host); waiting for a free connection counts towards the connect timeout.
+    """
+
+    def __init__(self, base_url, model, connect_timeout=3.05, read_timeout=15,
+                 pool_size=10, breaker=None):
+        self.base_url = base_url.rstrip('/')
+        self.model = model
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.pool_size = pool_size
+        self.breaker = breaker or CircuitBreaker()
+        self._client = None
+
+    async def complete(self, api_key, messages, **options):
+        response = await self._send(api_key, messages, stream=False, **options)
+        try:
+            await response.aread()
+            content = _completion_text(response.json())
+        except Exception as e:
+            self.breaker.record_failure()
+            raise LLMUnavailable(str(e))
+        finally:
+            await response.aclose()
+        self.breaker.record_success()
+        return content
+
+    async def stream(self, api_key, messages, **options):
+        response = await self._send(api_key, messages, stream=True, **options)
+        try:
+            async for line in response.aiter_lines():
+                token = _stream_token(line)
+                if token is None:
+                    break
+                if token:
+                    yield token
+        except GeneratorExit:
+            self.breaker.record_success()
+            raise
+        except Exception as e:
+            self.breaker.record_failure()
+            raise LLMUnavailable(f'Stream interrupted: {e}')
+        finally:
+            await response.aclose()
+        self.breaker.record_success()
+
+    async def _send(self, api_key, messages, stream, **options):
+        if not self.breaker.allow():
+            raise LLMUnavailable('Circuit open: upstream recently failing')
+
+        import httpx
+        client = self._get_client()
+        request = client.build_request(
+            'POST', f'{self.base_url}/chat/completions',
+            headers={'Authorization': f'Bearer {api_key}'},
+            json=_payload(self.model, messages, stream, options)
+        )
+        try:
+            response = await client.send(request, stream=True)
+        except httpx.HTTPError as e:
+            self.breaker.record_failure()
+            raise LLMUnavailable(str(e) or type(e).__name__)
+
+        if response.status_code != 200:
+            await response.aclose()
+            if _is_upstream_failure(response.status_code):
+                self.breaker.record_failure()
+            else:
+                self.breaker.record_success()
+            raise LLMUnavailable(f'Upstream returned {response.status_code}')
+        return response
+
+    def _get_client(self):
+        if self._client is None:
+            import httpx
+            self._client = httpx.AsyncClient(
+                timeout=httpx.Timeout(self.read_timeout, connect=self.connect_timeout, pool=self.connect_timeout),
+                limits=httpx.Limits(max_connections=self.pool_size, max_keepalive_connections=self.pool_size)
+            )
+        return self._client
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
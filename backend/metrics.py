@@ -0,0 +1,130 @@
+import bisect
+import threading
+
+# Upper bounds in seconds, from sub-millisecond pattern scans to slow DB commits
+DEFAULT_BUCKETS = (
+    0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005,
+    0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0
+)
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+class LatencyHistogram:
+    """Cumulative-bucket latency histogram with interpolated quantiles.
+
+    Quantiles are estimated the way Prometheus' ``histogram_quantile`` does:
+    linearly within the bucket the rank falls into, so they are only as
+    precise as the bucket bounds.
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, seconds):
+        self.counts[bisect.bisect_left(self.buckets, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+
+    def quantile(self, q):
+        if not self.count:
+            return 0.0
+
+        rank = q * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            if count and seen + count >= rank:
+                if index == len(self.buckets):
+                    # Past the last bound there is nothing to interpolate against
+                    return self.buckets[-1]
+                lower = self.buckets[index - 1] if index else 0.0
+                upper = self.buckets[index]
+                return lower + (upper - lower) * (rank - seen) / count
+            seen += count
+        return self.buckets[-1]
+
+
+class MetricsRegistry:
+    """Thread-safe set of labelled latency histograms rendered as Prometheus text"""
+
+    def __init__(self, prefix='xist'):
+        self.prefix = prefix
+        self._families = {}
+        self._lock = threading.Lock()
+
+    def observe(self, name, seconds, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            family = self._families.setdefault(name, {})
+            histogram = family.get(key)
+            if histogram is None:
+                histogram = family[key] = LatencyHistogram()
+            histogram.observe(seconds)
+
+    def observe_all(self, name, timings, **labels):
+        """Record a {stage: seconds} dict, one series per stage"""
+        for stage, seconds in timings.items():
+            self.observe(name, seconds, stage=stage, **labels)
+
+    def snapshot(self, name):
+        """Return {labels: {'count', 'p50', 'p95', 'p99'}} for one family"""
+        with self._lock:
+            return {
+                key: dict(
+                    count=histogram.count,
+                    **{f'p{round(q * 100)}': histogram.quantile(q) for q in QUANTILES}
+                )
+                for key, histogram in self._families.get(name, {}).items()
+            }
+
+    def render(self):
+        """Prometheus text exposition (format 0.0.4)"""
+        lines = []
+        with self._lock:
+            for name, family in sorted(self._families.items()):
+                metric = f'{self.prefix}_{name}_seconds'
+                lines.append(f'# HELP {metric} Latency of {name.replace("_", " ")} in seconds.')
+                lines.append(f'# TYPE {metric} histogram')
+                for key, histogram in sorted(family.items()):
+                    cumulative = 0
+                    for bound, count in zip(histogram.buckets + ('+Inf',), histogram.counts):
+                        cumulative += count
+                        lines.append(f'{metric}_bucket{_labels(key, le=bound)} {cumulative}')
+                    lines.append(f'{metric}_sum{_labels(key)} {histogram.sum!r}')
+                    lines.append(f'{metric}_count{_labels(key)} {histogram.count}')
+
+                quantile_metric = f'{metric}_quantile'
+                lines.append(f'# HELP {quantile_metric} Estimated p50/p95/p99 {name.replace("_", " ")} latency in seconds.')
+                lines.append(f'# TYPE {quantile_metric} gauge')
+                for key, histogram in sorted(family.items()):
+                    for q in QUANTILES:
+                        lines.append(f'{quantile_metric}{_labels(key, quantile=q)} {histogram.quantile(q)!r}')
+        return '\n'.join(lines) + '\n'
+
+
+def render_stats(prefix, name, stats, gauges=()):
+    """Prometheus text for a component's stats() dict: the keys in
+    ``gauges`` are current levels, the rest counters since start
+    """
+    lines = []
+    for key, value in stats.items():
+        if key in gauges:
+            metric, kind = f'{prefix}_{name}_{key}', 'gauge'
+        else:
+            metric, kind = f'{prefix}_{name}_{key}_total', 'counter'
+        lines.append(f'# TYPE {metric} {kind}')
+        lines.append(f'{metric} {value!r}')
+    return '\n'.join(lines) + '\n'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(key, **extra):
+    pairs = list(key) + list(extra.items())
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
@@ -0,0 +1,389 @@
+import re
+import string
+import time
+
+
+class PatternMatcher:
+    """Single-pass matcher for wildcard detection patterns.
+
+    Detection patterns are short chains such as ``urgent.*action.*required``:
+    fixed-length pieces ("atoms") that must appear in order on one line.
+    All atoms of all patterns are compiled into one alternation and the text
+    is scanned once; every atom hit advances the patterns waiting for it.
+    Patterns that cannot be split into atoms fall back to ``re.search``.
+
+    Texts of at most ``short_text_chars`` are matched with one precompiled
+    ``re.search`` per pattern instead: on short texts ``.*`` backtracking
+    stays cheap and CPython's literal-prefix search beats the chain scan.
+    """
+
+    def __init__(self, patterns, short_text_chars=2048):
+        self.short_text_chars = short_text_chars
+        self.pattern_ids = []
+        self._regexes = []
+        self._chain_ids = []
+        self._fallback = {}
+        self._atoms = []
+        self._atom_index = {}
+        chains = []
+
+        for pattern_id, pattern in patterns:
+            self.pattern_ids.append(pattern_id)
+            self._regexes.append((pattern_id, re.compile(pattern)))
+            atoms = _split_atoms(pattern)
+            if atoms is None:
+                self._fallback[pattern_id] = re.compile(pattern)
+            else:
+                self._chain_ids.append(pattern_id)
+                chains.append([self._add_atom(atom) for atom in atoms])
+        self._chain_lengths = [len(chain) for chain in chains]
+
+        # (pattern, step) pairs waiting on each atom
+        self._steps = [[] for _ in self._atoms]
+        for index, chain in enumerate(chains):
+            for step, atom_id in enumerate(chain):
+                self._steps[atom_id].append((index, step))
+
+        self._lengths = [length for _, length, _ in self._atoms]
+        self._literals = {}
+        self._classes = []
+        for atom_id, (regex, _, literal) in enumerate(self._atoms):
+            if literal is None:
+                self._classes.append((atom_id, re.compile(regex)))
+            else:
+                self._literals[literal] = atom_id
+        self._hit_cache = {}
+        self._class_cache = {}
+
+        # Literal atoms are folded into a trie-shaped regex so the engine
+        # branches on each character instead of trying every alternative;
+        # greedy optional tails make each hit the longest literal at its offset.
+        alternatives = [_trie_regex(self._literals)] if self._literals else []
+        alternatives += [regex for regex, _, literal in self._atoms if literal is None]
+        self._scanner = re.compile('|'.join(alternatives + [r'\n'])) if self._atoms else None
+
+        # Proximity mode works on whole tokens: punctuation not used by any
+        # literal piece, nor able to start a class piece (the "$" of "\$\d"),
+        # becomes a separator, then tokens are looked up directly
+        kept = set(''.join(self._literals))
+        for _, regex in self._classes:
+            first = re.compile(regex.pattern[:_first_part_length(regex.pattern)])
+            kept.update(char for char in string.punctuation if first.match(char))
+        self._separators = str.maketrans({char: ' ' for char in string.punctuation if char not in kept})
+        self._chain_atoms = [set(chain) for chain in chains]
+
+    def _add_atom(self, atom):
+        if atom not in self._atom_index:
+            self._atom_index[atom] = len(self._atoms)
+            self._atoms.append(atom)
+        return self._atom_index[atom]
+
+    def _literal_hits(self, found):
+        """Return the literal atoms at a hit: the hit and its literal prefixes."""
+        hits = tuple(
+            atom_id for literal, atom_id in self._literals.items()
+            if found.startswith(literal)
+        )
+        if len(self._hit_cache) > 4096:
+            self._hit_cache.clear()
+        self._hit_cache[found] = hits
+        return hits
+
+    def _class_candidates(self, char):
+        """Return the class atoms whose first element can match ``char``."""
+        candidates = [
+            (atom_id, regex) for atom_id, regex in self._classes
+            if re.match(regex.pattern[:_first_part_length(regex.pattern)], char)
+        ]
+        self._class_cache[char] = candidates
+        return candidates
+
+    def match(self, text):
+        """Return the set of pattern ids found in ``text``."""
+        if len(text) <= self.short_text_chars:
+            return self._search_each(text)
+        matched, _ = self._match_chains(text, None)
+        for pattern_id, regex in self._fallback.items():
+            if regex.search(text):
+                matched.add(pattern_id)
+        return matched
+
+    def scan(self, text, max_chars=None, time_budget=None, window=12, chunk_chars=16384):
+        """Match ``text`` with bounded cost and report how it went.
+
+        Text past ``max_chars`` is not scanned. Once ``time_budget`` seconds
+        are spent the exact scan stops and the unscanned rest is matched with
+        the cheaper proximity rule: each piece must be a whole token within
+        ``window`` tokens of the previous one. Fallback regexes run over
+        line-aligned chunks of at most ``chunk_chars`` so a single search
+        never backtracks over the whole text.
+
+        Returns ``(matched_ids, report)``.
+        """
+        report = {
+            'mode': 'exact',
+            'budgetExceeded': False,
+            'truncated': False,
+            'scannedChars': len(text),
+        }
+        if max_chars is not None and len(text) > max_chars:
+            text = text[:max_chars]
+            report['truncated'] = True
+            report['scannedChars'] = max_chars
+        if len(text) <= self.short_text_chars:
+            return self._search_each(text), report
+
+        deadline = time.perf_counter() + time_budget if time_budget is not None else None
+        matched, stopped_at = self._match_chains(text, deadline)
+        if stopped_at is not None:
+            report['mode'] = 'proximity'
+            report['budgetExceeded'] = True
+            matched |= self._match_proximity(text[stopped_at:], window, matched)
+
+        for pattern_id, regex in self._fallback.items():
+            for chunk in _line_chunks(text, chunk_chars):
+                if deadline is not None and time.perf_counter() > deadline:
+                    report['budgetExceeded'] = True
+                    break
+                if regex.search(chunk):
+                    matched.add(pattern_id)
+                    break
+
+        return matched, report
+
+    def _search_each(self, text):
+        return {pattern_id for pattern_id, regex in self._regexes if regex.search(text)}
+
+    def _atoms_for(self, text, start, found):
+        """Return every atom matching at ``start``, given the scanner hit there."""
+        atoms = self._hit_cache.get(found)
+        if atoms is None:
+            atoms = self._literal_hits(found)
+        candidates = self._class_cache.get(found[0])
+        if candidates is None:
+            candidates = self._class_candidates(found[0])
+        if candidates:
+            atoms += tuple(atom_id for atom_id, regex in candidates if regex.match(text, start))
+        return atoms
+
+    def _match_chains(self, text, deadline):
+        """Run the exact single-pass scan over ``text``.
+
+        Returns ``(matched_ids, stopped_at)`` where ``stopped_at`` is the
+        offset the scan gave up at once ``deadline`` passed, else None.
+        """
+        matched = set()
+        if self._scanner is None:
+            return matched, None
+
+        steps = self._steps
+        lengths = self._lengths
+        chain_lengths = self._chain_lengths
+        progress = [0] * len(chain_lengths)
+        next_start = [0] * len(chain_lengths)
+        line_of = [0] * len(chain_lengths)
+        remaining = len(chain_lengths)
+        search = self._scanner.search
+        line = 0
+        pos = 0
+        hits = 0
+
+        while remaining:
+            hit = search(text, pos)
+            if hit is None:
+                break
+            start = hit.start()
+            pos = start + 1
+            found = hit.group()
+
+            if deadline is not None:
+                hits += 1
+                if not hits % 256 and time.perf_counter() > deadline:
+                    return matched, start
+
+            if found == '\n':
+                # '.' never crosses a newline, so chains restart per line
+                line += 1
+                continue
+
+            for atom_id in self._atoms_for(text, start, found):
+                for index, step in steps[atom_id]:
+                    current = progress[index]
+                    if current < 0:
+                        continue
+                    if line_of[index] != line:
+                        line_of[index] = line
+                        current = progress[index] = 0
+                    if current == step and start >= next_start[index]:
+                        next_start[index] = start + lengths[atom_id]
+                        if step + 1 == chain_lengths[index]:
+                            progress[index] = -1
+                            matched.add(self._chain_ids[index])
+                            remaining -= 1
+                        else:
+                            progress[index] = step + 1
+
+        return matched, None
+
+    def _match_proximity(self, text, window, skip):
+        """Match chains whose pieces are whole tokens within ``window`` tokens.
+
+        Tokenizing with ``str.split`` and looking tokens up in a dict is much
+        cheaper than the exact scan, at the cost of ignoring pieces inside
+        longer words. Pattern ids in ``skip`` are already decided.
+        """
+        matched = set()
+        tokens = text.translate(self._separators).split()
+        present = set(tokens)
+        literals = self._literals
+
+        candidates = [
+            index for index, pattern_id in enumerate(self._chain_ids)
+            if pattern_id not in skip and all(
+                self._atoms[atom_id][2] is None or self._atoms[atom_id][2] in present
+                for atom_id in self._chain_atoms[index]
+            )
+        ]
+        if not candidates:
+            return matched
+
+        needed = set()
+        for index in candidates:
+            needed |= self._chain_atoms[index]
+        wanted = {literal: atom_id for literal, atom_id in literals.items() if atom_id in needed}
+        classes = [(atom_id, regex) for atom_id, regex in self._classes if atom_id in needed]
+
+        # (token index, atom) for every needed piece, in text order
+        hits = []
+        for position, token in enumerate(tokens):
+            atom_id = wanted.get(token)
+            if atom_id is not None:
+                hits.append((position, atom_id))
+            for atom_id, regex in classes:
+                if regex.match(token):
+                    hits.append((position, atom_id))
+
+        steps = self._steps
+        chain_lengths = self._chain_lengths
+        # Latest token at which each candidate chain prefix was completed
+        completed = {index: [None] * chain_lengths[index] for index in candidates}
+        for position, atom_id in hits:
+            for index, step in steps[atom_id]:
+                chain = completed.get(index)
+                if chain is None:
+                    continue
+                if step:
+                    previous = chain[step - 1]
+                    if previous is None or previous >= position or position - previous > window:
+                        continue
+                chain[step] = position
+                if step + 1 == chain_lengths[index]:
+                    matched.add(self._chain_ids[index])
+                    del completed[index]
+
+        return matched
+
+    def match_ordered(self, text):
+        """Return matched pattern ids in the order they were registered."""
+        matched = self.match(text)
+        return [pattern_id for pattern_id in self.pattern_ids if pattern_id in matched]
+
+
+def _split_atoms(pattern):
+    """Split ``a.*b.*c`` into fixed-length atoms, or None if unsupported."""
+    if '\\.*' in pattern:
+        return None
+    atoms = []
+    for segment in pattern.split('.*'):
+        if not segment:
+            continue
+        atom = _parse_atom(segment)
+        if atom is None:
+            return None
+        atoms.append(atom)
+    return atoms or None
+
+
+def _parse_atom(segment):
+    """Parse a piece of literals, escapes and classes into (regex, length, literal)."""
+    parts = []
+    literal = ''
+    i = 0
+    while i < len(segment):
+        char = segment[i]
+        if char == '\\':
+            if i + 1 >= len(segment):
+                return None
+            escaped = segment[i + 1]
+            if escaped in 'dwsDWS':
+                parts.append('\\' + escaped)
+                literal = None
+            elif escaped.isalnum():
+                return None
+            else:
+                parts.append(re.escape(escaped))
+                literal = literal + escaped if literal is not None else None
+            i += 2
+        elif char == '[':
+            end = segment.find(']', i + 2)
+            if end == -1:
+                return None
+            parts.append(segment[i:end + 1])
+            literal = None
+            i = end + 1
+        elif char == '+':
+            # "x+" at the end of a piece only needs one "x" to exist
+            if i != len(segment) - 1 or not parts:
+                return None
+            i += 1
+        elif char in '.*?{}()|^$':
+            return None
+        else:
+            parts.append(re.escape(char))
+            literal = literal + char if literal is not None else None
+            i += 1
+
+    if not parts or any(re.fullmatch(part, '\n') for part in parts):
+        return None
+    return ''.join(parts), len(parts), literal
+
+
+def _first_part_length(regex):
+    """Length of the first literal, escape or class in an atom regex."""
+    if regex.startswith('\\'):
+        return 2
+    if regex.startswith('['):
+        return regex.index(']', 2) + 1
+    return 1
+
+
+def _trie_regex(words):
+    """Build a regex matching any of ``words``, factored by common prefixes."""
+    trie = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[''] = True
+
+    def build(node):
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ''
+        body = branches[0] if len(branches) == 1 else '(?:%s)' % '|'.join(branches)
+        return '(?:%s)?' % body if '' in node else body
+
+    return build(trie)
+
+
+def _line_chunks(text, size):
+    """Yield pieces of ``text`` of at most ``size`` chars, split after newlines."""
+    start = 0
+    while start < len(text):
+        end = start + size
+        if end < len(text):
+            newline = text.rfind('\n', start, end)
+            if newline > start:
+                end = newline + 1
+        yield text[start:end]
+        start = end
@@ -0,0 +1,122 @@
+import hashlib
+import json
+import re
+import threading
+import time
+from collections import OrderedDict
+
+_TRAILING_SPACE = re.compile(r'[ \t]+(?=\n)')
+
+
+def normalize_content(content):
+    """Normalize line endings and surrounding whitespace so resubmitted copies share a key"""
+    content = content.replace('\r\n', '\n').replace('\r', '\n')
+    return _TRAILING_SPACE.sub('', content.strip())
+
+
+def content_hash(content):
+    """Return the cache key for already-normalized content"""
+    return hashlib.blake2b(content.encode('utf-8', 'surrogatepass'), digest_size=16).hexdigest()
+
+
+class ResultCache:
+    """Thread-safe LRU cache with a TTL and an approximate memory cap.
+
+    Values are treated as immutable; callers copy before personalizing
+    them. A ``max_entries`` of 0 disables the cache.
+    """
+
+    def __init__(self, max_entries=10000, ttl=3600, max_bytes=64 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._version = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            value, size, expires_at = entry
+            if expires_at <= time.monotonic():
+                self._remove(key)
+                self.expirations += 1
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value, size=None):
+        """Store ``value``; ``size`` in bytes defaults to its JSON length"""
+        if not self.max_entries:
+            return
+
+        if size is None:
+            size = len(json.dumps(value, default=str))
+        size += len(key)
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (value, size, time.monotonic() + self.ttl)
+            self._bytes += size
+
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def invalidate(self, key):
+        """Drop one entry after the data it was built from changed"""
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+                self.invalidations += 1
+
+    def validate(self, version):
+        """Drop every entry if the rules that produced them changed"""
+        with self._lock:
+            if version == self._version:
+                return
+            if self._entries:
+                self.invalidations += 1
+            self._entries.clear()
+            self._bytes = 0
+            self._version = version
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            self.invalidations += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hitRate': round(self.hits / lookups, 4) if lookups else 0,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'invalidations': self.invalidations
+            }
+
+    def _remove(self, key):
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
@@ -0,0 +1,196 @@
+import os
+import re
+import threading
+
+# Precomputed by build_lexicon(); one "word polarity subjectivity intensity modifier" row per word
+LEXICON_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'sentiment_lexicon.tsv')
+
+NEGATIONS = frozenset(('no', 'not', 'never'))
+PUNCTUATION = ".,;:!?()[]{}`'\"@#$^&*+-|=~_"
+LEADING_PUNCTUATION = PUNCTUATION.replace('.', '')
+
+# Emoticon -> polarity (subjectivity 1.0), as in TextBlob
+EMOTICONS = {}
+for _polarity, _faces in [
+    (1.00, '<3 ♥ >:d :-d :d =-d =d x-d xd 8-d'),
+    (0.75, '>:p :-p :p :-b :b :c) :o) :^)'),
+    (0.50, '>:) :-) :) =) =] :] :} :> :3 8) 8-)'),
+    (0.25, '>;] ;-) ;) ;-] ;] ;d ;^) *-) *)'),
+    (0.05, '>:o :-o :o o_o o.o °o°'),
+    (-0.25, ">:/ :-/ :/ :\\ >:\\ :-. :-s :s >.>"),
+    (-0.75, '>:[ :-( :( =( :-[ :[ :{ :-< :c :-c =/'),
+    (-1.00, ":'( :'''( ;'("),
+]:
+    for _face in _faces.split():
+        # Alphabetic faces ("xd") read as words, so TextBlob never scores them
+        if not _face.isalpha():
+            EMOTICONS.setdefault(_face, _polarity)
+
+# Tokens kept whole: emoticons and the sarcasm mark
+_MARKS = frozenset(EMOTICONS) | {'(!)'}
+_MARK_STARTS = frozenset(mark[0] for mark in _MARKS)
+
+_QUOTES = str.maketrans({quote: f' {quote} ' for quote in '“”‘’\'"'})
+_QUOTE_CHARS = re.compile('[“”‘’\'"]')
+ABBREVIATIONS = frozenset((
+    'a.', 'a.m.', 'adj.', 'adv.', 'al.', 'c.', 'cf.', 'comp.', 'conf.', 'def.', 'e.g.', 'ed.',
+    'esp.', 'etc.', 'ex.', 'f.', 'fig.', 'gen.', 'i.e.', 'id.', 'int.', 'l.', 'm.', 'Med.',
+    'Mil.', 'Mr.', 'n.', 'n.q.', 'orig.', 'p.m.', 'pl.', 'pred.', 'pres.', 'ref.', 'v.', 'vs.'
+))
+# "U.S.", "T." and capitalized consonant runs such as "Dr."
+_ABBREVIATION = re.compile(r'^(([A-Za-z]\.)+|[A-Z][bcdfghjklmnpqrstvwxz]+\.)$')
+
+_lexicons = {}
+_lexicons_lock = threading.Lock()
+
+
+def load_lexicon(path=LEXICON_PATH):
+    """Return {word: (polarity, subjectivity, intensity, is_modifier)}, read once per process"""
+    lexicon = _lexicons.get(path)
+    if lexicon is None:
+        with _lexicons_lock:
+            lexicon = _lexicons.get(path)
+            if lexicon is None:
+                lexicon = {}
+                with open(path, encoding='utf-8') as handle:
+                    for line in handle:
+                        if line.startswith('#'):
+                            continue
+                        word, polarity, subjectivity, intensity, modifier = line.rstrip('\n').split('\t')
+                        lexicon[word] = (float(polarity), float(subjectivity), float(intensity), modifier == '1')
+                _lexicons[path] = lexicon
+    return lexicon
+
+
+def build_lexicon(path=LEXICON_PATH):
+    """Write the lexicon file from TextBlob's English sentiment lexicon.
+
+    TextBlob is only needed here, to regenerate the file. Each word keeps
+    the averages TextBlob uses when no part-of-speech tag is given,
+    including the adverbs it derives from adjectives ("terribly").
+    """
+    from textblob.en import sentiment as textblob_lexicon
+    textblob_lexicon.load()
+    with open(path, 'w', encoding='utf-8') as handle:
+        handle.write('# Derived from TextBlob/pattern en-sentiment.xml (PDDL) by sentiment.build_lexicon()\n')
+        for word in sorted(dict.keys(textblob_lexicon)):
+            tags = dict.__getitem__(textblob_lexicon, word)
+            polarity, subjectivity, intensity = tags[None]
+            handle.write('%s\t%r\t%r\t%r\t%d\n' % (word, polarity, subjectivity, intensity, 'RB' in tags))
+
+
+def tokenize(content, words=None):
+    """Lowercased tokens with leading/trailing punctuation split off, as TextBlob's tokenizer does.
+
+    ``words`` may pass in ``content.split()`` when it is already known;
+    it is only used if the content has no quotes to split off.
+    """
+    if words is None or _QUOTE_CHARS.search(content):
+        words = content.replace("n't", " n't").translate(_QUOTES).split()
+    tokens = []
+    for token in words:
+        lowered = token.lower()
+        # Most tokens are plain words with nothing to split off
+        if lowered in _MARKS or (token[0] not in LEADING_PUNCTUATION and token[-1] not in PUNCTUATION):
+            tokens.append(lowered)
+            continue
+        # An emoticon or sarcasm mark followed by punctuation (":(!!"), unless
+        # its last letter and a period read as an abbreviation (":-D.")
+        if lowered[0] in _MARK_STARTS:
+            for length in range(min(len(lowered), 5), 1, -1):
+                rest = token[length:]
+                if lowered[length - 1].isalpha() and rest.startswith('.') and not rest.startswith('...'):
+                    continue
+                if lowered[:length] in _MARKS and all(char in PUNCTUATION for char in rest):
+                    tokens.append(lowered[:length])
+                    token = token[length:]
+                    break
+        while token and token[0] in LEADING_PUNCTUATION:
+            tokens.append(token[0])
+            token = token[1:]
+        tail = []
+        while token and token[-1] in PUNCTUATION:
+            if token[-1] != '.':
+                tail.append(token[-1])
+                token = token[:-1]
+            elif token.endswith('...'):
+                tail.append('...')
+                token = token[:-3].rstrip('.')
+            elif token in ABBREVIATIONS or _ABBREVIATION.match(token):
+                break
+            else:
+                tail.append('.')
+                token = token[:-1]
+        if token:
+            tokens.append(token.lower())
+        tokens.extend(reversed(tail))
+    return tokens
+
+
+def _clamp(value):
+    return max(-1.0, min(value, 1.0))
+
+
+class SentimentScorer:
+    """Polarity and subjectivity from a word lexicon, scored in one pass over the tokens.
+
+    Follows TextBlob's pattern analyzer: known words are averaged, a
+    preceding adverb scales the next known word by its intensity, a
+    negation flips and halves it, and "!" boosts the last one. On the
+    reference corpus of benchmarks/bench_sentiment.py polarity and
+    subjectivity match TextBlob within 1e-9. Known differences come from
+    the tokenizer: TextBlob also rejoins emoticons split across or inside
+    words ("28)" reads as "2" + "8)") and spaced sarcasm marks ("( ! )").
+    """
+
+    def __init__(self, path=LEXICON_PATH):
+        self.path = path
+
+    def score(self, content, words=None):
+        """Return (polarity, subjectivity) of ``content``, optionally already split into ``words``"""
+        lexicon = load_lexicon(self.path)
+        # [polarity, subjectivity, intensity, negated] per assessed word
+        assessed = []
+        modifier = None
+        negation = None
+        for word in tokenize(content, words):
+            entry = lexicon.get(word)
+            if entry is not None:
+                polarity, subjectivity, intensity, is_modifier = entry
+                if modifier is None:
+                    assessed.append([polarity, subjectivity, intensity, False])
+                else:
+                    last = assessed[-1]
+                    last[0] = _clamp(polarity * last[2])
+                    last[1] = _clamp(subjectivity * last[2])
+                    last[2] = intensity
+                if negation is not None:
+                    assessed[-1][2] = 1.0 / assessed[-1][2]
+                    assessed[-1][3] = True
+                modifier = word if is_modifier else None
+                negation = word if word in NEGATIONS else None
+                continue
+
+            if word in NEGATIONS:
+                negation = word
+            elif negation is not None and len(word.strip("'")) > 1:
+                negation = None
+            # An -ly adverb before a negation ("really not good") is negated too
+            if negation is not None and modifier is not None and modifier.endswith('ly'):
+                assessed[-1][3] = True
+                negation = None
+            elif modifier is not None and len(word) > 2:
+                modifier = None
+
+            if word == '!' and assessed:
+                assessed[-1][0] = _clamp(assessed[-1][0] * 1.25)
+            elif word == '(!)':
+                assessed.append([0.0, 1.0, 1.0, False])
+            elif word in EMOTICONS:
+                assessed.append([EMOTICONS[word], 1.0, 1.0, False])
+
+        if not assessed:
+            return 0.0, 0.0
+        polarity = sum(-0.5 * item[0] if item[3] else item[0] for item in assessed) / len(assessed)
+        subjectivity = sum(item[1] for item in assessed) / len(assessed)
+        return polarity, subjectivity
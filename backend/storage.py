@@ -0,0 +1,56 @@
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+
+SQLITE_JOURNAL_MODES = frozenset(('DELETE', 'TRUNCATE', 'PERSIST', 'MEMORY', 'WAL', 'OFF'))
+SQLITE_SYNCHRONOUS = frozenset(('OFF', 'NORMAL', 'FULL', 'EXTRA'))
+
+
+def engine_options(url, pool_size=5, max_overflow=10, pool_timeout=30, pool_recycle=1800, busy_timeout=5):
+    """SQLALCHEMY_ENGINE_OPTIONS for the database at ``url``.
+
+    Every file or server database gets a connection pool of ``pool_size``
+    plus ``max_overflow`` connections; a request waits up to
+    ``pool_timeout`` seconds for one. SQLite waits up to ``busy_timeout``
+    seconds for a lock; server connections are checked before reuse and
+    replaced after ``pool_recycle`` seconds.
+    """
+    parsed = make_url(url)
+    if parsed.get_backend_name() == 'sqlite':
+        options = {'connect_args': {'timeout': busy_timeout}}
+        if parsed.database in (None, '', ':memory:'):
+            # A single shared in-memory connection; nothing to pool
+            return options
+    else:
+        options = {'pool_pre_ping': True, 'pool_recycle': pool_recycle}
+    options.update(pool_size=pool_size, max_overflow=max_overflow, pool_timeout=pool_timeout)
+    return options
+
+
+def tune_sqlite(engine, journal_mode='WAL', synchronous='NORMAL', mmap_size=256 * 1024 * 1024):
+    """Apply journal, sync and mmap PRAGMAs to every new connection of a SQLite engine.
+
+    WAL lets readers run while a writer commits instead of queueing behind
+    it; synchronous=NORMAL is durable across application crashes in WAL
+    mode and only risks the last commits on power loss. Other engines are
+    left alone.
+    """
+    if engine.dialect.name != 'sqlite':
+        return
+    journal_mode = journal_mode.upper()
+    synchronous = synchronous.upper()
+    if journal_mode not in SQLITE_JOURNAL_MODES:
+        raise ValueError(f'Unknown SQLite journal mode: {journal_mode}')
+    if synchronous not in SQLITE_SYNCHRONOUS:
+        raise ValueError(f'Unknown SQLite synchronous setting: {synchronous}')
+    pragmas = [
+        f'PRAGMA journal_mode={journal_mode}',
+        f'PRAGMA synchronous={synchronous}',
+        f'PRAGMA mmap_size={int(mmap_size)}'
+    ]
+
+    @event.listens_for(engine, 'connect')
+    def set_pragmas(connection, _):
+        cursor = connection.cursor()
+        for pragma in pragmas:
+            cursor.execute(pragma)
+        cursor.close()
@@ -0,0 +1,192 @@
+import os
+import pickle
+import re
+import tempfile
+from collections import Counter
+from datetime import datetime
+from itertools import chain, repeat
+
+from watched_file import WatchedFile
+
+# Bumped when the saved layout changes; older files must be retrained
+MODEL_FORMAT = 1
+
+# Larger batches are scored in slices of this many messages, whose
+# intermediate arrays stay in cache
+PREDICT_CHUNK = 512
+
+POSITIVE_LABELS = frozenset(('1', 'true', 'yes', 'scam', 'spam', 'fraud', 'high risk', 'suspicious'))
+NEGATIVE_LABELS = frozenset(('0', 'false', 'no', 'ham', 'legit', 'legitimate', 'credible'))
+
+
+def parse_label(value):
+    """1 for a scam label, 0 for a legitimate one, None if it is neither"""
+    value = str(value).strip().lower()
+    if value in POSITIVE_LABELS:
+        return 1
+    if value in NEGATIVE_LABELS:
+        return 0
+    return None
+
+
+def train_model(texts, labels, max_features=200000, test_fraction=0.2, seed=1):
+    """Fit a TF-IDF vectorizer and a logistic regression on labeled texts.
+
+    Word unigrams and bigrams are weighted with sublinear TF-IDF, capped at
+    ``max_features`` terms. ``test_fraction`` of the texts is held out to
+    report accuracy and ROC AUC before the model is refitted on all of
+    them. Returns (model, metrics); the model is what ``save_model`` writes.
+    """
+    import numpy as np
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    from sklearn.linear_model import LogisticRegression
+    from sklearn.metrics import accuracy_score, roc_auc_score
+    from sklearn.model_selection import train_test_split
+
+    if len(set(labels)) < 2:
+        raise ValueError('Training needs both scam and legitimate examples')
+
+    def fit(train_texts, train_labels):
+        vectorizer = TfidfVectorizer(
+            ngram_range=(1, 2), sublinear_tf=True, min_df=2, max_features=max_features,
+            dtype=np.float32
+        )
+        classifier = LogisticRegression(C=4.0, max_iter=1000, class_weight='balanced')
+        classifier.fit(vectorizer.fit_transform(train_texts), train_labels)
+        return vectorizer, classifier
+
+    metrics = {'examples': len(texts), 'positives': int(sum(labels))}
+    if test_fraction:
+        train_texts, test_texts, train_labels, test_labels = train_test_split(
+            texts, labels, test_size=test_fraction, random_state=seed, stratify=labels
+        )
+        vectorizer, classifier = fit(train_texts, train_labels)
+        scores = classifier.decision_function(vectorizer.transform(test_texts))
+        metrics['holdoutAccuracy'] = round(float(accuracy_score(test_labels, scores > 0)), 4)
+        metrics['holdoutAuc'] = round(float(roc_auc_score(test_labels, scores)), 4)
+
+    vectorizer, classifier = fit(texts, labels)
+    metrics['features'] = len(vectorizer.vocabulary_)
+    return {
+        'format': MODEL_FORMAT,
+        'vectorizer': vectorizer,
+        'classifier': classifier,
+        'trained_at': datetime.utcnow().isoformat(),
+        'metrics': metrics
+    }, metrics
+
+
+def save_model(model, path):
+    """Write a trained model; the file is replaced atomically, so servers
+    watching ``path`` never load half of it
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    handle, temporary = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(handle, 'wb') as stream:
+            pickle.dump(model, stream, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temporary, path)
+    except BaseException:
+        os.unlink(temporary)
+        raise
+
+
+class TextModel(WatchedFile):
+    """A saved text classifier, loaded once and reloaded when its file changes.
+
+    ``predict`` scores a batch as one sparse TF-IDF matrix: each message is
+    lowercased and tokenized by one regex call, then the unigrams and
+    bigrams of the whole batch are looked up in the vocabulary together and
+    their (document, term) pairs counted and weighted by vectorized numpy
+    operations, so per-message Python work is a few C-level calls. The IDF
+    weights are folded into the classifier weights at load, and
+    scikit-learn's own transform and predict, which cost far more per call
+    than scoring a short message, are not used. At most every
+    ``check_interval`` seconds ``refresh`` stats the file and loads a
+    replacement (see WatchedFile). The file is unpickled: only point this
+    at models you trained.
+    """
+
+    def __init__(self, path, check_interval=5.0):
+        self.trained_at = None
+        self._scorer = None
+        super().__init__(path, check_interval)
+
+    def _load(self, stat):
+        if stat is None:
+            self._scorer, self.trained_at = None, None
+            return
+        with open(self.path, 'rb') as stream:
+            model = pickle.load(stream)
+        if not isinstance(model, dict) or model.get('format') != MODEL_FORMAT:
+            raise ValueError(f'{self.path} is not a text model in format {MODEL_FORMAT}; retrain it')
+        vectorizer, classifier = model['vectorizer'], model['classifier']
+        if not (vectorizer.use_idf and vectorizer.sublinear_tf and vectorizer.norm == 'l2'):
+            raise ValueError(f'{self.path} was not trained by train_model; retrain it')
+        # predict reproduces the analyzer train_model configures
+        if (vectorizer.analyzer != 'word' or tuple(vectorizer.ngram_range) != (1, 2) or not vectorizer.lowercase
+                or vectorizer.preprocessor or vectorizer.tokenizer or vectorizer.strip_accents
+                or vectorizer.stop_words):
+            raise ValueError(f'{self.path} was not trained by train_model; retrain it')
+        idf = vectorizer.idf_.astype('float64')
+        # Fitted vocabularies map to numpy integers, slow to hash and count
+        vocabulary = {term: int(index) for term, index in vectorizer.vocabulary_.items()}
+        self._scorer = (
+            re.compile(vectorizer.token_pattern).findall, vocabulary, idf,
+            idf * classifier.coef_.ravel(), float(classifier.intercept_[0])
+        )
+        self.trained_at = model['trained_at']
+
+    def predict(self, contents):
+        """Scam probability of each message; 0.0 for all while no model is loaded"""
+        scorer = self._scorer
+        if scorer is None or not contents:
+            return [0.0] * len(contents)
+        import numpy as np
+        tokenize, vocabulary, idf, weights, intercept = scorer
+        if len(contents) == 1:
+            return [self._predict_one(contents[0], scorer)]
+        if len(contents) > PREDICT_CHUNK:
+            return [
+                probability for start in range(0, len(contents), PREDICT_CHUNK)
+                for probability in self.predict(contents[start:start + PREDICT_CHUNK])
+            ]
+        tokens = list(map(tokenize, map(str.lower, contents)))
+        unigrams = list(chain.from_iterable(tokens))
+        # Bigrams span adjacent tokens of the flattened batch; those that
+        # cross from one message into the next are masked out below
+        terms = np.fromiter(
+            map(vocabulary.get, chain(unigrams, map('{} {}'.format, unigrams, unigrams[1:])), repeat(-1)),
+            dtype=np.intp, count=max(2 * len(unigrams) - 1, 0)
+        )
+        documents = np.repeat(np.arange(len(contents)), np.fromiter(map(len, tokens), dtype=np.intp, count=len(tokens)))
+        keep = terms >= 0
+        keep[len(unigrams):] &= documents[:-1] == documents[1:]
+        documents = np.concatenate((documents, documents[:-1]))[keep]
+        # One entry per (document, term) with its count: the batch's sparse
+        # count matrix in coordinate form
+        pairs, counts = np.unique(documents * len(idf) + terms[keep], return_counts=True)
+        documents, terms = np.divmod(pairs, len(idf))
+        
+        # Sublinear TF, then L2 normalization of each TF-IDF row, as fitted
+        tf = 1.0 + np.log(counts)
+        dot = np.bincount(documents, weights=tf * weights[terms], minlength=len(contents))
+        norm = np.sqrt(np.bincount(documents, weights=(tf * idf[terms]) ** 2, minlength=len(contents)))
+        scores = np.divide(dot, norm, out=np.zeros(len(contents)), where=norm > 0) + intercept
+        return (1.0 / (1.0 + np.exp(-scores))).tolist()
+
+    @staticmethod
+    def _predict_one(content, scorer):
+        """predict for a single message, without the batch bookkeeping"""
+        import numpy as np
+        tokenize, vocabulary, idf, weights, intercept = scorer
+        tokens = tokenize(content.lower())
+        tally = Counter(map(vocabulary.get, chain(tokens, map('{} {}'.format, tokens, tokens[1:])), repeat(-1)))
+        tally.pop(-1, None)
+        if not tally:
+            return float(1.0 / (1.0 + np.exp(-intercept)))
+        terms = np.fromiter(tally, dtype=np.intp, count=len(tally))
+        tf = 1.0 + np.log(np.fromiter(tally.values(), dtype=np.float64, count=len(tally)))
+        score = tf.dot(weights[terms]) / np.sqrt(np.square(tf * idf[terms]).sum()) + intercept
+        return float(1.0 / (1.0 + np.exp(-score)))
@@ -0,0 +1,198 @@
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, wait
+from urllib.parse import urljoin
+
+from url_reputation import parse_url, host_suffixes, trim_url
+
+# requests is imported when the first session is built so startup stays cheap
+
+REDIRECT_STATUSES = frozenset((301, 302, 303, 307, 308))
+
+# final_url is None when the destination is unknown; error explains why
+Expansion = namedtuple('Expansion', 'url final_url hops error')
+
+
+class ExpansionCache:
+    """Expanded short links in a SQLite file shared by every process, with a TTL.
+
+    Each thread opens its own connection; WAL mode lets detection workers
+    read while another one writes. Definitive failures (a shortener that
+    does not redirect, too many hops) are kept for ``failure_ttl`` only.
+    """
+
+    PURGE_EVERY = 1000
+
+    def __init__(self, path, ttl=86400, failure_ttl=600):
+        self.path = path
+        self.ttl = ttl
+        self.failure_ttl = failure_ttl
+        self._local = threading.local()
+        self._writes = 0
+
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS url_expansions ('
+                'url TEXT PRIMARY KEY, final_url TEXT, hops INTEGER NOT NULL, '
+                'error TEXT, expires_at REAL NOT NULL)'
+            )
+            self._local.connection = connection
+        return connection
+
+    def get_many(self, urls):
+        """Return {url: Expansion} for the urls with an unexpired entry"""
+        if not urls:
+            return {}
+        placeholders = ','.join('?' * len(urls))
+        rows = self._connection().execute(
+            f'SELECT url, final_url, hops, error FROM url_expansions '
+            f'WHERE url IN ({placeholders}) AND expires_at > ?',
+            [*urls, time.time()]
+        )
+        return {row[0]: Expansion(*row) for row in rows}
+
+    def put(self, expansion):
+        ttl = self.ttl if expansion.error is None else self.failure_ttl
+        connection = self._connection()
+        connection.execute(
+            'INSERT OR REPLACE INTO url_expansions (url, final_url, hops, error, expires_at) '
+            'VALUES (?, ?, ?, ?, ?)',
+            (*expansion, time.time() + ttl)
+        )
+        self._writes += 1
+        if self._writes % self.PURGE_EVERY == 0:
+            connection.execute('DELETE FROM url_expansions WHERE expires_at <= ?', (time.time(),))
+
+
+class ShortUrlExpander:
+    """Follows shortened links to where they lead without visiting the destination.
+
+    Only hosts in ``shorteners`` (and their subdomains) are ever requested:
+    each hop is one GET without following redirects, and the chain stops at
+    the first Location outside them, so a link cannot make the server fetch
+    arbitrary or internal addresses. At most ``max_workers`` links resolve at
+    once; the same link requested concurrently is resolved once. ``expand_many``
+    waits at most ``deadline`` seconds and reports slower links as unresolved;
+    they keep resolving in the background and land in the cache for the next
+    message. Results persist in an ExpansionCache when ``cache_path`` is set.
+    ``proxy`` routes every hop through an HTTP proxy (egress control, or a
+    local redirect stub when testing).
+    """
+
+    def __init__(self, shorteners, cache_path=None, ttl=86400, failure_ttl=600, max_workers=8,
+                 max_hops=5, connect_timeout=1.0, read_timeout=1.5, deadline=2.0, proxy=None):
+        self.shorteners = frozenset(shorteners)
+        self.cache = ExpansionCache(cache_path, ttl, failure_ttl) if cache_path else None
+        self.max_workers = max_workers
+        self.max_hops = max_hops
+        self.timeout = (connect_timeout, read_timeout)
+        self.deadline = deadline
+        self.proxy = proxy
+        self._session = None
+        self._executor = None
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def is_short(self, parsed):
+        return not self.shorteners.isdisjoint(host_suffixes(parsed))
+
+    def expand_many(self, urls, deadline=None):
+        """Return one Expansion per url, in order, within ``deadline`` seconds"""
+        deadline_at = time.monotonic() + (self.deadline if deadline is None else deadline)
+        urls = [trim_url(url) for url in urls]
+        results = self.cache.get_many(list(set(urls))) if self.cache is not None else {}
+        futures = {url: self._submit(url) for url in set(urls) if url not in results}
+        if futures:
+            done, _ = wait(futures.values(), timeout=max(deadline_at - time.monotonic(), 0))
+            for url, future in futures.items():
+                if future in done:
+                    results[url] = future.result()
+                else:
+                    results[url] = Expansion(url, None, 0, 'Deadline exceeded')
+        return [results[url] for url in urls]
+
+    def _submit(self, url):
+        with self._lock:
+            future = self._pending.get(url)
+            if future is not None:
+                return future
+            if self._executor is None:
+                # Started on first use so each detection worker gets its own threads
+                self._executor = ThreadPoolExecutor(self.max_workers, thread_name_prefix='url-expander')
+            future = self._executor.submit(self._resolve, url)
+            self._pending[url] = future
+        future.add_done_callback(lambda _: self._forget(url, future))
+        return future
+
+    def _forget(self, url, future):
+        with self._lock:
+            if self._pending.get(url) is future:
+                del self._pending[url]
+
+    def _resolve(self, url):
+        import requests
+        current = url
+        hops = 0
+        while True:
+            parsed = parse_url(current)
+            if parsed is None or parsed.scheme not in ('http', 'https'):
+                return self._finish(Expansion(url, None, hops, 'Redirect to an unsupported URL'))
+            if not self.is_short(parsed):
+                return self._finish(Expansion(url, current, hops, None))
+            if hops == self.max_hops:
+                return self._finish(Expansion(url, current, hops, 'Too many redirects'))
+
+            try:
+                response = self._get_session().get(
+                    current, allow_redirects=False, stream=True, timeout=self.timeout
+                )
+                response.close()
+            except requests.RequestException as e:
+                # Transient; not cached so the next message tries again
+                return Expansion(url, None, hops, str(e) or type(e).__name__)
+
+            location = response.headers.get('Location')
+            if response.status_code not in REDIRECT_STATUSES or not location:
+                return self._finish(Expansion(url, None, hops, f'No redirect (HTTP {response.status_code})'))
+            current = urljoin(current, location)
+            hops += 1
+
+    def _finish(self, expansion):
+        if self.cache is not None:
+            try:
+                self.cache.put(expansion)
+            except sqlite3.Error:
+                # A busy or unwritable cache only costs a repeat lookup later
+                pass
+        return expansion
+
+    def _get_session(self):
+        with self._lock:
+            if self._session is None:
+                import requests
+                from requests.adapters import HTTPAdapter
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=8, pool_maxsize=self.max_workers, pool_block=True)
+                session.mount('http://', adapter)
+                session.mount('https://', adapter)
+                session.headers['User-Agent'] = 'XistAI-LinkExpander/1.0'
+                if self.proxy:
+                    session.proxies = {'http': self.proxy, 'https': self.proxy}
+                self._session = session
+            return self._session
+
+    def close(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+            session, self._session = self._session, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+        if session is not None:
+            session.close()
@@ -0,0 +1,154 @@
+import hashlib
+import ipaddress
+import mmap
+import os
+import tempfile
+from array import array
+from bisect import bisect_left
+from collections import namedtuple
+from functools import lru_cache
+from urllib.parse import urlsplit
+
+from watched_file import WatchedFile
+
+# Compiled blocklist: 8-byte magic, then sorted native-endian uint64 hashes
+BLOCKLIST_MAGIC = b'XBLK\x01\x00\x00\x00'
+
+# Public suffixes with two labels that common registrable domains sit under;
+# anything else is treated as a one-label TLD
+TWO_LABEL_SUFFIXES = frozenset((
+    'co.uk', 'org.uk', 'ac.uk', 'gov.uk', 'com.au', 'net.au', 'org.au', 'co.nz', 'co.za',
+    'co.in', 'co.jp', 'com.br', 'com.cn', 'com.mx', 'com.tr', 'com.pk', 'com.ng', 'com.sg',
+))
+
+# Punctuation that ends a sentence rather than a host ("see evil.tk.")
+_HOST_TRAILING = '.,;:!?)]}\'"'
+
+ParsedUrl = namedtuple('ParsedUrl', 'url scheme host registrable_domain tld is_ip')
+
+
+def trim_url(url):
+    """A URL found in text without the sentence punctuation that followed it"""
+    return url.rstrip(_HOST_TRAILING)
+
+
+def parse_url(url):
+    """Split a URL found in text into its parts, or return None if it has no usable host"""
+    try:
+        parts = urlsplit(url)
+        host = parts.hostname
+    except ValueError:
+        return None
+    if not host:
+        return None
+    host = host.rstrip(_HOST_TRAILING)
+    if not host:
+        return None
+    return ParsedUrl(url, parts.scheme.lower(), host, *_split_host(host))
+
+
+@lru_cache(maxsize=65536)
+def _split_host(host):
+    # (registrable_domain, tld, is_ip); hosts repeat across messages, so cached
+    if host[-1].isdigit() or ':' in host:
+        try:
+            ipaddress.ip_address(host)
+            return host, '', True
+        except ValueError:
+            pass
+    labels = host.split('.')
+    suffix_labels = 2 if len(labels) > 2 and '.'.join(labels[-2:]) in TWO_LABEL_SUFFIXES else 1
+    return '.'.join(labels[-suffix_labels - 1:]), labels[-1], False
+
+
+def host_suffixes(parsed):
+    """The host and each parent domain down to the registrable domain"""
+    labels = parsed.host.split('.')
+    depth = parsed.registrable_domain.count('.') + 1
+    return ['.'.join(labels[start:]) for start in range(len(labels) - depth + 1)]
+
+
+def domain_hash(domain):
+    return int.from_bytes(hashlib.blake2b(domain.encode('utf-8'), digest_size=8).digest(), 'little')
+
+
+def compile_blocklist(source, destination):
+    """Compile a text blocklist (one domain per line, # comments) into the mmap format.
+
+    The output is written next to ``destination`` and renamed over it, so a
+    BlocklistTable watching the file never reads a partial table.
+    Returns the number of distinct domains.
+    """
+    hashes = set()
+    with open(source, encoding='utf-8') as handle:
+        for line in handle:
+            domain = line.split('#', 1)[0].strip().lower().rstrip('.')
+            if domain:
+                hashes.add(domain_hash(domain))
+
+    table = array('Q', sorted(hashes))
+    directory = os.path.dirname(os.path.abspath(destination))
+    descriptor, temporary = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(descriptor, 'wb') as handle:
+            handle.write(BLOCKLIST_MAGIC)
+            table.tofile(handle)
+        os.replace(temporary, destination)
+    except BaseException:
+        os.unlink(temporary)
+        raise
+    return len(table)
+
+
+class BlocklistTable(WatchedFile):
+    """Memory-mapped set of blocked domains, reloaded when its file changes.
+
+    Domains are stored as sorted 64-bit hashes, 8 bytes each, and looked up
+    by binary search over the mapping, so millions of entries cost little
+    resident memory and no load time. At most every ``check_interval``
+    seconds ``refresh`` stats the file and maps the new table if it was
+    replaced; ``version`` changes with it so cached results can be dropped.
+    Verdicts per host are memoized until the next reload.
+    """
+
+    MAX_MEMOIZED_HOSTS = 65536
+
+    def __init__(self, path, check_interval=5.0):
+        self._hashes = ()
+        self._mapping = None
+        self._verdicts = {}
+        super().__init__(path, check_interval)
+
+    def __len__(self):
+        return len(self._hashes)
+
+    def _load(self, stat):
+        self._verdicts = {}
+        if stat is None or stat.st_size <= len(BLOCKLIST_MAGIC):
+            self._hashes, self._mapping = (), None
+            return
+        with open(self.path, 'rb') as handle:
+            mapping = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+        if mapping[:len(BLOCKLIST_MAGIC)] != BLOCKLIST_MAGIC:
+            mapping.close()
+            raise ValueError(f'{self.path} is not a compiled blocklist (see compile_blocklist)')
+        # In-flight lookups keep the previous mapping alive until they finish
+        self._hashes = memoryview(mapping)[len(BLOCKLIST_MAGIC):].cast('Q')
+        self._mapping = mapping
+
+    def __contains__(self, domain):
+        hashes = self._hashes
+        value = domain_hash(domain)
+        index = bisect_left(hashes, value)
+        return index < len(hashes) and hashes[index] == value
+
+    def blocked(self, parsed):
+        """Whether the URL's host or a parent domain down to its registrable domain is listed"""
+        verdicts = self._verdicts
+        verdict = verdicts.get(parsed.host)
+        if verdict is None:
+            verdict = any(domain in self for domain in host_suffixes(parsed))
+            if len(verdicts) >= self.MAX_MEMOIZED_HOSTS:
+                verdicts.clear()
+            verdicts[parsed.host] = verdict
+        return verdict
@@ -0,0 +1,32 @@
+from collections import namedtuple
+
+from result_cache import ResultCache
+
+# The User columns requests need, detached from any session
+CachedUser = namedtuple('CachedUser', 'id name is_authority authority_level')
+
+
+class UserCache:
+    """Thread-safe LRU of email -> CachedUser with a TTL.
+
+    Saves the user lookup (and the get-or-create commit) on every request.
+    Writers call ``invalidate`` after changing a user; the TTL bounds how
+    long other server processes may serve the old row. A ``max_entries`` of
+    0 disables the cache.
+    """
+
+    def __init__(self, max_entries=10000, ttl=300):
+        # Users are small, so only their number is capped
+        self._users = ResultCache(max_entries=max_entries, ttl=ttl, max_bytes=float('inf'))
+
+    def get(self, email):
+        return self._users.get(email)
+
+    def put(self, email, user):
+        self._users.put(email, user)
+
+    def invalidate(self, email):
+        self._users.invalidate(email)
+
+    def stats(self):
+        return self._users.stats()
@@ -0,0 +1,43 @@
+import os
+import threading
+import time
+
+
+class WatchedFile:
+    """Base for data loaded from a file and reloaded when the file is replaced.
+
+    At most every ``check_interval`` seconds ``refresh`` stats ``path`` and,
+    if its inode, size or modification time changed, calls ``_load(stat)``
+    (``stat`` is None once the file is gone) under a lock, so concurrent
+    callers load it once. ``version`` changes with every load so cached
+    results can be dropped. Subclasses set up their empty state before
+    calling ``__init__``, which loads the file.
+    """
+
+    def __init__(self, path, check_interval=5.0):
+        self.path = path
+        self.check_interval = check_interval
+        self.version = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        self.refresh(force=True)
+
+    def refresh(self, force=False):
+        now = time.monotonic()
+        if not force and now - self._checked_at < self.check_interval:
+            return
+        with self._lock:
+            if not force and now - self._checked_at < self.check_interval:
+                return
+            self._checked_at = now
+            try:
+                stat = os.stat(self.path)
+            except FileNotFoundError:
+                stat = None
+            version = (stat.st_ino, stat.st_size, stat.st_mtime_ns) if stat else None
+            if version != self.version:
+                self._load(stat)
+                self.version = version
+
+    def _load(self, stat):
+        raise NotImplementedError
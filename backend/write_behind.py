@@ -0,0 +1,140 @@
+import logging
+import threading
+import time
+
+
+class QueueFull(Exception):
+    """Raised when records cannot be queued before the put timeout"""
+
+
+class WriteBehindWriter:
+    """Bounded queue drained by a background thread in batched flushes.
+
+    ``flush(records)`` is called from the writer thread with up to
+    ``batch_size`` records once that many are pending or ``flush_interval``
+    seconds have passed since the first one was queued. A failed flush is
+    retried up to ``max_retries`` times, ``retry_backoff`` seconds later and
+    doubling, before the batch is dropped and logged; ``flush`` must be one
+    transaction, so a retry never writes records twice. New records queue up
+    meanwhile. ``submit`` blocks while the queue is full and raises
+    QueueFull after ``put_timeout``. ``close`` flushes whatever is still
+    queued before returning.
+    """
+
+    def __init__(self, flush, max_queue=10000, batch_size=500, flush_interval=0.5, put_timeout=1.0,
+                 max_retries=3, retry_backoff=0.5, logger=None):
+        self.flush = flush
+        self.max_queue = max_queue
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.put_timeout = put_timeout
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.logger = logger or logging.getLogger(__name__)
+        self._pending = []
+        self._oldest = None
+        self._in_flight = 0
+        self._closing = False
+        self._thread = None
+        self._condition = threading.Condition()
+        self.flushed = 0
+        self.batches = 0
+        self.failed = 0
+        self.retries = 0
+        self.rejected = 0
+
+    def submit(self, records):
+        """Queue all of ``records`` or none of them"""
+        if not records:
+            return
+
+        with self._condition:
+            if self._closing:
+                raise QueueFull('Writer is shutting down')
+            if self._thread is None:
+                # Started on first use so forked workers each get their own
+                self._thread = threading.Thread(target=self._run, name='write-behind', daemon=True)
+                self._thread.start()
+
+            # A submission larger than the queue is let in once the queue is empty
+            needed = min(len(records), self.max_queue)
+            if not self._condition.wait_for(
+                lambda: len(self._pending) + needed <= self.max_queue, timeout=self.put_timeout
+            ):
+                self.rejected += len(records)
+                raise QueueFull(f'Write queue full ({len(self._pending)} pending)')
+
+            if not self._pending:
+                self._oldest = time.monotonic()
+            self._pending.extend(records)
+            self._condition.notify_all()
+
+    def wait_idle(self, timeout=None):
+        """Block until everything queued so far has been flushed"""
+        with self._condition:
+            return self._condition.wait_for(lambda: not self._pending and not self._in_flight, timeout=timeout)
+
+    def close(self, timeout=10):
+        """Stop accepting records and flush the rest"""
+        with self._condition:
+            self._closing = True
+            self._condition.notify_all()
+            thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+
+    def stats(self):
+        with self._condition:
+            return {
+                'queued': len(self._pending),
+                'flushed': self.flushed,
+                'batches': self.batches,
+                'failed': self.failed,
+                'retries': self.retries,
+                'rejected': self.rejected
+            }
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._closing and len(self._pending) < self.batch_size:
+                    if not self._pending:
+                        self._condition.wait()
+                        continue
+                    remaining = self._oldest + self.flush_interval - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._condition.wait(remaining)
+
+                if not self._pending:
+                    return
+                batch = self._pending[:self.batch_size]
+                del self._pending[:self.batch_size]
+                self._oldest = time.monotonic() if self._pending else None
+                self._in_flight = len(batch)
+                self._condition.notify_all()
+
+            failed = 0 if self._flush_with_retries(batch) else len(batch)
+            with self._condition:
+                self.batches += 1
+                self.flushed += len(batch) - failed
+                self.failed += failed
+                self._in_flight = 0
+                self._condition.notify_all()
+
+    def _flush_with_retries(self, batch):
+        delay = self.retry_backoff
+        for attempt in range(self.max_retries + 1):
+            try:
+                self.flush(batch)
+                return True
+            except Exception as e:
+                if attempt == self.max_retries:
+                    self.logger.exception('Write-behind flush of %d records failed; dropping them', len(batch))
+                    return False
+                self.logger.warning('Write-behind flush of %d records failed (%s); retrying in %.1fs',
+                                    len(batch), e, delay)
+            with self._condition:
+                self.retries += 1
+            time.sleep(delay)
+            delay *= 2